@@ -21,3 +21,4 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>
 
 __author__ = u"Edwin Dalmaijer"
+__version__ = u"1.3.0"
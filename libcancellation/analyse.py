@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CancellationTools
+#
+# CancellationTools is open-source software for running cancellation tasks,
+# and directly analysing the data they produce.
+#
+# Copyright (C) 2014, Edwin S. Dalmaijer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+"""Headless analysis of stored data, without a GUI and without initializing
+the PyGame display; usage:
+
+	python -m libcancellation.analyse [options] <paths...>
+
+every path can be a raw data directory (data/raw/<dataset>), a raw.txt file
+in such a directory, or a text file produced by an online task; with the
+--batch option, every path is a data directory (e.g. data/raw or data/online)
+of which all datasets are analysed and combined; in a batch, only the datasets
+that are new or that changed since the previous batch are analysed (unless
+the --force option is passed); the datasets are analysed in parallel worker
+processes (see the --jobs option); with the --output option, only the summary
+(measures) or the summary and the raw heatmap data (heatmaps) are produced,
+which is much faster than rendering all plots; the exit status is 0 when all
+datasets were analysed, 1 when any of them failed, and 2 when the command line
+arguments were invalid
+"""
+
+__author__ = u"Edwin Dalmaijer"
+
+# native
+import argparse
+import os
+import sys
+
+# external
+# Matplotlib should not try to open any windows (there might not even be a
+# display to open them on), so select the non-interactive backend before
+# pyplot is imported by libanalysis
+import matplotlib
+matplotlib.use(u'Agg')
+
+# CancellationTools
+from libhelper import get_colours, get_directories
+import libanalysis
+import libcancellation
+
+
+# # # # #
+# FUNCTIONS
+
+def headless_settings(directory, outdir=None, taskdir=None, disthreshold=50, nworkers=None, output=u'full', pdfdpi=150, pdfmaxsize=524288):
+
+	"""Returns a lightweight settings dict, containing only what an Analysis
+	needs (i.e. no display, fonts, sounds or GUI screens)
+
+	arguments
+
+	directory		-	the main directory of the application
+
+	keyword arguments
+
+	outdir		-	directory to store the analysis output in, or None
+					to use the app's data/output directory
+					(default = None)
+	taskdir		-	directory that contains the task directories, or
+					None to use the app's resources/tasks directory
+					(default = None)
+	disthreshold	-	distance threshold for transforming click
+					coordinates to target coordinates (default = 50)
+	nworkers		-	number of worker processes, or None for one per
+					processor (default = None)
+	output		-	output profile of every analysis: 'measures',
+					'heatmaps', or 'full' (default = 'full')
+	pdfdpi		-	resolution of the images in the summary PDF, in
+					dots per inch (default = 150)
+	pdfmaxsize	-	maximal size of the summary PDF in bytes, or None
+					for no maximum (default = 524288)
+
+	returns
+
+	settings		-	a settings dict that can be passed to Analysis
+	"""
+
+	settings = {u'version':libcancellation.__version__, u'android':False}
+
+	# DIRECTORIES
+	settings[u'dir'] = get_directories(directory)
+	if outdir != None:
+		settings[u'dir'][u'out'] = os.path.abspath(outdir)
+	if taskdir != None:
+		settings[u'dir'][u'tasks'] = os.path.abspath(taskdir)
+
+	# COLOURS
+	settings[u'colours'] = get_colours()
+
+	# ANALYSIS
+	settings[u'analysisproperties'] = {}
+	settings[u'analysisproperties'][u'datapath'] = None
+	settings[u'analysisproperties'][u'disthreshold'] = disthreshold
+	settings[u'analysisproperties'][u'nworkers'] = nworkers
+	settings[u'analysisproperties'][u'output'] = output
+	settings[u'analysisproperties'][u'pdfdpi'] = pdfdpi
+	settings[u'analysisproperties'][u'pdfmaxsize'] = pdfmaxsize
+
+	return settings
+
+
+def dataset_path(path):
+
+	"""Returns the full path to the dataset that the passed path points to
+
+	arguments
+
+	path			-	path to a raw data directory, a raw.txt file, or a
+					text file produced by an online task
+
+	returns
+
+	datapath		-	full path to the dataset
+	"""
+
+	# a raw.txt file is stored in its own dataset directory
+	path = os.path.abspath(path)
+	if os.path.basename(path) == u'raw.txt':
+		path = os.path.dirname(path)
+	# check if the dataset exists
+	if not (os.path.isdir(path) or os.path.isfile(path)):
+		raise IOError(u"dataset '%s' not found" % path)
+
+	return path
+
+
+def main(argv=None):
+
+	"""Parses the command line arguments, and analyses all passed datasets
+
+	keyword arguments
+
+	argv			-	list of command line arguments, or None to use
+					sys.argv (default = None)
+
+	returns
+
+	status		-	0 if all datasets were analysed, 1 if any of them
+					failed
+	"""
+
+	# the package lives in the main directory of the application
+	directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+	# COMMAND LINE
+	parser = argparse.ArgumentParser(prog=u"python -m libcancellation.analyse", \
+		description=u"Analyses cancellation task data, without a GUI.")
+	parser.add_argument(u'paths', nargs=u'+', metavar=u'path', \
+		help=u"raw data directory, raw.txt file, or online task text file (or a data directory with --batch)")
+	parser.add_argument(u'-o', u'--outdir', default=None, \
+		help=u"output directory (default: data/output)")
+	parser.add_argument(u'-t', u'--taskdir', default=None, \
+		help=u"directory containing the tasks (default: resources/tasks)")
+	parser.add_argument(u'-d', u'--disthreshold', type=int, default=50, \
+		help=u"click-to-target distance threshold in pixels (default: 50)")
+	parser.add_argument(u'-j', u'--jobs', type=int, default=None, \
+		help=u"number of worker processes (default: one per processor)")
+	parser.add_argument(u'-p', u'--output', default=u'full', \
+		choices=libanalysis.OUTPUT_PROFILES, \
+		help=u"output files: only the summary (measures), the summary and raw heatmap data (heatmaps), or everything including plots and the PDF (full; default)")
+	parser.add_argument(u'--pdf-dpi', type=int, default=150, \
+		help=u"resolution of the images in the summary PDF in dots per inch (default: 150)")
+	parser.add_argument(u'--pdf-maxsize', type=int, default=512, \
+		help=u"maximal size of the summary PDF in kilobytes, or 0 for no maximum; the image resolution is lowered until the PDF fits (default: 512)")
+	parser.add_argument(u'-b', u'--batch', action=u'store_true', \
+		help=u"analyse all datasets in the passed data directories, and combine their output")
+	parser.add_argument(u'-f', u'--force', action=u'store_true', \
+		help=u"with --batch, analyse all datasets again, including those that did not change since the previous batch")
+	args = parser.parse_args(argv)
+
+	# SETTINGS
+	if args.pdf_maxsize > 0:
+		pdfmaxsize = args.pdf_maxsize * 1024
+	else:
+		pdfmaxsize = None
+	settings = headless_settings(directory, outdir=args.outdir, \
+		taskdir=args.taskdir, disthreshold=args.disthreshold, \
+		nworkers=args.jobs, output=args.output, pdfdpi=args.pdf_dpi, \
+		pdfmaxsize=pdfmaxsize)
+	# create the output directory if it doesn't exist yet
+	if not os.path.isdir(settings[u'dir'][u'out']):
+		os.makedirs(settings[u'dir'][u'out'])
+
+	# DATASETS
+	failed = 0
+	datapaths = []
+	for path in args.paths:
+		try:
+			if args.batch:
+				datapaths.extend(libanalysis.list_datasets(path))
+			else:
+				datapaths.append(dataset_path(path))
+		except (IOError, OSError) as e:
+			failed += 1
+			sys.stderr.write(u"error: %s\n" % e)
+
+	# ANALYSIS
+	# function to report on the progress (called by run_batch)
+	def report(ndone, ntotal, result):
+		print(u"analysed %d/%d: %s" % (ndone, ntotal, result[u'datapath']))
+		if result[u'error'] != None:
+			sys.stderr.write(u"error: failed to analyse '%s': %s\n" % (result[u'datapath'], result[u'error']))
+	# run all analyses (the heatmaps are only averaged in a batch)
+	if args.batch:
+		average = libanalysis.HeatmapAverage()
+	else:
+		average = None
+	results = libanalysis.run_batch(settings, datapaths, \
+		nworkers=settings[u'analysisproperties'][u'nworkers'], progress=report, \
+		average=average, incremental=args.batch and not args.force)
+	nanalysed = len([result for result in results if result[u'error'] == None])
+	ncached = len([result for result in results if result[u'cached']])
+	if ncached > 0:
+		print(u"skipped %d unchanged datasets" % ncached)
+	failed += len(results) - nanalysed
+	# combine the output of all analyses
+	if args.batch:
+		batchoutdir = libanalysis.combine_batch_output(settings, results, average=average)
+		print(u"combined output stored in '%s'" % batchoutdir)
+	print(u"analysed %d/%d datasets" % (nanalysed, len(results)))
+
+	if failed > 0:
+		return 1
+	return 0
+
+
+if __name__ == u'__main__':
+	sys.exit(main())
@@ -23,7 +23,7 @@
 __author__ = u"Edwin Dalmaijer"
 
 # CancellationTools
-from libhelper import check_colour
+from libhelper import get_colours, get_directories, get_font, render_text, StartupProfiler
 import libgui
 import libinput
 
@@ -35,7 +35,7 @@ import sys
 import pygame
 
 
-def run(directory, version=u"unknown", thisisandroid=False):
+def run(directory, version=u"unknown", thisisandroid=False, profiler=None):
 	
 	"""Runs the application
 	
@@ -49,7 +49,15 @@ def run(directory, version=u"unknown", thisisandroid=False):
 					(default = u'unknown')
 	thisisandroid	--	Boolean indicating if the app is running on Android
 					(default = False)
+	profiler		--	a StartupProfiler instance that measures the
+					start-up, which is reported once the starting screen
+					is shown, or None to not measure the start-up
+					(default = None)
 	"""
+	
+	# the start-up is only measured when a profiler is passed
+	if profiler == None:
+		profiler = StartupProfiler(enabled=False)
 
 	# # # # #
 	# SETTINGS
@@ -65,6 +73,7 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	
 	# initialize pygame
 	pygame.init()
+	profiler.mark(u'pygame.init')
 	
 	# the settings dict will contain the important settings, e.g. the paths to all
 	# directories
@@ -74,25 +83,8 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	# # # # #
 	# DIRECTORY
 	
-	# main and lib directories
-	settings[u'dir'] = {}
-	settings[u'dir'][u'main'] = directory
-	
-	# data directory
-	settings[u'dir'][u'data'] = os.path.join(settings[u'dir'][u'main'], u'data')
-	settings[u'dir'][u'out'] = os.path.join(settings[u'dir'][u'data'], u'output')
-	settings[u'dir'][u'rawout'] = os.path.join(settings[u'dir'][u'data'], u'raw')
-	settings[u'dir'][u'onlinedata'] = os.path.join(settings[u'dir'][u'data'], u'online')
-	
-	# resources
-	settings[u'dir'][u'res'] = os.path.join(settings[u'dir'][u'main'], u'resources')
-	settings[u'dir'][u'tasks'] = os.path.join(settings[u'dir'][u'res'], u'tasks')
-	settings[u'dir'][u'fonts'] = os.path.join(settings[u'dir'][u'res'], u'text', u'ubuntu-font-family-0.80')
-	settings[u'dir'][u'plotfont'] = os.path.join(settings[u'dir'][u'fonts'], u'Ubuntu-R.ttf')
-	settings[u'dir'][u'boldplotfont'] = os.path.join(settings[u'dir'][u'fonts'], u'Ubuntu-B.ttf')
-	
-	# browser
-	settings[u'dir'][u'browsing'] = os.path.join(settings[u'dir'][u'res'], u'tasks')
+	# all directories the app uses, based on the main directory
+	settings[u'dir'] = get_directories(directory)
 
 
 	# # # # #
@@ -116,42 +108,11 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	# save the display size in the settings
 	settings[u'dispsize'] = [w,h]
 	settings[u'dispcentre'] = [w/2,h/2]
+	profiler.mark(u'display info')
 	
 	# COLOURS
-	# these colours are all from the Tango theme, see:
-	# http://tango.freedesktop.org/Tango_Icon_Theme_Guidelines#Color_Palette
-	settings[u'colours'] = {	u'butter': 	[	u'#fce94f',
-										u'#edd400',
-										u'#c4a000'],
-						u'orange': 	[	u'#fcaf3e',
-										u'#f57900',
-										u'#ce5c00'],
-						u'chocolate': 	[	u'#e9b96e',
-										u'#c17d11',
-										u'#8f5902'],
-						u'chameleon': 	[	u'#8ae234',
-										u'#73d216',
-										u'#4e9a06'],
-						u'skyblue': 	[	u'#729fcf',
-										u'#3465a4',
-										u'#204a87'],
-						u'plum': 		[	u'#ad7fa8',
-										u'#75507b',
-										u'#5c3566'],
-						u'scarletred':	[	u'#ef2929',
-										u'#cc0000',
-										u'#a40000'],
-						u'aluminium':	[	u'#eeeeec',
-										u'#d3d7cf',
-										u'#babdb6',
-										u'#888a85',
-										u'#555753',
-										u'#2e3436']
-									}
-	# hex2rgb
-	for cn in settings[u'colours'].keys():
-		for i in range(len(settings[u'colours'][cn])):
-			settings[u'colours'][cn][i] = check_colour(settings[u'colours'][cn][i])
+	# these colours are all from the Tango theme (as RGB lists)
+	settings[u'colours'] = get_colours()
 	# foreground and background colours
 	settings[u'fgc'] = settings[u'colours'][u'aluminium'][0]
 	settings[u'bgc'] = settings[u'colours'][u'aluminium'][5]
@@ -168,22 +129,21 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	mediumfontsize = int(settings[u'dispsize'][0] * (12.0 / (1920-1024)))
 	# initialize pygame.font (should have been done alread, but just for safety)
 	pygame.font.init()
-	# create new Font instances
+	# font sizes; every font (size and style) is only loaded when it is first
+	# used (see libhelper.get_font and libhelper.render_text), except for the
+	# font of the loading message, which is needed straight away
 	settings[u'fontsize'] = {u'large':48, u'medium':mediumfontsize, u'small':12}
-	settings[u'font'] = {}
-	for s in settings[u'fontsize'].keys():
-		settings[u'font'][s] = {	u'regular':pygame.font.Font(os.path.join(settings[u'dir'][u'fonts'],u'Ubuntu-R.ttf'), settings[u'fontsize'][s]),
-							u'bold':pygame.font.Font(os.path.join(settings[u'dir'][u'fonts'],u'Ubuntu-B.ttf'), settings[u'fontsize'][s]),
-							u'italic':pygame.font.Font(os.path.join(settings[u'dir'][u'fonts'],u'Ubuntu-RI.ttf'), settings[u'fontsize'][s])
-							}
+	get_font(settings, size=u'large', style=u'regular')
+	profiler.mark(u'fonts')
 	
 	# DISPLAY	
 	# create the display
 	disp = pygame.display.set_mode(settings[u'dispsize'], pygame.FULLSCREEN)
 	# show a loading message
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"loading, please wait...", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"loading, please wait...", size=u'large', style=u'regular')
 	disp.blit(textsurf, (settings[u'dispcentre'][0]-textsurf.get_width()/2, settings[u'dispcentre'][1]-textsurf.get_height()/2))
 	pygame.display.flip()
+	profiler.mark(u'display')
 	
 	# SOUND
 	# initialize the mixer module
@@ -193,6 +153,7 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	# load all sounds
 	for s in settings[u'sounds'].keys():
 		settings[u'sounds'][s] = pygame.mixer.Sound(settings[u'sounds'][s])
+	profiler.mark(u'mixer')
 	
 	# ANDROID
 	# Android specific stuff, only do this if this is the Android app
@@ -232,6 +193,18 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	settings[u'analysisproperties'] = {}
 	settings[u'analysisproperties'][u'datapath'] = None
 	settings[u'analysisproperties'][u'disthreshold'] = 50
+	# number of worker processes for batch analyses (None for one per
+	# processor)
+	settings[u'analysisproperties'][u'nworkers'] = None
+	# output files of every analysis ('measures', 'heatmaps', or 'full'; see
+	# Analysis.run)
+	settings[u'analysisproperties'][u'output'] = u'full'
+	# resolution (dots per inch) of the images in the summary PDF, and the
+	# maximal size of the PDF in bytes (None for no maximum; see
+	# Analysis.summary_pdf)
+	settings[u'analysisproperties'][u'pdfdpi'] = 150
+	settings[u'analysisproperties'][u'pdfmaxsize'] = 524288
+	profiler.mark(u'settings')
 	
 	
 	# # # # #
@@ -280,6 +253,7 @@ def run(directory, version=u"unknown", thisisandroid=False):
 
 	# starting screen (and associated buttons)
 	settings[u'guiscreens'][u'start'], settings[u'guibuttons'][u'start'] = libgui.startscreen(settings)
+	profiler.mark(u'libgui.startscreen')
 	
 
 	# # # # #
@@ -298,16 +272,20 @@ def run(directory, version=u"unknown", thisisandroid=False):
 	# show start screen
 	disp.blit(settings[u'guiscreens'][settings[u'currentscreen']], (0,0))
 	pygame.display.flip()
+	profiler.mark(u'start screen')
+	profiler.report()
 	
 	# loop until a task or an anlysis is started
 	while settings[u'running']:
+		# wait for a keypress or a mouseclick (in one go, so that no events
+		# are lost in between; this also allows an Android interrupt)
+		event = libinput.wait_event(settings, types=[pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN])
 		# check if the Escape key is pressed
-		if libinput.check_escape():
+		if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
 			settings[u'running'] = False
-		# wait for a (left) mouseclick
-		butt, pos = libinput.check_mouseclicks()
 		# check if the left button got pressed
-		if butt == 1:
+		if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+			pos = event.pos
 			# loop through buttons, to check which got pressed
 			for b in settings[u'guibuttons'][settings[u'currentscreen']].keys():
 				# check if the current button was clicked
@@ -318,8 +296,9 @@ def run(directory, version=u"unknown", thisisandroid=False):
 					settings = settings[u'guibuttons'][settings[u'currentscreen']][b][u'onclick'](settings)
 					# unset current button
 					settings[u'currentbutton'] = None
-					# wait for a bit, to allow for unclicking
-					pygame.time.wait(200)
+					# ignore the clicks that were made while the button's
+					# function was running (like before clicks were events)
+					pygame.event.clear(pygame.MOUSEBUTTONDOWN)
 					# break the for loop that's checking all buttons from the
 					# now previous screen
 					break
@@ -329,17 +308,14 @@ def run(directory, version=u"unknown", thisisandroid=False):
 				if libinput.check_click(pos, settings[u'topbuttons'][b][u'rect']):
 					# call 'onclick' function, and wait for it to return
 					settings = settings[u'topbuttons'][b][u'onclick'](settings)
-					# wait for a bit, to allow for unclicking
-					pygame.time.wait(200)
+					# ignore the clicks that were made while the button's
+					# function was running (like before clicks were events)
+					pygame.event.clear(pygame.MOUSEBUTTONDOWN)
 					# stop checking the other buttons
 					break
 		# update the screen history
 		if settings[u'currentscreen'] != settings[u'screenhistory'][-1]:
 			settings[u'screenhistory'].append(settings[u'currentscreen'])
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
 
 	
 	# # # # #
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CancellationTools
+#
+# CancellationTools is open-source software for running cancellation tasks,
+# and directly analysing the data they produce.
+#
+# Copyright (C) 2014, Edwin S. Dalmaijer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+"""Converts raw data text files to the binary raw data format (see libdata),
+which an Analysis reads without parsing any text; usage:
+
+	python -m libcancellation.convert [options] <paths...>
+
+every path can be a raw data directory (data/raw/<dataset>), or a text file
+produced by an online task; with the --batch option, every path is a data
+directory (e.g. data/raw or data/online) of which all datasets are
+converted; the text files are left in place; the exit status is 0 when all
+datasets were converted, and 1 when any of them failed
+"""
+
+__author__ = u"Edwin Dalmaijer"
+
+# native
+import argparse
+import os
+import sys
+
+# CancellationTools
+from libdata import convert_dataset
+
+
+# # # # #
+# FUNCTIONS
+
+def main(argv=None):
+
+	"""Parses the command line arguments, and converts all passed datasets
+
+	keyword arguments
+
+	argv			-	list of command line arguments, or None to use
+					sys.argv (default = None)
+
+	returns
+
+	status		-	0 if all datasets were converted, 1 if any of them
+					failed
+	"""
+
+	# COMMAND LINE
+	parser = argparse.ArgumentParser(prog=u"python -m libcancellation.convert", \
+		description=u"Converts raw data text files to the binary raw data format.")
+	parser.add_argument(u'paths', nargs=u'+', metavar=u'path', \
+		help=u"raw data directory or online task text file (or a data directory with --batch)")
+	parser.add_argument(u'-b', u'--batch', action=u'store_true', \
+		help=u"convert all datasets in the passed data directories")
+	args = parser.parse_args(argv)
+
+	# DATASETS
+	datapaths = []
+	for path in args.paths:
+		path = os.path.abspath(path)
+		if args.batch:
+			for name in sorted(os.listdir(path)):
+				# local datasets are directories, online datasets are text
+				# files (but not the README)
+				if os.path.isdir(os.path.join(path, name)) or \
+					(os.path.splitext(name)[1] == u'.txt' and name != u'README.txt'):
+					datapaths.append(os.path.join(path, name))
+		else:
+			datapaths.append(path)
+
+	# CONVERSION
+	failed = 0
+	for datapath in datapaths:
+		try:
+			binpath = convert_dataset(datapath)
+			print(u"converted '%s' to '%s'" % (datapath, binpath))
+		except (IOError, OSError, ValueError) as e:
+			failed += 1
+			sys.stderr.write(u"error: failed to convert '%s': %s\n" % (datapath, e))
+	print(u"converted %d/%d datasets" % (len(datapaths)-failed, len(datapaths)))
+
+	if failed > 0:
+		return 1
+	return 0
+
+
+if __name__ == u'__main__':
+	sys.exit(main())
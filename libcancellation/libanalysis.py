@@ -23,24 +23,22 @@
 __author__ = u"Edwin Dalmaijer"
 
 # CancellationTools
-from libhelper import gaussian, intersection, pearsonr
-from libinput import check_mouseclicks
+from libdata import is_dataset, raw_file, read_meta, read_raw, read_tsv
+from libhelper import alpha_blend, downscale, gaussian_heatmap, heatmap_rgba, path_intersections, pearsonr, get_font, render_text, write_png, PointIndex
+from libinput import wait_for_click
 
 # native
 import copy
-import math
+import csv
+import hashlib
+import itertools
+import multiprocessing
 import os
 
 # external
 from matplotlib import font_manager, image, pyplot
 import numpy
 import pygame
-# try importing Android, to support the Android app
-try:
-	import android
-# if the import fails, we're probably not running the Android app, so no panic
-except:
-	pass
 
 # DEBUG #
 #from androidfriendly.matplotlib import font_manager, image, pyplot
@@ -48,14 +46,109 @@ except:
 # # # # #
 
 
+# # # # #
+# MEASURES
+
+# all measures that an Analysis can calculate; every measure is calculated by
+# an Analysis method (the first value), after all the measures it needs as an
+# input (the second value) have been calculated (see Analysis.compute)
+MEASURES = {	u'tarcors':			(u'read_target_cors', []),
+			u'ctcors':			(u'clicks_to_targets', [u'tarcors']),
+			u'omissions':		(u'calc_omissions', [u'tarcors', u'ctcors']),
+			u'coc':			(u'calc_centre_of_cancellation', [u'tarcors', u'ctcors']),
+			u'revisits_tot':		(u'calc_total_revisits', [u'tarcors', u'ctcors']),
+			u'path':			(u'calc_path', [u'ctcors']),
+			u'revisits_imm':		(u'calc_immediate_revisits', [u'path']),
+			u'revisits_del':		(u'calc_delayed_revisits', [u'revisits_tot', u'revisits_imm']),
+			u'interdist':		(u'calc_mean_interdist', [u'path']),
+			u'stand_interdist':	(u'calc_stand_interdist', [u'tarcors', u'interdist']),
+			u'intertime':		(u'calc_mean_intertime', [u'path']),
+			u'searchspeed':		(u'calc_search_speed', [u'interdist', u'intertime']),
+			u'qscore':			(u'calc_qscore', [u'tarcors', u'omissions']),
+			u'angle':			(u'calc_mean_angle', [u'path']),
+			u'stand_angle':		(u'calc_stand_angle', [u'angle']),
+			u'bestr':			(u'calc_best_r', [u'ctcors']),
+			u'intersections':		(u'calc_intersect_rate', [u'ctcors', u'revisits_imm']),
+			u'firstcancel':		(u'calc_first_cancellation', [u'ctcors']),
+			u'heatmapmax':		(u'_heatmap_maximum', [u'tarcors'])
+			}
+
+# the output profiles of an analysis (see Analysis.run): only the summary text
+# file with all measures, the summary and the raw heatmap data, or all text
+# files, raw data, plots and the PDF
+OUTPUT_PROFILES = [u'measures', u'heatmaps', u'full']
+
+# default resolution (dots per inch) of the images in the summary PDF, and the
+# default maximal size of the PDF file (bytes, or None for no maximum); the
+# resolution is lowered until the PDF fits (but not below PDFMINDPI)
+PDFDPI = 150
+PDFMAXSIZE = 524288
+PDFMINDPI = 36
+
+# the measures that are reported in the summary files
+SUMMARY_MEASURES = [u'omissions', u'coc', u'revisits_tot', u'revisits_imm', \
+	u'revisits_del', u'interdist', u'stand_interdist', u'intertime', \
+	u'searchspeed', u'qscore', u'angle', u'stand_angle', u'bestr', \
+	u'intersections', u'firstcancel']
+
+# the columns of the summary files (see Analysis.summary_record), and their
+# types in the binary batch summary (see combine_batch_output)
+SUMMARY_COLUMNS = [	(u'ppname', unicode), (u'taskname', unicode), \
+			(u'testdate', unicode), (u'testtime', unicode), \
+			(u'om_tot', int), (u'om_left', int), (u'om_right', int), \
+			(u'revisits_tot', int), (u'revisits_imm', int), (u'revisits_del', int), \
+			(u'CoC_hor', float), (u'CoC_ver', float), \
+			(u'duration', int), (u'mean_intertime', float), (u'Qscore', float), \
+			(u'mean_interdist', float), (u'stand_interdist', float), (u'speed', float), \
+			(u'mean_angle', float), (u'stand_angle', float), \
+			(u'bestR', float), (u'hor_R', float), (u'ver_R', float), \
+			(u'intersect_tot', int), (u'intersect_rate', float), \
+			(u'first_cancel_x', float), (u'first_cancel_y', float), (u'first_quadrant', unicode)]
+
+# the columns of the batch summary files: the data set's name, its status
+# ('analysed', 'empty', or 'failed'), the error of failed data sets, and all
+# summary columns (which are missing for empty and failed data sets)
+BATCH_COLUMNS = [(u'dataset', unicode), (u'status', unicode), (u'error', unicode)] + SUMMARY_COLUMNS
+
+# Matplotlib font properties of the plot fonts, which are shared by all
+# analyses (see _font_properties); keys are the paths to the font files
+_FONTPROPCACHE = {}
+
+
 # # # # #
 # FUNCTIONS
 
+def analysis_settings(settings):
+	
+	"""Returns a copy of the part of the app settings that an Analysis needs;
+	unlike the full settings dict (which contains fonts, sounds, and GUI
+	screens), this can be sent to other processes
+	
+	arguments
+	
+	settings		-	app settings dict, which includes a dict on the
+					analysis properties
+	
+	returns
+	
+	asettings		-	dict with the keys 'version', 'android', 'dir',
+					'colours', and 'analysisproperties'
+	"""
+	
+	asettings = {	u'version':settings[u'version'],
+				u'android':False,
+				u'dir':copy.deepcopy(settings[u'dir']),
+				u'colours':copy.deepcopy(settings[u'colours']),
+				u'analysisproperties':copy.deepcopy(settings[u'analysisproperties'])}
+	
+	return asettings
+
+
 def batch_analysis(settings):
 	
 	"""Runs an analysis for every single dataset that is in the data folder,
-	saving the output while running; afterwards all the output text files are
-	read and their content is combined into a single text file
+	saving the output while running; afterwards the measures of all datasets
+	are combined into a single table (see combine_batch_output)
 	
 	arguments
 	
@@ -76,126 +169,635 @@ def batch_analysis(settings):
 		datadir = settings[u'dir'][u'onlinedata']
 	else:
 		datadir = settings[u'dir'][u'rawout']
-	# loop through all data folders
-	alldata = os.listdir(datadir)
-	for i in range(len(alldata)):
-		# set the new datafile
-		settings[u'analysisproperties'][u'datapath'] = os.path.join(datadir, alldata[i])
-		# show waiting message
+	# get all data sets
+	alldata = list_datasets(datadir)
+	
+	# function to show the progress, which is called every time a data set
+	# has been analysed (the text changes every time, so it is not cached)
+	font = get_font(settings, size=u'large', style=u'regular')
+	def show_progress(ndone, ntotal, result):
 		disp.fill(settings[u'bgc'])
-		textsurf = settings[u'font'][u'large'][u'regular'].render(u"running analysis %d/%d, please wait..." % (i+1, len(alldata)), False, settings[u'fgc'])
+		textsurf = font.render(u"running analysis %d/%d, please wait..." % (min(ndone+1,ntotal), ntotal), False, settings[u'fgc'])
 		disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2)))
 		pygame.display.flip()
-		# prepare new Analysis
-		analysis = Analysis(settings)
-		# run analysis
-		analysis.run()
+	# show waiting message
+	show_progress(0, len(alldata), None)
+	
+	# run the analyses (in parallel, if there are multiple processors)
+	# (only the data sets that are new or changed since the previous batch
+	# are analysed)
+	average = HeatmapAverage()
+	results = run_batch(settings, alldata, nworkers=settings[u'analysisproperties'][u'nworkers'], progress=show_progress, average=average, incremental=True)
 	
 	# show waiting message
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"combining %d data files, please wait..." % (len(alldata)), False, settings[u'fgc'])
+	textsurf = font.render(u"combining %d data files, please wait..." % (len(alldata)), False, settings[u'fgc'])
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
-	# create a new output folder
-	batchoutdir = os.path.join(settings[u'dir'][u'out'], u'batch')
-	if not os.path.isdir(batchoutdir):
-		os.mkdir(batchoutdir)
-
-	# create a new text file in the new output folder
-	batchtxt = open(os.path.join(batchoutdir, u'summary.txt'), u'w')
-	# loop through all output textfiles
-	i = 0
-	for dataset in alldata:
-		# only use if the dataset is in fact a data set
-		if os.path.isdir(os.path.join(settings[u'dir'][u'out'], dataset)):
-			# read the textfile
-			txtfile = open(os.path.join(settings[u'dir'][u'out'], dataset, u'summary.txt'), u'r')
-			lines = txtfile.readlines()
-			# write the line to the output (and the header if this is the
-			# first file that is being read)
-			if i == 0:
-				batchtxt.write(lines[0])
-			batchtxt.write(lines[1] + u'\n')
-			# increase iteration number
-			i += 1
-	# close batch text file
-	batchtxt.close()
-	
-	# average all the heatmaps
-	# create an empty dict, with empty lists to contain data per maptype
-	heatmapdata = {}
-	maptypes = [u'cancellation', u'intersection', u'omission']
-	for maptype in maptypes:
-		heatmapdata[maptype] = []
-	# go through all datasets and tasktypes, to collect all heatmap data
-	for dataset in alldata:
-		# only use if the dataset is in fact a data set
-		if os.path.isdir(os.path.join(settings[u'dir'][u'out'], dataset)):
-			# collect datasets
-			for maptype in maptypes:
-				# load data
-				hm = numpy.load(os.path.join(settings[u'dir'][u'out'], dataset, u'raw_heatmap_data_%s.npy' % maptype))
-				# proportionalize data
-				hm = hm / numpy.nanmax(hm)
-				# store data
-				heatmapdata[maptype].append(copy.deepcopy(hm))
-
-	# go through map types again, to create average heatmap plots
-	for maptype in maptypes:
-		# average datasets
-		heatmapdata[maptype] = numpy.nansum(numpy.array(heatmapdata[maptype]), axis=0) / len(alldata)
-		
-		# dots per inch (float!)
-		dpi = 100.0
-		# image size in pixels
-		dispsize = (int(numpy.size(heatmapdata[maptype],axis=1)),int(numpy.size(heatmapdata[maptype],axis=0)))
-		# image size in inches
-		figsize = (dispsize[0]/dpi, dispsize[1]/dpi)
-
-		# create a new figure
-		fig = pyplot.figure(figsize=figsize, dpi=dpi, frameon=False)
-		ax = pyplot.Axes(fig, [0,0,1,1])
-		ax.set_axis_off()
-		fig.add_axes(ax)
-		# draw heatmap
-		ax.imshow(heatmapdata[maptype], cmap=u'jet', alpha=1, vmin=0, vmax=1)
-		# set the axis to the display size
-		ax.axis([0,dispsize[0],0,dispsize[1]])
-		# remove the axis grid
-		ax.axis(u'off')
-		# invert the y axis, as (0,0) is top left on a display
-		ax.invert_yaxis()
-		# save figure
-		fig.savefig(os.path.join(batchoutdir, u'%s_average_heatmap.png' % maptype))
+	# combine the output of all analyses
+	combine_batch_output(settings, results, average=average)
 	
 	# show ending screen
+	nfailed = len([result for result in results if result[u'error'] != None])
+	if nfailed > 0:
+		text = u"the analysis was completed, but %d/%d datasets failed" % (nfailed, len(results))
+	else:
+		text = u"the analysis was succesfully completed"
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"the analysis was succesfully completed", False, settings[u'fgc'])
+	textsurf = font.render(text, False, settings[u'fgc'])
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"(click to return to the main menu)", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"(click to return to the main menu)", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(2*settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
-	# wait for a click (allowing some time to unclick)
-	pygame.time.wait(200)
-	while check_mouseclicks()[0] == None:
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+	# wait for a click (ignoring the clicks that were made before the message
+	# was shown; this also allows an Android interrupt)
+	wait_for_click(settings, discard=True)
 	
 	# switch back to start screen
 	settings[u'currentscreen'] = u'start'
 	disp.blit(settings[u'guiscreens'][settings[u'currentscreen']], (0,0))
 	pygame.display.flip()
 	
-	# allow a bit of time to unclick
-	pygame.time.wait(200)
-	
 	return settings
 
 
+def combine_batch_output(settings, results, average=None):
+	
+	"""Combines the output of a batch of analyses: the summary records of all
+	data sets are written to a single table, and all heatmaps are averaged;
+	the output is stored in the 'batch' directory in the output directory,
+	together with a list of data sets that could not be analysed; the table
+	is written as a text file with the analysed data sets (summary.txt), and
+	as a CSV file and a binary NumPy file with a row for every data set
+	(summary.csv and summary.npy, see BATCH_COLUMNS); in the binary file,
+	missing values are -1 for integers, NaN for floats, and empty strings
+	for text; the number of data sets behind every average heatmap is
+	written to a text file (average_heatmaps.txt)
+	
+	arguments
+	
+	settings		-	app settings dict
+	results		-	list of result dicts, as returned by run_batch
+	
+	keyword arguments
+	
+	average		-	HeatmapAverage instance that was passed to
+					run_batch, or None to read the raw heatmap data of
+					all data sets from their output directories
+					(default = None)
+	
+	returns
+	
+	batchoutdir	-	full path to the directory containing the combined
+					output
+	"""
+	
+	# create a new output folder
+	batchoutdir = os.path.join(settings[u'dir'][u'out'], u'batch')
+	if not os.path.isdir(batchoutdir):
+		os.mkdir(batchoutdir)
+	
+	# sort the results, as the analyses could have finished in any order
+	results = sorted(results, key=lambda result: result[u'datapath'])
+	# only use the data sets that were analysed (empty data sets do not
+	# produce any output)
+	outdirs = [result[u'outdir'] for result in results if result[u'status'] == u'analysed']
+	
+	# write the errors of all failed data sets to a text file
+	errtxt = open(os.path.join(batchoutdir, u'errors.txt'), u'w')
+	for result in results:
+		if result[u'error'] != None:
+			errtxt.write(u"%s\t%s\n" % (result[u'datapath'], result[u'error']))
+	errtxt.close()
+	
+	# SUMMARY TABLE
+	# a row for every data set, with None for all missing values
+	rows = []
+	for result in results:
+		row = [os.path.basename(result[u'datapath']), result[u'status'], result[u'error']]
+		if result[u'record'] != None:
+			row.extend(result[u'record'])
+		else:
+			row.extend([None] * len(SUMMARY_COLUMNS))
+		rows.append(row)
+	
+	# text file with the analysed data sets (like a single summary.txt)
+	batchtxt = open(os.path.join(batchoutdir, u'summary.txt'), u'w')
+	batchtxt.write(u"\t".join([name for name, dtype in SUMMARY_COLUMNS]) + u"\n")
+	for result in results:
+		if result[u'record'] != None:
+			batchtxt.write(u"\t".join([_summary_text(value, dtype) for value, (name, dtype) in zip(result[u'record'], SUMMARY_COLUMNS)]) + u"\n")
+	batchtxt.close()
+	
+	# CSV file with all data sets (missing values are empty)
+	batchcsv = open(os.path.join(batchoutdir, u'summary.csv'), 'wb')
+	writer = csv.writer(batchcsv)
+	writer.writerow([name.encode(u'utf-8') for name, dtype in BATCH_COLUMNS])
+	for row in rows:
+		writer.writerow([u'' if value == None else _summary_text(value, dtype).encode(u'utf-8') for value, (name, dtype) in zip(row, BATCH_COLUMNS)])
+	batchcsv.close()
+	
+	# binary file with all data sets: a NumPy structured array, with a
+	# field of the right type for every column
+	missing = {unicode:u'', int:-1, float:numpy.nan}
+	dtypes = []
+	for i in range(len(BATCH_COLUMNS)):
+		name, dtype = BATCH_COLUMNS[i]
+		if dtype == unicode:
+			# text fields need a (maximal) length
+			length = max([1] + [len(unicode(row[i])) for row in rows if row[i] != None])
+			dtypes.append((name.encode(u'ascii'), u'U%d' % length))
+		elif dtype == int:
+			dtypes.append((name.encode(u'ascii'), numpy.int64))
+		else:
+			dtypes.append((name.encode(u'ascii'), numpy.float64))
+	# (the values are stored at their full precision, as new and cached
+	# records are both typed values, see _read_manifest)
+	table = numpy.zeros(len(rows), dtype=dtypes)
+	for j in range(len(rows)):
+		table[j] = tuple([missing[BATCH_COLUMNS[i][1]] if rows[j][i] == None else BATCH_COLUMNS[i][1](rows[j][i]) for i in range(len(BATCH_COLUMNS))])
+	numpy.save(os.path.join(batchoutdir, u'summary.npy'), table)
+	
+	# HEATMAPS
+	# without heatmaps from the workers (see run_batch), the raw heatmap
+	# data of all data sets is read, one heatmap at a time
+	if average == None:
+		average = HeatmapAverage()
+		for outdir in outdirs:
+			for maptype in HeatmapAverage.maptypes:
+				# the raw heatmap data is not produced by all output profiles
+				if os.path.isfile(os.path.join(outdir, u'raw_heatmap_data_%s.npy' % maptype)):
+					average.add(maptype, numpy.load(os.path.join(outdir, u'raw_heatmap_data_%s.npy' % maptype)))
+	# the number of data sets behind every average heatmap
+	avgtxt = open(os.path.join(batchoutdir, u'average_heatmaps.txt'), u'w')
+	avgtxt.write(u"maptype\twidth\theight\tn")
+	# create the average heatmap plots
+	averages = average.averages()
+	for maptype, dispsize, heatmap, n in averages:
+		avgtxt.write(u"\n%s\t%d\t%d\t%d" % (maptype, dispsize[0], dispsize[1], n))
+		# heatmaps of tasks with different sizes are averaged separately
+		if len([mt for mt, size, hm, nhm in averages if mt == maptype]) > 1:
+			imgname = u'%s_average_heatmap_%dx%d.png' % (maptype, dispsize[0], dispsize[1])
+		else:
+			imgname = u'%s_average_heatmap.png' % maptype
+		
+		# draw heatmap, and save it
+		write_png(os.path.join(batchoutdir, imgname), _heatmap_image(heatmap_rgba(heatmap, vmin=0, vmax=1)))
+	avgtxt.close()
+	
+	return batchoutdir
+
+
+def _summary_text(value, dtype):
+	
+	"""For internal use! Returns the text form of a value in a summary
+	column, as it is written to the batch summary files and the manifest
+	(see combine_batch_output and _write_manifest); the value is cast to the
+	column's type first, so that every file follows BATCH_COLUMNS, and
+	floats are written with repr, so that they keep their full precision
+	(unicode only keeps 12 digits)
+	
+	arguments
+	
+	value			-	value of a summary column
+	dtype			-	type of the column (see BATCH_COLUMNS)
+	
+	returns
+	
+	text			-	unicode string
+	"""
+	
+	if dtype == float:
+		return unicode(repr(float(value)))
+	return unicode(dtype(value))
+
+
+def _heatmap_image(rgba, background=255):
+	
+	"""For internal use! Positions a coloured heatmap (see heatmap_rgba) in
+	an image of the same size, like it used to be drawn in a Matplotlib
+	figure: the heatmap is shifted up by one pixel, and the bottom row of
+	the image shows the background
+	
+	arguments
+	
+	rgba			-	NumPy array of the coloured heatmap
+	
+	keyword arguments
+	
+	background	-	value of all channels of the bottom row: 255 for
+					white, or 0 for transparent (default = 255)
+	
+	returns
+	
+	img			-	NumPy array of the image (same shape as rgba)
+	"""
+	
+	img = numpy.empty_like(rgba)
+	img[:-1] = rgba[1:]
+	img[-1] = background
+	
+	return img
+
+
+def _font_properties(path):
+	
+	"""For internal use! Returns the Matplotlib font properties of a font
+	file; these are only created once for every font, and shared by all
+	analyses (Matplotlib copies them into every text it draws)
+	
+	arguments
+	
+	path			-	full path to a font file
+	
+	returns
+	
+	fontprop		-	a matplotlib.font_manager.FontProperties instance
+	"""
+	
+	if path not in _FONTPROPCACHE.keys():
+		_FONTPROPCACHE[path] = font_manager.FontProperties(fname=path)
+	
+	return _FONTPROPCACHE[path]
+
+
+def list_datasets(datadir):
+	
+	"""Returns the full paths to all data sets in a data directory; for local
+	tasks these are the directories in the raw data directory, for online
+	tasks these are the text files in the online data directory
+	
+	arguments
+	
+	datadir		-	full path to a data directory
+	
+	returns
+	
+	datapaths		-	a sorted list of full paths to all data sets
+	"""
+	
+	datapaths = []
+	for name in sorted(os.listdir(datadir)):
+		path = os.path.join(datadir, name)
+		if is_dataset(path):
+			datapaths.append(path)
+	
+	return datapaths
+
+
+def run_batch(settings, datapaths, nworkers=None, progress=None, output=None, average=None, incremental=False):
+	
+	"""Runs an analysis on all the passed data sets, every data set in a
+	separate worker process; a data set that fails does not stop the others
+	from being analysed; in an incremental batch, only the data sets that
+	are new or that changed since they were last analysed are analysed
+	again (see _dataset_key), and the results of all others are taken
+	from the manifest in the output directory (manifest.txt)
+	
+	arguments
+	
+	settings		-	app settings dict, which includes a dict on the
+					analysis properties
+	datapaths		-	list of full paths to data sets
+	
+	keyword arguments
+	
+	nworkers		-	integer indicating the number of worker processes,
+					or None to use one for every processor; with 1 worker
+					all data sets are analysed in the current process
+					(default = None)
+	progress		-	function that is called every time a data set has
+					been analysed, with three arguments: the number of
+					analysed data sets, the total number of data sets,
+					and the result dict of the latest data set; or None
+					to not report progress (default = None)
+	output		-	string indicating which output files should be
+					produced for every data set (see Analysis.run), or
+					None to use the 'output' analysis property
+					(default = None)
+	average		-	HeatmapAverage instance, to which the workers' raw
+					heatmap data of every analysed data set is added
+					as soon as it comes in, or None to not collect the
+					heatmaps (default = None)
+	incremental	-	Boolean indicating whether data sets that have not
+					changed since their last analysis should be skipped
+					(default = False)
+	
+	returns
+	
+	results		-	list of result dicts (the skipped data sets first,
+					then the others in order of completion), each
+					with the keys 'datapath', 'outdir' (the output
+					directory, or None), 'status' ('analysed', 'empty',
+					or 'failed'), 'record' (the values of all summary
+					columns, see Analysis.summary_record; or None),
+					'error' (None, or a description of what went
+					wrong), and 'cached' (True for skipped data sets)
+	"""
+	
+	# all jobs get their own settings, containing only what they need
+	asettings = analysis_settings(settings)
+	if output != None:
+		asettings[u'analysisproperties'][u'output'] = output
+	else:
+		output = asettings[u'analysisproperties'].get(u'output', u'full')
+	
+	# INCREMENTAL
+	# the results of unchanged data sets are taken from the manifest, with
+	# their heatmaps from their output directories
+	results = []
+	if incremental:
+		manifestpath = os.path.join(settings[u'dir'][u'out'], u'manifest.txt')
+		manifest = _read_manifest(manifestpath)
+		if os.path.isfile(manifestpath):
+			manifesttime = os.path.getmtime(manifestpath)
+		else:
+			manifesttime = 0
+		keys = {}
+		todo = []
+		for datapath in datapaths:
+			keys[datapath] = _dataset_key(asettings, datapath)
+			entry = manifest.get(os.path.abspath(datapath), None)
+			# a data set is analysed again when it changed, or when its
+			# output files are missing or were written after the manifest
+			# (e.g. by an analysis outside of an incremental batch)
+			if keys[datapath] == None or entry == None or entry[u'key'] != keys[datapath] \
+				or not _outputs_intact(entry[u'outdir'], entry[u'status'], output, manifesttime):
+				todo.append(datapath)
+				continue
+			result = {u'datapath':datapath, u'outdir':entry[u'outdir'], u'status':entry[u'status'], u'record':entry[u'record'], u'error':None, u'cached':True}
+			if average != None and result[u'status'] == u'analysed' and output != u'measures':
+				for maptype in HeatmapAverage.maptypes:
+					average.add(maptype, numpy.load(os.path.join(result[u'outdir'], u'raw_heatmap_data_%s.npy' % maptype)))
+			results.append(result)
+		datapaths = todo
+	
+	jobs = [(asettings, datapath, average != None) for datapath in datapaths]
+	
+	# determine the number of processes
+	if nworkers == None:
+		try:
+			nworkers = multiprocessing.cpu_count()
+		except NotImplementedError:
+			nworkers = 1
+	nworkers = max(1, min(nworkers, len(jobs)))
+	
+	# Android does not support multiprocessing, so the analyses are run in
+	# the current process there (and whenever one worker is requested)
+	if nworkers > 1 and not settings[u'android']:
+		pool = multiprocessing.Pool(processes=nworkers)
+		analyses = pool.imap_unordered(_batch_worker, jobs, chunksize=1)
+	else:
+		pool = None
+		analyses = itertools.imap(_batch_worker, jobs)
+	
+	# collect the results while the workers are running
+	ndone = 0
+	for result in analyses:
+		# add the heatmaps to the running average, rather than keeping
+		# them all in memory
+		if u'heatmaps' in result.keys():
+			for maptype in result[u'heatmaps'].keys():
+				average.add(maptype, result[u'heatmaps'][maptype])
+			del result[u'heatmaps']
+		results.append(result)
+		ndone += 1
+		if progress != None:
+			progress(ndone, len(jobs), result)
+	
+	# neatly shut down the worker processes
+	if pool != None:
+		pool.close()
+		pool.join()
+	
+	# store the keys of all new results in the manifest (failed data sets
+	# are not stored, so that they are analysed again next time)
+	if incremental:
+		for result in results:
+			if result[u'cached']:
+				continue
+			if result[u'status'] == u'failed' or keys[result[u'datapath']] == None:
+				manifest.pop(os.path.abspath(result[u'datapath']), None)
+			else:
+				manifest[os.path.abspath(result[u'datapath'])] = {u'key':keys[result[u'datapath']], u'status':result[u'status'], u'outdir':result[u'outdir'], u'record':result[u'record']}
+		_write_manifest(manifestpath, manifest)
+	
+	return results
+
+
+def _dataset_key(settings, datapath):
+	
+	"""For internal use! Returns the key of a data set in the manifest of an
+	incremental batch (see run_batch): a hash of the raw data file, of the
+	task's files, of the analysis parameters, and of the software version;
+	when any of these changes, the data set is analysed again
+	
+	arguments
+	
+	settings		-	analysis settings dict (see analysis_settings)
+	datapath		-	full path to a data set
+	
+	returns
+	
+	key			-	hexadecimal string, or None if the data set could
+					not be read
+	"""
+	
+	key = hashlib.sha1()
+	try:
+		# raw data and task files (read in blocks, as raw data files can
+		# be large)
+		paths = [raw_file(datapath)]
+		meta = read_meta(datapath)
+		if u'taskname' in meta.keys():
+			for name in [u'targets.txt', u'task.png']:
+				paths.append(os.path.join(settings[u'dir'][u'tasks'], meta[u'taskname'], name))
+		for path in paths:
+			if os.path.isfile(path):
+				with open(path, 'rb') as f:
+					for block in iter(lambda: f.read(1048576), ''):
+						key.update(block)
+	except (IOError, OSError, ValueError):
+		return None
+	# analysis parameters and version (the PDF options only matter to the
+	# profile that produces a PDF)
+	properties = settings[u'analysisproperties']
+	output = properties.get(u'output', u'full')
+	key.update(u"%s %s %s" % (settings[u'version'], properties[u'disthreshold'], output))
+	if output == u'full':
+		key.update(u" %s %s" % (properties.get(u'pdfdpi', PDFDPI), properties.get(u'pdfmaxsize', PDFMAXSIZE)))
+	
+	return key.hexdigest()
+
+
+def _outputs_intact(outdir, status, output, since):
+	
+	"""For internal use! Checks if the output directory of a data set in the
+	manifest of an incremental batch (see run_batch) still contains all the
+	files that its analysis produced, and that none of them was written
+	after the manifest
+	
+	arguments
+	
+	outdir		-	full path to the data set's output directory
+	status		-	the data set's status ('analysed' or 'empty')
+	output		-	output profile of the analysis (see Analysis.run)
+	since			-	time (in seconds since the epoch) at which the
+					manifest was written
+	
+	returns
+	
+	intact		-	Boolean indicating whether all output files exist,
+					and were not written after the manifest
+	"""
+	
+	# the files that Analysis.run produces
+	if status == u'analysed':
+		names = [u'summary.txt']
+		if output in [u'heatmaps', u'full']:
+			names.extend([u'raw_heatmap_data_%s.npy' % maptype for maptype in HeatmapAverage.maptypes])
+		if output == u'full':
+			names.extend([u'cancellation_path.png', u'best_r_plots.png', u'summary.pdf'])
+			for maptype in HeatmapAverage.maptypes:
+				names.extend([u'%s_heatmap.png' % maptype, u'%s_heatmap_transparant.png' % maptype, \
+					u'%s_heatmap_superimposed.png' % maptype])
+	else:
+		names = [u'empty.txt']
+	
+	for name in names:
+		path = os.path.join(outdir, name)
+		if not os.path.isfile(path) or os.path.getmtime(path) > since:
+			return False
+	
+	return True
+
+
+def _read_manifest(path):
+	
+	"""For internal use! Reads the manifest of an incremental batch (see
+	run_batch); a manifest that can not be read is ignored
+	
+	arguments
+	
+	path			-	full path to the manifest file
+	
+	returns
+	
+	manifest		-	dict with a dict for every data set's full path,
+					containing the keys 'key', 'status', 'outdir', and
+					'record' (a list of the values of the summary
+					columns, of the types in SUMMARY_COLUMNS; or None)
+	"""
+	
+	manifest = {}
+	if not os.path.isfile(path):
+		return manifest
+	columns = [u'datapath', u'key', u'status', u'outdir'] + [name for name, dtype in SUMMARY_COLUMNS]
+	try:
+		data = read_tsv(path, dict([(col, object) for col in columns]))
+	# e.g. a manifest of an older version, with other columns
+	except (IOError, ValueError):
+		return manifest
+	for i in range(len(data[u'datapath'])):
+		entry = {u'key':data[u'key'][i], u'status':data[u'status'][i], u'outdir':data[u'outdir'][i], u'record':None}
+		if entry[u'status'] == u'analysed':
+			# a record that can not be read is analysed again
+			try:
+				entry[u'record'] = [dtype(data[name][i]) for name, dtype in SUMMARY_COLUMNS]
+			except ValueError:
+				continue
+		manifest[data[u'datapath'][i]] = entry
+	
+	return manifest
+
+
+def _write_manifest(path, manifest):
+	
+	"""For internal use! Writes the manifest of an incremental batch (see
+	_read_manifest); the file is written under a temporary name first, so
+	that an interrupted batch never leaves a half-written manifest; the
+	values are written like in the batch summary files (see _summary_text),
+	so that they are read back without any loss of precision
+	
+	arguments
+	
+	path			-	full path to the manifest file
+	manifest		-	dict with a dict for every data set's path (see
+					_read_manifest)
+	"""
+	
+	columns = [u'datapath', u'key', u'status', u'outdir'] + [name for name, dtype in SUMMARY_COLUMNS]
+	tmppath = path + u'.tmp'
+	f = open(tmppath, 'w')
+	f.write(u"\t".join(columns).encode(u'utf-8'))
+	for datapath in sorted(manifest.keys()):
+		entry = manifest[datapath]
+		row = [datapath, entry[u'key'], entry[u'status'], entry[u'outdir']]
+		if entry[u'record'] != None:
+			row.extend([_summary_text(value, dtype) for value, (name, dtype) in zip(entry[u'record'], SUMMARY_COLUMNS)])
+		else:
+			row.extend([u''] * len(SUMMARY_COLUMNS))
+		f.write(u"\n".encode(u'utf-8') + u"\t".join(row).encode(u'utf-8'))
+	f.close()
+	# on Windows, renaming to an existing file is not allowed
+	if os.name == u'nt' and os.path.isfile(path):
+		os.remove(path)
+	os.rename(tmppath, path)
+
+
+def _batch_worker(job):
+	
+	"""For internal use! Runs the analysis of a single data set within
+	run_batch; this has to be a module-level function, so that it can be
+	sent to a worker process
+	
+	arguments
+	
+	job			-	a (settings, datapath, heatmaps) tuple, where
+					heatmaps is a Boolean indicating whether the raw
+					heatmap data should be sent back
+	
+	returns
+	
+	result		-	a dict with the keys 'datapath', 'outdir', 'status',
+					'record', and 'error' (see run_batch), and a
+					'heatmaps' dict (maptype: raw heatmap data) if
+					heatmaps were requested
+	"""
+	
+	settings, datapath, heatmaps = job
+	result = {u'datapath':datapath, u'outdir':None, u'status':u'failed', u'record':None, u'error':None, u'cached':False}
+	
+	# the settings might be shared between jobs, so copy the properties
+	settings = copy.copy(settings)
+	settings[u'analysisproperties'] = copy.copy(settings[u'analysisproperties'])
+	settings[u'analysisproperties'][u'datapath'] = datapath
+	
+	# run the analysis
+	try:
+		analysis = Analysis(settings)
+		result[u'outdir'] = analysis.outdir
+		analysis.run()
+		# the measures are sent back to the main process, so that the
+		# summary files do not have to be read again
+		result[u'status'] = analysis.status
+		if analysis.status == u'analysed':
+			result[u'record'] = analysis.summary_record()
+			if heatmaps:
+				result[u'heatmaps'] = {}
+				for maptype in analysis.heatmaps.keys():
+					result[u'heatmaps'][maptype] = analysis.heatmaps[maptype][u'heatmap']
+	# store the error, so that the main process can report it
+	except Exception as e:
+		result[u'error'] = u"%s: %s" % (e.__class__.__name__, e)
+		# close any figures that the failed analysis left open
+		pyplot.close(u'all')
+	
+	return result
+
+
 def start_analysis(settings):
 	
 	"""Prepares the analysis, and runs it (saving data happens while running);
@@ -217,7 +819,7 @@ def start_analysis(settings):
 	
 	# show loading message
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"running analysis, please wait...", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"running analysis, please wait...", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
@@ -229,28 +831,21 @@ def start_analysis(settings):
 	
 	# show ending screen
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"the analysis was succesfully completed", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"the analysis was succesfully completed", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"(click to return to the main menu)", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"(click to return to the main menu)", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(2*settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
-	# wait for a click (allowing some time to unclick)
-	pygame.time.wait(200)
-	while check_mouseclicks()[0] == None:
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+	# wait for a click (ignoring the clicks that were made before the message
+	# was shown; this also allows an Android interrupt)
+	wait_for_click(settings, discard=True)
 	
 	# switch back to start screen
 	settings[u'currentscreen'] = u'start'
 	disp.blit(settings[u'guiscreens'][settings[u'currentscreen']], (0,0))
 	pygame.display.flip()
 	
-	# allow a bit of time to unclick
-	pygame.time.wait(200)
-	
 	return settings
 
 
@@ -286,8 +881,11 @@ class Analysis():
 		# read analysis properties
 		self.properties = settings[u'analysisproperties']
 		
-		# check if the dataset if from an onlinetask
-		if os.path.dirname(settings[u'analysisproperties'][u'datapath']) == settings[u'dir'][u'onlinedata']:
+		# check if the dataset if from an onlinetask (online datasets are
+		# single text files, local datasets are directories; this way a
+		# dataset does not have to live in the app's data directory)
+		if os.path.dirname(settings[u'analysisproperties'][u'datapath']) == settings[u'dir'][u'onlinedata'] \
+			or os.path.isfile(settings[u'analysisproperties'][u'datapath']):
 			self.onlineset = True
 		else:
 			self.onlineset = False
@@ -317,6 +915,16 @@ class Analysis():
 		self.dpi = 100.0
 		# PDF size in inches
 		self.pdfsize = (8.27,11.69)
+		# resolution of the images in the PDF, and maximal PDF file size
+		# (see summary_pdf)
+		if u'pdfdpi' in self.properties.keys():
+			self.pdfdpi = self.properties[u'pdfdpi']
+		else:
+			self.pdfdpi = PDFDPI
+		if u'pdfmaxsize' in self.properties.keys():
+			self.pdfmaxsize = self.properties[u'pdfmaxsize']
+		else:
+			self.pdfmaxsize = PDFMAXSIZE
 		# colour to make things look pretty
 		self.colours = copy.deepcopy(settings[u'colours'])
 		# transform the colours to matplotlib colours (between 0 and 1)
@@ -324,8 +932,8 @@ class Analysis():
 			for i in range(len(self.colours[k])):
 				self.colours[k][i] = (self.colours[k][i][0]/255.0, self.colours[k][i][1]/255.0, self.colours[k][i][2]/255.0)
 		# set the font
-		self.fontprop = font_manager.FontProperties(fname=settings[u'dir'][u'plotfont'])
-		self.boldfontprop = font_manager.FontProperties(fname=settings[u'dir'][u'boldplotfont'])
+		self.fontprop = _font_properties(settings[u'dir'][u'plotfont'])
+		self.boldfontprop = _font_properties(settings[u'dir'][u'boldplotfont'])
 		
 		# prepare the analysis
 		self.prepare()
@@ -340,6 +948,19 @@ class Analysis():
 		raw x and y coordinates, along with timestamps
 		"""
 
+		# MEASURES
+		# names of all measures that have been calculated (see compute)
+		self.computed = set()
+		# heatmaps that have been calculated (see calc_heatmap)
+		self.heatmaps = {}
+		# rendered images (NumPy arrays of RGBA bytes), with the same keys
+		# as their files in the files dict; they are composited in memory,
+		# and only written to their files at the end (see save_images)
+		self.images = {}
+		# the outcome of the analysis (see run): None until it has run,
+		# then 'analysed', or 'empty' for data sets without cancellations
+		self.status = None
+
 		# FILE DICT
 		# create a files dict, to contain paths to all relevant files
 		self.files = {}
@@ -350,18 +971,12 @@ class Analysis():
 			self.files[u'raw'] = os.path.join(self.datadir, u'raw.txt')
 		
 		# READ DATAFILE
-		# open the data file
-		df = open(self.files[u'raw'], 'r')
-		# read all lines
-		raw = df.readlines()
-		# clean up and split the lines
-		for i in range(len(raw)):
-			raw[i] = raw[i].replace(u'\n',u'').replace(u'\r',u'').replace(u'"',u'').split(u'\t')
-		# extract the header
-		header = raw.pop(0)
+		# read the metadata and the data columns (from the binary raw data
+		# file if there is one, see libdata)
+		meta, data = read_raw(self.datadir)
 		
 		# STOP FURTHER PROCESSING IF THE FILE IS EMPTY
-		if len(raw) < 1:
+		if len(data[u'time']) < 1:
 			self.fileisempty = True
 			return
 		else:
@@ -369,12 +984,12 @@ class Analysis():
 		
 		# SETTINGS
 		# set some variables
-		self.ppname = raw[0][header.index(u'ppname')]
-		self.taskname = raw[0][header.index(u'taskname')]
-		self.testdate = raw[0][header.index(u'testdate')]
-		self.testtime = raw[0][header.index(u'testtime')]
-		self.inputtype = raw[0][header.index(u'input')]
-		self.visibility = raw[0][header.index(u'cancellations')]
+		self.ppname = meta[u'ppname']
+		self.taskname = meta[u'taskname']
+		self.testdate = meta[u'testdate']
+		self.testtime = meta[u'testtime']
+		self.inputtype = meta[u'input']
+		self.visibility = meta[u'cancellations']
 		# add the task image and task coordinates path to the files dict
 		self.files[u'task'] = os.path.join(self.taskdir, self.taskname, u'task.png')
 		self.files[u'taskcors'] = os.path.join(self.taskdir, self.taskname, u'targets.txt')
@@ -388,21 +1003,11 @@ class Analysis():
 		self.figsize = (self.dispsize[0]/self.dpi, self.dispsize[1]/self.dpi)
 		
 		# DATA EXTRACTION
-		# empty lists to contain data points
-		self.time = []
-		self.x = []
-		self.y = []
-		self.cors = []
-		# extract data
-		for i in range(len(raw)):
-			self.time.append(raw[i][header.index(u'time')])
-			self.x.append(raw[i][header.index(u'x')])
-			self.y.append(raw[i][header.index(u'y')])
-			self.cors.append((int(self.x[i]),int(self.y[i])))
-		# lists to numpy arrays of integers
-		self.time = numpy.array(self.time, dtype=int)
-		self.x = numpy.array(self.x, dtype=int)
-		self.y = numpy.array(self.y, dtype=int)
+		# NumPy arrays of integers (memory-mapped for binary files)
+		self.time = data[u'time']
+		self.x = data[u'x']
+		self.y = data[u'y']
+		self.cors = zip(self.x.tolist(), self.y.tolist())
 		# task duration
 		self.duration = {u'total':self.time[-1]} # ms
 		h = numpy.floor(self.duration[u'total'] / 3600000.0)
@@ -414,11 +1019,34 @@ class Analysis():
 		return True
 		
 	
-	def run(self):
+	def run(self, output=None):
 		
 		"""Runs through all analysis, and creates output files in the output
 		directory
+		
+		keyword arguments
+		
+		output		--	string indicating which output files should be
+						produced (see OUTPUT_PROFILES); the options are:
+							'measures' for only the summary text
+								file
+							'heatmaps' for the summary text file
+								and the raw heatmap data
+							'full' for all text files, raw data,
+								plots, and the PDF
+						or None to use the 'output' analysis property,
+						or 'full' if there is no such property
+						(default = None)
 		"""
+		
+		# check which output should be produced
+		if output == None:
+			if u'output' in self.properties.keys():
+				output = self.properties[u'output']
+			else:
+				output = u'full'
+		if output not in OUTPUT_PROFILES:
+			raise ValueError(u"output profile '%s' not recognized" % output)
 
 		# # # # #
 		# NO DATA
@@ -431,6 +1059,7 @@ class Analysis():
 			outfile.write(u"File '%s' contains no data." % dataname)
 			# close the text file
 			outfile.close()
+			self.status = u'empty'
 		
 		
 		# # # # #
@@ -438,10 +1067,9 @@ class Analysis():
 		else:
 
 			# TARGETS
-			# read the target coordinates for this task
-			self.read_target_cors()
-			# transform clicks to targets
-			self.clicks_to_targets()
+			# read the target coordinates for this task, and transform
+			# clicks to targets
+			self.compute(u'tarcors', u'ctcors')
 			
 			# STOP WITHOUT CANCELLATIONS
 			if len(self.ctx) < 1:
@@ -453,39 +1081,17 @@ class Analysis():
 				outfile.write(u"File '%s' contains no cancellations." % dataname)
 				# close the text file
 				outfile.close()
+				self.status = u'empty'
 				# stop further processing
 				return
 
 			
-			# NEGLECT MEASURES
-			# calculate the amount of omissions
-			self.calc_omissions()
-			# calculate centre of cancellation (x and y)
-			self.calc_centre_of_cancellation()
-			
-			# DISORGANIZED SEARCH MEASURES
-			# calculate the amount of revisits
-			self.calc_total_revisits()
-			self.calc_immediate_revisits()
-			self.calc_delayed_revisits()
-			# calculate the mean inter-cancellation (standardized) distance
-			self.calc_mean_interdist()
-			self.calc_stand_interdist()
-			# calculate the mean inter-cancellation time and the search speed
-			self.calc_mean_intertime()
-			self.calc_search_speed()
-			# calculate the Q score
-			self.calc_qscore()
-			# calculate the mean angle between cancellations
-			self.calc_mean_angle()
-			# calculate the standardized angle between cancellations
-			self.calc_stand_angle()
-			# calculate the best R
-			self.calc_best_r()
-			# calculate intersection rate
-			self.calc_intersect_rate()
-			# calculate the first cancellation
-			self.calc_first_cancellation()
+			# MEASURES
+			# calculate all neglect measures (omissions, centre of
+			# cancellation) and disorganized search measures (revisits,
+			# interdistance, intertime, search speed, Q score, angles, best
+			# R, intersection rate, first cancellation)
+			self.compute(*SUMMARY_MEASURES)
 			
 			
 			# # # # #
@@ -493,6 +1099,16 @@ class Analysis():
 			
 			# text document with all values
 			self.summary_txt()
+			self.status = u'analysed'
+			# raw heatmap data
+			if output in [u'heatmaps', u'full']:
+				self.calc_heatmap(maptype=u'cancellation')
+				self.calc_heatmap(maptype=u'omission')
+				self.calc_heatmap(maptype=u'intersection')
+			# stop here if no plots are needed (rendering the plots takes
+			# most of an analysis' time)
+			if output != u'full':
+				return
 			# cancellation path
 			self.plot_cancellation_path()
 			# heatmaps
@@ -507,10 +1123,42 @@ class Analysis():
 			self.plot_best_r()
 			# summary of everything in a PDF
 			self.summary_pdf()
+			# write all images to their files
+			self.save_images()
 			# close all figures (in case Matplotlib was in interactive mode)
 			pyplot.close(u'all')
 	
 	
+	# # # # #
+	# MEASURE REGISTRY
+	
+	def compute(self, *measures):
+		
+		"""Calculates the passed measures, after calculating all the
+		measures they depend on (see MEASURES); every measure is only
+		calculated once, so asking for a single measure (e.g. 'qscore') only
+		calculates what is needed for that measure
+		
+		arguments
+		
+		measures		-	names of measures, which are keys of the
+						MEASURES dict, e.g. compute(u'qscore', u'bestr')
+		"""
+		
+		for measure in measures:
+			# skip measures that have been calculated already
+			if measure in self.computed:
+				continue
+			# check if the measure exists
+			if measure not in MEASURES.keys():
+				raise ValueError(u"measure '%s' not recognized" % measure)
+			# calculate all inputs, and then the measure itself
+			method, inputs = MEASURES[measure]
+			self.compute(*inputs)
+			getattr(self, method)()
+			self.computed.add(measure)
+	
+	
 	# # # # #
 	# CALCULATORS
 	
@@ -522,29 +1170,11 @@ class Analysis():
 		NumPy arrays of the x and y coordinates"""
 
 		# READ DATAFILE
-		# open the data file
-		df = open(self.files[u'taskcors'], 'r')
-		# read all lines
-		raw = df.readlines()
-		# clean up and split the lines
-		for i in range(len(raw)):
-			raw[i] = raw[i].replace(u'\n',u'').replace(u'\r',u'').replace(u'"',u'').split(u'\t')
-		# extract the header
-		header = raw.pop(0)
-
-		# DATA EXTRACTION
-		# empty lists to contain data points
-		self.tarcors = {u'x':[],
-					u'y':[],
-					u'cors':[]}
-		# extract data
-		for i in range(len(raw)):
-			self.tarcors[u'x'].append(raw[i][header.index(u'x')])
-			self.tarcors[u'y'].append(raw[i][header.index(u'y')])
-			self.tarcors[u'cors'].append((int(self.tarcors[u'x'][i]),int(self.tarcors[u'y'][i])))
-		# lists to numpy arrays of integers
-		self.tarcors[u'x'] = numpy.array(self.tarcors[u'x'], dtype=int)
-		self.tarcors[u'y'] = numpy.array(self.tarcors[u'y'], dtype=int)
+		# read the coordinates straight into NumPy arrays of integers
+		self.tarcors = read_tsv(self.files[u'taskcors'], {u'x':int, u'y':int})
+		self.tarcors[u'cors'] = zip(self.tarcors[u'x'].tolist(), self.tarcors[u'y'].tolist())
+		# spatial index, for quickly finding the target closest to a click
+		self.tarindex = PointIndex(self.tarcors[u'x'], self.tarcors[u'y'])
 	
 	def clicks_to_targets(self):
 		
@@ -552,27 +1182,48 @@ class Analysis():
 		all clicks within the distance treshold from a target"""
 		
 		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-
-		# empty lists for click-target transformed (ct) coordinates
-		self.ctt = []
-		self.ctx = []
-		self.cty = []
-		self.ctcors = []
-		
-		# match click positions to star positions
-		for i in range(0,len(self.x)):
-			# check Cartesian distance
-			dist = (self.tarcors[u'x']-self.x[i])**2 + (self.tarcors[u'y']-self.y[i])**2
-			# determine lowest value (=clicked target)
-			clickcor = numpy.argmin(dist)
-			if dist[clickcor]**0.5 < self.properties[u'disthreshold']:
-					# add transformed click to lists
-					self.ctt.append(self.time[i])
-					self.ctx.append(self.tarcors[u'x'][clickcor])
-					self.cty.append(self.tarcors[u'y'][clickcor])
-					self.ctcors.append((self.ctx[-1],self.cty[-1]))
+		self.compute(u'tarcors')
+
+		# match all click positions to star positions at once; the index
+		# gives the closest target for every click, and its squared distance
+		clickcors, dist = self.tarindex.nearest_many(self.x, self.y)
+		# only use the clicks within the distance threshold
+		valid = dist**0.5 < self.properties[u'disthreshold']
+		# lists for click-target transformed (ct) coordinates
+		self.ctt = list(self.time[valid])
+		self.ctx = list(self.tarcors[u'x'][clickcors[valid]])
+		self.cty = list(self.tarcors[u'y'][clickcors[valid]])
+		self.ctcors = zip(self.ctx, self.cty)
+		# index of the matched target for every cancellation
+		self.ctindex = clickcors[valid]
+		# number of cancellations of every target; targets at the same
+		# position share their cancellations, so every cancellation is
+		# counted for the first target at its position
+		samepos = self.tarindex.nearest_many(self.tarcors[u'x'], self.tarcors[u'y'])[0]
+		self.tarcancels = numpy.bincount(self.ctindex, minlength=len(self.tarcors[u'x']))[samepos]
+
+	def calc_path(self):
+		
+		"""Calculates the geometry of the cancellation path: the horizontal
+		and vertical distance, the length, the duration, and the angle of
+		every step between two consecutive cancellations"""
+		
+		# calculate click transformed coordinates if this has not been done
+		self.compute(u'ctcors')
+
+		# steps between consecutive cancellations
+		self.path = {}
+		self.path[u'dx'] = numpy.diff(numpy.array(self.ctx, dtype=int))
+		self.path[u'dy'] = numpy.diff(numpy.array(self.cty, dtype=int))
+		self.path[u'time'] = numpy.diff(numpy.array(self.ctt, dtype=int)).astype(float)
+		self.path[u'length'] = numpy.sqrt(self.path[u'dx']**2 + self.path[u'dy']**2)
+		# a step without a length is a revisit of the same target
+		self.path[u'revisit'] = self.path[u'length'] == 0
+		# angle of every step, where 0 is horizontal and 90 is vertical;
+		# revisits do not have an angle, and are marked -1
+		self.path[u'angle'] = numpy.zeros(len(self.path[u'length'])) - 1
+		step = self.path[u'revisit'] == False
+		self.path[u'angle'][step] = numpy.degrees(numpy.arcsin(numpy.abs(self.path[u'dy'][step]) / self.path[u'length'][step]))
 
 	
 	# NEGLECT MEASURES
@@ -581,41 +1232,26 @@ class Analysis():
 		
 		"""Calculates the amount of omissions"""
 		
-		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctcors'):
-			self.clicks_to_targets()
-
-		# loop through all target coordinates
-		self.omissions = {	u'cors':[],
-						u'x':numpy.zeros(len(self.tarcors[u'cors'])),
-						u'y':numpy.zeros(len(self.tarcors[u'cors'])),
-						u'total':0}
-		for i in range(len(self.tarcors[u'cors'])):
-			# if the target coordinate does not appear in the list of
-			# clicked targets, it was not cancelled
-			c = self.tarcors[u'cors'][i]
-			if self.ctcors.count(c) < 1:
-				self.omissions[u'x'][i] = c[0]
-				self.omissions[u'y'][i] = c[1]
-				self.omissions[u'cors'].append(c)
-				self.omissions[u'total'] += 1
-		# correct the length of the arrays
-		self.omissions[u'x'] = self.omissions[u'x'][self.omissions[u'x']>0]
-		self.omissions[u'y'] = self.omissions[u'y'][self.omissions[u'y']>0]
+		# read target coordinates and calculate click transformed
+		# coordinates, if this has not been done yet
+		self.compute(u'tarcors', u'ctcors')
+
+		# a target was omitted if it was never cancelled
+		omitted = self.tarcancels == 0
+		self.omissions = {	u'x':self.tarcors[u'x'][omitted],
+						u'y':self.tarcors[u'y'][omitted]}
+		self.omissions[u'cors'] = zip(self.omissions[u'x'].tolist(), self.omissions[u'y'].tolist())
+		self.omissions[u'total'] = len(self.omissions[u'cors'])
 		# number of omissions per half
-		self.omissions[u'left'] = len(self.omissions[u'x'][self.omissions[u'x']<self.dispsize[0]/2])
-		self.omissions[u'right'] = len(self.omissions[u'x'][self.omissions[u'x']>self.dispsize[0]/2])
+		self.omissions[u'left'] = int(numpy.sum(self.omissions[u'x'] < self.dispsize[0]/2))
+		self.omissions[u'right'] = int(numpy.sum(self.omissions[u'x'] > self.dispsize[0]/2))
 	
 	def calc_centre_of_cancellation(self):
 		
 		"""Calculates the horizontal and vertical centres of cancellation"""
 		
 		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
+		self.compute(u'ctcors')
 
 		# the centre of cancellation is the mean of the cancelled targets'
 		# x or y positions, normalized between -1* and 1** (right/bottom);
@@ -636,42 +1272,28 @@ class Analysis():
 		
 		"""Calculates the total amount of revisits"""
 		
-		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctcors'):
-			self.clicks_to_targets()
-
-		# loop through all target coordinates
-		self.pers = {}
-		self.pers[u'tot'] = 0
-		for c in self.tarcors[u'cors']:
-			# the total number of revisits is the number of times a
-			# target was clicked, minus one (for the first time the targer
-			# was clicked)
-			if self.ctcors.count(c) > 1:
-				self.pers[u'tot'] += self.ctcors.count(c) - 1
+		# read target coordinates and calculate click transformed
+		# coordinates, if this has not been done yet
+		self.compute(u'tarcors', u'ctcors')
+
+		if not hasattr(self, u'pers'):
+			self.pers = {}
+		# the total number of revisits is the number of times every
+		# target was clicked, minus one (for the first time the target
+		# was clicked)
+		self.pers[u'tot'] = int(numpy.sum(numpy.maximum(self.tarcancels - 1, 0)))
 	
 	def calc_immediate_revisits(self):
 		
 		"""Calculates the amount of immediate revisits"""
 		
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
+		# calculate the cancellation path if this has not been done yet
+		self.compute(u'path')
 
-		# repetitions in the coordinates will result in a diff of 0;
-		# numpy.where will give the index numbers of these coordinates;
-		# these are the persevarations per individual axis
-		px = numpy.where(numpy.diff(self.ctx)==0)[0]
-		py = numpy.where(numpy.diff(self.cty)==0)[0]
-		# numpy.intersect1d gives the sorted, unique values that are in both
-		# index number arrays: the immediate revisits on both axis
-		imp = numpy.intersect1d(px, py)
-		
-		# save value
-		self.pers[u'imm'] = len(imp)
+		# an immediate revisit is a step without a length on the path
+		if not hasattr(self, u'pers'):
+			self.pers = {}
+		self.pers[u'imm'] = int(numpy.sum(self.path[u'revisit']))
 	
 	def calc_delayed_revisits(self):
 		
@@ -679,14 +1301,7 @@ class Analysis():
 		
 		# calculate the total amount of revisits and the amount of
 		# immediate revisits, if this has not been done yet
-		if hasattr(self, u'pers'):
-			if not u'tot' in self.pers.keys():
-				self.calc_total_revisits()
-			if not u'imm' in self.pers.keys():
-				self.calc_immediate_revisits()
-		else:
-			self.calc_total_revisits()
-			self.calc_immediate_revisits()
+		self.compute(u'revisits_tot', u'revisits_imm')
 
 		# the number of delayed revisits, is the total number of
 		# revisits minus the number of immediate revisits
@@ -696,46 +1311,26 @@ class Analysis():
 		
 		"""Calculates the mean distance between cancellations"""
 		
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
-
-		# empty array to contain interdistances
-		self.intdist = {u'all':numpy.zeros(len(self.ctx)-1)}
-		# calculate interdistances
-		for i in range(len(self.intdist[u'all'])):
-			self.intdist[u'all'][i] = ((self.ctx[i]-self.ctx[i+1])**2 + (self.cty[i]-self.cty[i+1])**2)**0.5
+		# calculate the cancellation path if this has not been done yet
+		self.compute(u'path')
+
+		# the interdistances are the lengths of all steps on the path
+		self.intdist = {u'all':self.path[u'length']}
 		# calculate mean interdistance (but only for distances greater than
 		# 0, as an intdist of 0 reflects a revisit)
-		self.intdist[u'mean'] = numpy.mean(self.intdist[u'all'][self.intdist[u'all']>0])
+		self.intdist[u'mean'] = numpy.mean(self.intdist[u'all'][self.path[u'revisit']==False])
 	
 	def calc_stand_interdist(self):
 		
 		"""Calculates the standardized interdistance"""
 		
-		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-		# calculate the mean interdistance, if this has not been done yet
-		if hasattr(self,u'intdist'):
-			if not u'mean' in self.intdist.keys():
-				self.calc_mean_interdist()
-		else:
-			self.calc_mean_interdist()
-
-		# calculate mean distance between closest targets
-		self.intdist[u'alltar'] = numpy.zeros(len(self.tarcors[u'x']))
-		# loop through all targets
-		for i in range(len(self.tarcors[u'x'])):
-			# calculate the distances between the current target and all
-			# the other targets (one of these will result in a distance of
-			# 0: the coordinate of the current target, so we do not look at
-			# distances of 0)
-			intdist = ((self.tarcors[u'x'] - self.tarcors[u'x'][i])**2 + (self.tarcors[u'y'] - self.tarcors[u'y'][i])**2)**0.5
-			# get the distance to the closest neighbour
-			self.intdist[u'alltar'][i] = numpy.min(intdist[intdist>0])
-		# calculate the mean lowest target interdistance
-		self.intdist[u'meantar'] = numpy.mean(self.intdist[u'alltar'])
+		# read target coordinates and calculate the mean interdistance, if
+		# this has not been done yet
+		self.compute(u'tarcors', u'interdist')
+
+		# the distance between every target and its closest neighbour, and
+		# the mean of those distances (see _target_spacing)
+		self.intdist[u'alltar'], self.intdist[u'meantar'] = self._target_spacing()
 		
 		# calculate the standardized interdistance
 		self.intdist[u'standardized'] = self.intdist[u'mean'] / self.intdist[u'meantar']
@@ -744,11 +1339,11 @@ class Analysis():
 		
 		"""Calculates the mean time between cancellations"""
 		
-		# empty array to contain inter-cancellation times
-		self.inttime = {u'all':numpy.zeros(len(self.ctt)-1)}
-		# calculate inter-cancellation times
-		for i in range(len(self.inttime[u'all'])):
-			self.inttime[u'all'][i] = self.ctt[i+1] - self.ctt[i]
+		# calculate the cancellation path if this has not been done yet
+		self.compute(u'path')
+
+		# the inter-cancellation times are the durations of all steps
+		self.inttime = {u'all':self.path[u'time']}
 		# calculate mean inter-cancellation time
 		self.inttime[u'mean'] = numpy.mean(self.inttime[u'all'])
 	
@@ -756,12 +1351,9 @@ class Analysis():
 		
 		"""Calculates the search speed: mean(distance / time)"""
 		
-		# calculate the average interdistance if this has not been done yet
-		if not hasattr(self, u'intdist'):
-			self.calc_mean_interdistance()
-		# calculate the average intertime if this has not been done yet
-		if not hasattr(self, u'inttime'):
-			self.calc_mean_intertime()
+		# calculate the average interdistance and the average intertime if
+		# this has not been done yet
+		self.compute(u'interdist', u'intertime')
 		
 		# calculate the mean search speed
 		self.searchspd = numpy.mean(self.intdist[u'all'] / self.inttime[u'all'])
@@ -771,11 +1363,9 @@ class Analysis():
 		"""Calculates the Q score (Hills & Geldmacher, 1998)"""
 
 		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
+		self.compute(u'tarcors')
 		# calculate the amount of omissions if this has not been done yet
-		if not hasattr(self, u'omissions'):
-			self.calc_omissions()
+		self.compute(u'omissions')
 
 		# calculate the Q score
 		# (correct responses/total target) * (correct responses / total time)
@@ -788,31 +1378,13 @@ class Analysis():
 		all cancellations are on a horizontal line, and 90 means all
 		cancellations are on a vertical line"""
 		
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
-		# calculate the interdistances if this has not been done yet
-		if hasattr(self, u'intdist'):
-			if not u'all' in self.intdist.keys():
-				self.calc_mean_interdist()
-		else:
-			self.calc_mean_interdist()
-
-		# empty array for all intercancellation angles
-		self.angle = {u'all':numpy.zeros(len(self.ctx)-1)}
-		
-		# calculate the intercancellation angles
-		for i in range(len(self.angle['all'])):
-			# calculate the vertical distance
-			ydist = float(abs(self.cty[i]-self.cty[i+1]))
-			# check if there is an interdistance (otherwise it's a
-			# revisit, and those do not have an interangle)
-			if self.intdist[u'all'][i] > 0:
-				self.angle['all'][i] = math.degrees(math.asin(ydist/self.intdist['all'][i]))
-			# invalid angles (revisits) will be marked -1, and are
-			# not used in further calculations
-			else:
-				self.angle['all'][i] = -1
+		# calculate the cancellation path if this has not been done yet
+		self.compute(u'path')
+
+		# the intercancellation angles are the angles of all steps;
+		# invalid angles (revisits) are marked -1, and are not used in
+		# further calculations
+		self.angle = {u'all':self.path[u'angle']}
 		# calculate the mean intercancellation angle
 		self.angle[u'mean'] = numpy.mean(self.angle['all'][self.angle['all']>=0])
 	
@@ -824,11 +1396,7 @@ class Analysis():
 		(disorganised)"""
 		
 		# calculate all intercancellation angles, if this has not been done
-		if hasattr(self, u'angle'):
-			if not u'all' in self.angle.keys():
-				self.calc_mean_angle()
-		else:
-			self.calc_mean_angle()
+		self.compute(u'angle')
 		
 		# calculate the standardized angles (invalid angles will have a
 		# value below 0, we do not take those into account
@@ -844,8 +1412,7 @@ class Analysis():
 		cancellation number (the cancellation rank order)"""
 		
 		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
+		self.compute(u'ctcors')
 
 		# empty dict to contain values
 		self.bestr = {}
@@ -859,28 +1426,19 @@ class Analysis():
 		
 		"""Calculates the amount of cancellation path intersections"""
 				
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
-
-		# empty dict to hold all intersection coordinates
-		self.intersections = {u'x':[], u'y':[], u'cors':[]}
-		
-		# loop through all lines
-		for i in range(len(self.ctcors)-1):
-			# loop through all lines after this one (not before, as we do
-			# not want to count any intersections double!)
-			for j in range(i+1, len(self.ctcors)-1):
-				# line starting and ending coordinates
-				line1 = (self.ctcors[i],self.ctcors[i+1])
-				line2 = (self.ctcors[j],self.ctcors[j+1])
-				# find any intersections
-				intersect = intersection(line1,line2)
-				# if there is an intersection, add it to the list
-				if intersect:
-					self.intersections[u'x'].append(intersect[0])
-					self.intersections[u'y'].append(intersect[1])
-					self.intersections[u'cors'].append(intersect)
+		# calculate click transformed coordinates and the amount of
+		# immediate revisits, if this has not been done yet
+		self.compute(u'ctcors', u'revisits_imm')
+
+		# find all intersections of the cancellation path with itself (every
+		# pair of lines is only checked once, as we do not want to count any
+		# intersections double!)
+		intersects = path_intersections(numpy.array(self.ctx), numpy.array(self.cty))
+		# dict to hold all intersection coordinates
+		self.intersections = {u'x':[], u'y':[], u'cors':intersects}
+		for intersect in intersects:
+			self.intersections[u'x'].append(intersect[0])
+			self.intersections[u'y'].append(intersect[1])
 		
 		# lists to arrays
 		self.intersections[u'x'] = numpy.array(self.intersections[u'x'])
@@ -897,8 +1455,7 @@ class Analysis():
 		quadrant of this first cancellation"""
 		
 		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
+		self.compute(u'ctcors')
 		
 		# emtpy dict to contain data
 		self.firstcancel = {}
@@ -926,12 +1483,9 @@ class Analysis():
 		"""Plots all cancellations, showing a rank number for each
 		cancellation, and a line going from point to point"""
 		
-		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
+		# read target coordinates and calculate click transformed
+		# coordinates, if this has not been done yet
+		self.compute(u'tarcors', u'ctcors')
 
 		# create new figure
 		fig, ax = pyplot.subplots(nrows=1,ncols=1)
@@ -957,51 +1511,166 @@ class Analysis():
 		ax.invert_yaxis()
 		# title
 		#ax.set_title(u"participant '%s', '%s' task (%s %s)" % (self.ppname,self.taskname,self.testdate,self.testtime), fontproperties=self.fontprop)
-		# save the figure
+		# render the figure
 		self.files[u'cancelpath'] = os.path.join(self.outdir, u'cancellation_path.png')
-		fig.savefig(self.files[u'cancelpath'])
+		self.images[u'cancelpath'] = self._render_figure(fig)
 	
 	def _heatmap_maximum(self):
 		
 		"""For internal use! Calculates the theoretical maximum value of a
-		cancellation or omission heatmap"""
+		cancellation or omission heatmap; as this value only depends on the
+		task, it is stored in a cache file in the task's directory, which is
+		used for every following analysis of a dataset from the same task
+		(the cache is keyed on the content of the task's targets file and
+		on the Gaussian's parameters, so it is ignored after either changes)
+		"""
 		
 		# HEATMAP
 		# Gaussian
 		gwh = int(self.dispsize[0]/2)
 		gsdwh = gwh/6
-		gaus = gaussian(gwh,gsdwh)
-		# matrix of zeroes
-		strt = gwh/2
-		heatmapsize = self.dispsize[1] + 2*strt, self.dispsize[0] + 2*strt
-		heatmap = numpy.zeros(heatmapsize, dtype=float)
-		# run through all targets
-		for x, y in self.tarcors[u'cors']:
-			# correct Gaussian size if either coordinate falls outside of
-			# display boundaries
-			if (not 0 < x < self.dispsize[0]) or (not 0 < y < self.dispsize[1]):
-				hadj=[0,gwh];vadj=[0,gwh]
-				if 0 > x:
-					hadj[0] = abs(x)
-					x = 0
-				elif self.dispsize[0] < x:
-					hadj[1] = gwh - int(x-self.dispsize[0])
-				if 0 > y:
-					vadj[0] = abs(y)
-					y = 0
-				elif self.dispsize[1] < y:
-					vadj[1] = gwh - int(y-self.dispsize[1])
-				# add adjusted Gaussian to the current heatmap
-				heatmap[y:y+vadj[1],x:x+hadj[1]] += gaus[vadj[0]:vadj[1],hadj[0]:hadj[1]]
-			else:				
-				# add Gaussian to the current heatmap
-				heatmap[y:y+gwh,x:x+gwh] += gaus
+		
+		# CACHE
+		# the cache key is a hash of the target coordinates file, the
+		# display size, and the Gaussian's size and standard deviation
+		key = self._task_cache_key(u"%dx%d %d %d" % (self.dispsize[0], self.dispsize[1], gwh, gsdwh))
+		# read the cached maxima
+		self.files[u'heatmapmax'] = os.path.join(os.path.dirname(self.files[u'taskcors']), u'heatmap_maximum.txt')
+		cache = self._read_task_cache(self.files[u'heatmapmax'])
+		# use the cached maximum, if there is one for this task
+		if key in cache:
+			self.heatmapvmax = float(cache[key])
+			return
+		
+		# a Gaussian for every target (the maximum is calculated over the
+		# padded heatmap)
+		heatmap = gaussian_heatmap(self.tarcors[u'x'], self.tarcors[u'y'], self.dispsize, gwh, gsdwh)[0]
 		# calculate maximum
 		self.heatmapvmax = numpy.max(heatmap)
+		
+		# store the maximum in the cache
+		cache[key] = repr(float(self.heatmapvmax))
+		self._write_task_cache(self.files[u'heatmapmax'], u'maximum', cache)
 
-	def plot_heatmap(self, maptype=u'cancellation'):
+	def _target_spacing(self):
 		
-		"""Plots a heatmap of the cancelled targets
+		"""For internal use! Calculates the distance between every target and
+		its closest neighbour (ignoring targets at the same position), using
+		the spatial index of the targets; as these distances only depend on
+		the task, they are stored in a cache file in the task's directory
+		(keyed on the content of the task's targets file, see
+		_heatmap_maximum)
+		
+		returns
+		
+		alltar, meantar	-	alltar is a NumPy array with the distance
+						to the closest neighbour for every target
+						meantar is the mean of those distances
+		"""
+		
+		# CACHE
+		key = self._task_cache_key()
+		self.files[u'targetspacing'] = os.path.join(os.path.dirname(self.files[u'taskcors']), u'target_spacing.txt')
+		cache = self._read_task_cache(self.files[u'targetspacing'])
+		# use the cached distances, if there are any for this task
+		if key in cache:
+			alltar = numpy.array(cache[key].split(u' '), dtype=float)
+			return alltar, numpy.mean(alltar)
+		
+		# SPACING
+		# the closest other target for every target (the squared distance
+		# to the target itself is 0, and is skipped)
+		alltar = self.tarindex.nearest_many(self.tarcors[u'x'], self.tarcors[u'y'], skipzero=True)[1]**0.5
+		
+		# store the distances in the cache
+		cache[key] = u' '.join([repr(float(d)) for d in alltar])
+		self._write_task_cache(self.files[u'targetspacing'], u'spacing', cache)
+		
+		return alltar, numpy.mean(alltar)
+
+	def _task_cache_key(self, extra=u''):
+		
+		"""For internal use! Returns the key of the values of the current task
+		in a task cache file: a hash of the task's target coordinates file,
+		and of the passed extra parameters
+		
+		keyword arguments
+		
+		extra		-	string of other parameters that the cached value
+						depends on (default = u'')
+		
+		returns
+		
+		key			-	hexadecimal string
+		"""
+		
+		with open(self.files[u'taskcors'], 'rb') as f:
+			key = hashlib.sha1(f.read())
+		key.update(extra)
+		
+		return key.hexdigest()
+
+	def _read_task_cache(self, path):
+		
+		"""For internal use! Reads a task cache file, in which every line
+		contains a key (see _task_cache_key) and a value, separated by a tab
+		
+		arguments
+		
+		path			-	full path to the cache file
+		
+		returns
+		
+		cache		-	dict of all keys and values in the file (empty if
+						the file does not exist)
+		"""
+		
+		cache = {}
+		if os.path.isfile(path):
+			with open(path, 'r') as f:
+				for line in f.readlines()[1:]:
+					line = line.replace(u'\n',u'').replace(u'\r',u'').split(u'\t')
+					if len(line) == 2:
+						cache[line[0]] = line[1]
+		
+		return cache
+
+	def _write_task_cache(self, path, name, cache):
+		
+		"""For internal use! Writes a task cache file (see _read_task_cache);
+		the file is written under a temporary name first, so that other
+		processes (e.g. in a batch analysis) never read a half-written cache
+		file
+		
+		arguments
+		
+		path			-	full path to the cache file
+		name			-	name of the cached values (used in the header)
+		cache		-	dict of all keys and values
+		"""
+		
+		tmpname = u"%s.%d.tmp" % (path, os.getpid())
+		try:
+			with open(tmpname, 'w') as f:
+				f.write(u"key\t%s" % name)
+				for k in sorted(cache.keys()):
+					f.write(u"\n%s\t%s" % (k, cache[k]))
+			# on Windows, renaming to an existing file is not allowed
+			if os.name == u'nt' and os.path.isfile(path):
+				os.remove(path)
+			os.rename(tmpname, path)
+		# the task directory might not be writable (e.g. when the app is
+		# installed in a system directory); the values will simply be
+		# calculated again next time
+		except (IOError, OSError):
+			if os.path.isfile(tmpname):
+				os.remove(tmpname)
+
+	def calc_heatmap(self, maptype=u'cancellation'):
+		
+		"""Calculates a heatmap, and saves the raw heatmap data (a NumPy
+		array of the display size) in the output directory; the heatmap is
+		stored in the self.heatmaps dict, under the maptype as a key
 		
 		keyword arguments
 		
@@ -1014,68 +1683,43 @@ class Analysis():
 								intersections
 		"""
 		
-		# read target coordinates if this has not been done yet
-		if not hasattr(self, u'tarcors'):
-			self.read_target_cors()
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctcors'):
-			self.clicks_to_targets()
+		# read target coordinates and calculate click transformed
+		# coordinates, if this has not been done yet
+		self.compute(u'tarcors', u'ctcors')
 		# calculate the heatmap maximum, if this has not been done yet
-		if not hasattr(self, u'heatmapvmax'):
-			self._heatmap_maximum()
+		self.compute(u'heatmapmax')
 		
 		# DETERMINE COORDINATES
 		gauscors = []
 		# coordinates for the cancellations
 		if maptype == u'cancellation':
-			# run through all targets
-			for i in range(0,len(self.tarcors[u'x'])):
-				# check if the target was cancelled
-				if (self.tarcors[u'x'][i],self.tarcors[u'y'][i]) in self.ctcors:
-					gauscors.append(self.tarcors[u'cors'][i])
+			# all targets that were cancelled at least once
+			cancelled = numpy.nonzero(self.tarcancels > 0)[0]
+			gauscors = [self.tarcors[u'cors'][i] for i in cancelled]
 		# coordinates for the omissions
 		elif maptype == u'omission':
+			self.compute(u'omissions')
 			gauscors = copy.deepcopy(self.omissions[u'cors'])
 		# coordinates for the intersections
 		elif maptype == u'intersection':
+			self.compute(u'intersections')
 			gauscors = copy.deepcopy(self.intersections[u'cors'])
 		# if the maptype was incorrectly specified, print message and return
 		else:
-			print(u"ValueError in libanalysis.plot_heatmap: maptype '%s' not recognized" % maptype)
+			print(u"ValueError in libanalysis.calc_heatmap: maptype '%s' not recognized" % maptype)
 			return
 
 		# HEATMAP
 		# Gaussian
 		gwh = int(self.dispsize[0]/2)
 		gsdwh = gwh/6
-		gaus = gaussian(gwh,gsdwh)
-		# matrix of zeroes
-		strt = gwh/2
-		heatmapsize = self.dispsize[1] + 2*strt, self.dispsize[0] + 2*strt
-		heatmap = numpy.zeros(heatmapsize, dtype=float)
-		# run through all targets
-		for x, y in gauscors:
-			# correct Gaussian size if either coordinate falls outside of
-			# display boundaries
-			if (not 0 < x < self.dispsize[0]) or (not 0 < y < self.dispsize[1]):
-				hadj=[0,gwh];vadj=[0,gwh]
-				if 0 > x:
-					hadj[0] = abs(x)
-					x = 0
-				elif self.dispsize[0] < x:
-					hadj[1] = gwh - int(x-self.dispsize[0])
-				if 0 > y:
-					vadj[0] = abs(y)
-					y = 0
-				elif self.dispsize[1] < y:
-					vadj[1] = gwh - int(y-self.dispsize[1])
-				# add adjusted Gaussian to the current heatmap
-				heatmap[y:y+vadj[1],x:x+hadj[1]] += gaus[vadj[0]:vadj[1],hadj[0]:hadj[1]]
-			else:				
-				# add Gaussian to the current heatmap
-				heatmap[y:y+gwh,x:x+gwh] += gaus
-		# resize heatmap
-		heatmap = heatmap[strt:self.dispsize[1]+strt,strt:self.dispsize[0]+strt]
+		# a Gaussian for every coordinate (only the part of the heatmap that
+		# covers the display is used)
+		if len(gauscors) > 0:
+			x, y = zip(*gauscors)
+		else:
+			x, y = [], []
+		padded, heatmap = gaussian_heatmap(x, y, self.dispsize, gwh, gsdwh)
 		
 		# SCALE TO THEORETICAL MAXIMUM
 		if maptype in [u'cancellation', u'omission']:
@@ -1089,89 +1733,77 @@ class Analysis():
 		self.files[u'%srawheatmap' % maptype] = os.path.join(self.outdir, u'raw_heatmap_data_%s.npy' % maptype)
 		numpy.save(self.files[u'%srawheatmap' % maptype], heatmap)
 		
+		# store the heatmap, its maximum for plotting, and the number of
+		# coordinates it is based on
+		self.heatmaps[maptype] = {u'heatmap':heatmap, u'vmax':vmax, u'n':len(gauscors)}
+
+	def plot_heatmap(self, maptype=u'cancellation'):
+		
+		"""Plots a heatmap of the cancelled targets
+		
+		keyword arguments
+		
+		maptype		--	string indicating the type of heatmap to be
+						produced; the options are:
+							'cancellations' for a heatmap of the
+								cancelled targets
+							'omissions' for a heatmap of the omissions
+							'intersections' for a heatmap of the
+								intersections
+		"""
+		
+		# calculate the heatmap, if this has not been done yet
+		if maptype not in self.heatmaps.keys():
+			self.calc_heatmap(maptype=maptype)
+		# stop if the heatmap could not be calculated
+		if maptype not in self.heatmaps.keys():
+			return
+		heatmap = self.heatmaps[maptype][u'heatmap']
+		vmax = self.heatmaps[maptype][u'vmax']
+		
 		# HEATMAP IMAGE
-		# create a new figure
-		fig = pyplot.figure(figsize=self.figsize, dpi=self.dpi, frameon=False)
-		ax = pyplot.Axes(fig, [0,0,1,1])
-		ax.set_axis_off()
-		fig.add_axes(ax)
-		# draw heatmap
-		ax.imshow(heatmap, cmap=u'jet', alpha=1, vmax=vmax)
-		# set the axis to the display size
-		ax.axis([0,self.dispsize[0],0,self.dispsize[1]])
-		# remove the axis grid
-		ax.axis(u'off')
-		# invert the y axis, as (0,0) is top left on a display
-		ax.invert_yaxis()
-		# save figure
+		# colour the heatmap through the 'jet' colour lookup table
 		self.files[u'%sheatmap' % maptype] = os.path.join(self.outdir, u'%s_heatmap.png' % maptype)
-		fig.savefig(self.files[u'%sheatmap' % maptype])
+		self.images[u'%sheatmap' % maptype] = _heatmap_image(heatmap_rgba(heatmap, vmax=vmax))
 
 		# TRANSPARANT HEATMAP IMAGE
-		# if there are no Gaussian coordinates, make whole map transparant
-		if len(gauscors) == 0:
-			heatmap[heatmap==0] = numpy.NaN
-		# remove low values from heatmap
-		else:
-			lowestval = numpy.min(heatmap)
-			lowbound = 0.15 #numpy.mean(heatmap[heatmap>0])
-			heatmap[heatmap<=lowbound] = numpy.NaN
-			# hidden pixel, to re-introduce lowest value (for colour scaling)
-			heatmap[0][0] = lowestval
-		# create a new figure
-		fig = pyplot.figure(figsize=self.figsize, dpi=self.dpi, frameon=False)
-		ax = pyplot.Axes(fig, [0,0,1,1])
-		ax.set_axis_off()
-		fig.add_axes(ax)
-		# draw heatmap
-		ax.imshow(heatmap, cmap=u'jet', alpha=1, vmax=vmax)
-		# set the axis to the display size
-		ax.axis([0,self.dispsize[0],0,self.dispsize[1]])
-		# remove the axis grid
-		ax.axis(u'off')
-		# invert the y axis, as (0,0) is top left on a display
-		ax.invert_yaxis()
-		# save figure
+		# low values are made transparent (a map without any Gaussian
+		# coordinates has no values above the bound, and is completely
+		# transparent); the other colours are the same as above
+		lowbound = 0.15 #numpy.mean(heatmap[heatmap>0])
 		self.files[u'%salphaheatmap' % maptype] = os.path.join(self.outdir, u'%s_heatmap_transparant.png'  % maptype)
-		fig.savefig(self.files[u'%salphaheatmap' % maptype])
+		self.images[u'%salphaheatmap' % maptype] = _heatmap_image(heatmap_rgba(heatmap, vmax=vmax, lowbound=lowbound), background=0)
 	
 	def plot_superimposed_heatmap(self, maptype=u'cancellation'):
 		
 		"""Plots a heatmap superimposed on the task image"""
 
 		# draw heatmap if this has not been done yet
-		if not u'%salphaheatmap' % maptype in self.files.keys():
+		if not u'%salphaheatmap' % maptype in self.images.keys():
 			self.plot_heatmap(maptype=maptype)
+		# stop if the heatmap could not be drawn
+		if not u'%salphaheatmap' % maptype in self.images.keys():
+			return
 
-		# create a new figure
-		fig = pyplot.figure(figsize=(self.dispsize[0]/self.dpi, self.dispsize[1]/self.dpi), dpi=self.dpi, frameon=False)
-		ax = pyplot.Axes(fig, [0,0,1,1])
-		ax.set_axis_off()
-		fig.add_axes(ax)
-		# load images
-		taskimg = image.imread(self.files[u'task'])
-		heatmap = image.imread(self.files[u'%salphaheatmap' % maptype])
-		# resize task image
-		taskimg = numpy.resize(taskimg, (numpy.size(heatmap,axis=0),numpy.size(heatmap,axis=1)))
-		# draw task
-		ax.imshow(self.taskimg, origin=u'upper', alpha=1)
+		# task image as bytes (Matplotlib reads PNG files as floats)
+		taskimg = self.taskimg
+		if taskimg.dtype.kind == u'f':
+			taskimg = (taskimg * 255).round().astype(numpy.uint8)
+		# draw the task on a white background (if it has an alpha channel)
+		if numpy.size(taskimg, axis=2) == 4:
+			taskimg = alpha_blend(numpy.zeros(taskimg.shape, dtype=numpy.uint8) + 255, taskimg)
 		# superimpose heatmap
-		ax.imshow(heatmap, alpha=0.5)
-		# save figure
 		self.files[u'%staskheatmap' % maptype] = os.path.join(self.outdir, u'%s_heatmap_superimposed.png' % maptype)
-		fig.savefig(self.files[u'%staskheatmap' % maptype])
+		self.images[u'%staskheatmap' % maptype] = alpha_blend(taskimg, self.images[u'%salphaheatmap' % maptype], alpha=0.5)
 	
 	def plot_best_r(self):
 		
 		"""Plots the correlations between cancellation rank number and
 		cancellation x and y coordinates"""
 		
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'ctx'):
-			self.clicks_to_targets()
-		# calculate click transformed coordinates if this has not been done
-		if not hasattr(self, u'bestr'):
-			self.calc_best_r()
+		# calculate click transformed coordinates and the best R if this
+		# has not been done yet
+		self.compute(u'ctcors', u'bestr')
 
 		# create new figure
 		fig, (ax1,ax2) = pyplot.subplots(nrows=2,ncols=1, sharex=True)
@@ -1188,87 +1820,27 @@ class Analysis():
 		ax2.set_ylabel(u"vertical position (pixels)", fontproperties=self.fontprop)
 		ax2.set_xlabel(u"cancellation rank number", fontproperties=self.fontprop)
 		fig.suptitle(u"best R: %1.2f (participant '%s', task '%s')" % (self.bestr[u'best'],self.ppname,self.taskname), fontproperties=self.fontprop)
-		# save figure
+		# render the figure
 		self.files[u'bestr'] = os.path.join(self.outdir, u'best_r_plots.png')
-		fig.savefig(self.files[u'bestr'])
+		self.images[u'bestr'] = self._render_figure(fig)
 	
 	
 	# SUMMARIES
 	
-	def summary_txt(self):
+	def summary_record(self):
 		
-		"""Creates a simple text file, containing all the measures"""
+		"""Returns the values of all measures in the summary
 		
-		# CHECKS
-		# check if the omissions have been calculated
-		if not hasattr(self, u'omissions'):
-			self.calc_omissions()
-		# check if the centre of cancellation has been calculated
-		if not hasattr(self, u'coc'):
-			self.calc_centre_of_cancellation()
-		# check if the omissions have been calculated
-		if hasattr(self, u'pers'):
-			if u'tot' not in self.pers.keys():
-				self.calc_total_revisits()
-			if u'imm' not in self.pers.keys():
-				self.calc_immediate_revisits()
-			if u'del' not in self.pers.keys():
-				self.calc_delayed_revisits()
-		else:
-			self.calc_total_revisits()
-			self.calc_immediate_revisits()
-			self.calc_delayed_revisits()
-		# check if the standardized interdistance has been calculated
-		if hasattr(self, u'intdist'):
-			if not u'standardized' in self.intdist.keys():
-				self.calc_stand_interdist()
-		else:
-			self.calc_stand_interdist()
-		# check if the intertime has been calculated
-		if not hasattr(self, u'inttime'):
-			self.calc_mean_intertime()
-		# check if the search speed has been calculated
-		if not hasattr(self, u'searchspd'):
-			self.calc_search_speed()
-		# check if the Q score has been calculated
-		if not hasattr(self, u'qscore'):
-			self.calc_qscore()
-		# check if the standardized angle has been calculated
-		if hasattr(self, u'angle'):
-			if not u'standardized' in self.angle.keys():
-				self.calc_stand_angle()
-		else:
-			self.calc_stand_angle()
-		# check if the best R has been calculated
-		if not hasattr(self, u'bestr'):
-			self.calc_best_r()
-		# check if the intersection rate has been calculated
-		if not hasattr(self, u'intersections'):
-			self.calc_intersect_rate()
-		# check if the first cancellation has been calculated
-		if not hasattr(self, u'firstcancel'):
-			self.calc_first_cancellation()
+		returns
 		
-		# open a new textfile
-		self.files[u'txt'] = os.path.join(self.outdir, u'summary.txt')
-		txtfile = open(self.files[u'txt'], 'w')
+		record		-	list of the values of all summary columns, in the
+						order of SUMMARY_COLUMNS
+		"""
 		
-		# write the header to the file
-		header = [	u'ppname', u'taskname', u'testdate', u'testtime', \
-				u'om_tot',u'om_left',u'om_right', \
-				u'revisits_tot',u'revisits_imm', u'revisits_del', \
-				u'CoC_hor',u'CoC_ver', \
-				u'duration',u'mean_intertime', u'Qscore', \
-				u'mean_interdist', u'stand_interdist',u'speed', \
-				u'mean_angle',u'stand_angle', \
-				u'bestR',u'hor_R',u'ver_R', \
-				u'intersect_tot',u'intersect_rate', \
-				u'first_cancel_x', u'first_cancel_y', u'first_quadrant']
-		txtfile.write(u"\t".join(header))
-		txtfile.write(u"\n")
+		# calculate all measures, if this has not been done yet
+		self.compute(*SUMMARY_MEASURES)
 		
-		# write the output to the file
-		output = [	self.ppname, self.taskname, self.testdate, self.testtime, \
+		record = [	self.ppname, self.taskname, self.testdate, self.testtime, \
 				self.omissions[u'total'],self.omissions[u'left'],self.omissions[u'right'], \
 				self.pers[u'tot'],self.pers[u'imm'],self.pers[u'del'], \
 				self.coc[u'x'],self.coc[u'y'], \
@@ -1279,7 +1851,24 @@ class Analysis():
 				self.intersections[u'total'], self.intersections[u'rate'], \
 				self.firstcancel[u'norm'][0], self.firstcancel[u'norm'][1], self.firstcancel[u'quad']
 				]
-		output = map(unicode, output)
+		
+		return record
+	
+	def summary_txt(self):
+		
+		"""Creates a simple text file, containing all the measures"""
+		
+		# open a new textfile
+		self.files[u'txt'] = os.path.join(self.outdir, u'summary.txt')
+		txtfile = open(self.files[u'txt'], 'w')
+		
+		# write the header to the file
+		header = [name for name, dtype in SUMMARY_COLUMNS]
+		txtfile.write(u"\t".join(header))
+		txtfile.write(u"\n")
+		
+		# write the output to the file
+		output = map(unicode, self.summary_record())
 		txtfile.write(u"\t".join(output))
 		
 		# close the textfile
@@ -1288,71 +1877,52 @@ class Analysis():
 	def summary_pdf(self):
 		
 		"""Creates an A4-sized PDF, showing the important plots and all
-		calculated measures"""
+		calculated measures; the text is drawn as vector content, and the
+		plots are embedded as images of at most pdfdpi dots per inch; if
+		the PDF is larger than pdfmaxsize, it is created again with a
+		lower resolution, until it fits (or until the resolution reaches
+		PDFMINDPI)"""
 		
-		# A4 dimensions (landscape):
-		# 11.69x8.27 inches, 300 dpi (results in 3507x2481 px)
-		# 11.69x8.27 inches, 600 dpi (results in 7014x4962 px)
+		# A4 dimensions (portrait):
+		# 8.27x11.69 inches, 150 dpi (results in 1240x1754 px)
 		
 		# CHECKS
-		# check if the omissions have been calculated
-		if not hasattr(self, u'omissions'):
-			self.calc_omissions()
-		# check if the centre of cancellation has been calculated
-		if not hasattr(self, u'coc'):
-			self.calc_centre_of_cancellation()
-		# check if the omissions have been calculated
-		if hasattr(self, u'pers'):
-			if u'tot' not in self.pers.keys():
-				self.calc_total_revisits()
-			if u'imm' not in self.pers.keys():
-				self.calc_immediate_revisits()
-			if u'del' not in self.pers.keys():
-				self.calc_delayed_revisits()
-		else:
-			self.calc_total_revisits()
-			self.calc_immediate_revisits()
-			self.calc_delayed_revisits()
-		# check if the standardized interdistance has been calculated
-		if hasattr(self, u'intdist'):
-			if not u'standardized' in self.intdist.keys():
-				self.calc_stand_interdist()
-		else:
-			self.calc_stand_interdist()
-		# check if the intertime has been calculated
-		if not hasattr(self, u'inttime'):
-			self.calc_mean_intertime()
-		# check if the search speed has been calculated
-		if not hasattr(self, u'searchspd'):
-			self.calc_search_speed()
-		# check if the Q score has been calculated
-		if not hasattr(self, u'qscore'):
-			self.calc_qscore()
-		# check if the standardized angle has been calculated
-		if hasattr(self, u'angle'):
-			if not u'standardized' in self.angle.keys():
-				self.calc_stand_angle()
-		else:
-			self.calc_stand_angle()
-		# check if the best R has been calculated
-		if not hasattr(self, u'bestr'):
-			self.calc_best_r()
-		# check if the intersection rate has been calculated
-		if not hasattr(self, u'intersections'):
-			self.calc_intersect_rate()
-		# check if the first cancellation has been calculated
-		if not hasattr(self, u'firstcancel'):
-			self.calc_first_cancellation()
+		# calculate all measures, if this has not been done yet
+		self.compute(*SUMMARY_MEASURES)
 		# check if the cancellation path has been plotted
-		if not u'cancelpath' in self.files.keys():
+		if not u'cancelpath' in self.images.keys():
 			self.plot_cancellation_path()
 		# check if the heatmap has been plotted
-		if not u'cancellationtaskheatmap' in self.files.keys():
+		if not u'cancellationtaskheatmap' in self.images.keys():
 			self.plot_superimposed_heatmap(maptype=u'cancellation')
 
+		# SIZE
+		self.files[u'pdf'] = os.path.join(self.outdir, u'summary.pdf')
+		dpi = self.pdfdpi
+		while True:
+			self._plot_pdf(dpi)
+			size = os.path.getsize(self.files[u'pdf'])
+			if self.pdfmaxsize == None or size <= self.pdfmaxsize or dpi <= PDFMINDPI:
+				break
+			# the size of the images is proportional to the number of
+			# pixels, i.e. to the square of the resolution (the text and
+			# the rest of the PDF are a small constant part)
+			dpi = max(PDFMINDPI, int(dpi * 0.9 * (float(self.pdfmaxsize) / size) ** 0.5))
+	
+	def _plot_pdf(self, dpi):
+		
+		"""For internal use! Draws the summary PDF (see summary_pdf), with
+		images of the passed resolution
+		
+		arguments
+		
+		dpi			-	maximal resolution of the images in the PDF, in
+						dots per inch
+		"""
+		
 		# PLOTTING
 		# create a new figure
-		pdf = pyplot.figure(figsize=self.pdfsize, dpi=self.dpi*6, frameon=False)
+		pdf = pyplot.figure(figsize=self.pdfsize, dpi=dpi, frameon=False)
 		# draw the images
 		imgnames = [u'cancelpath',u'cancellationtaskheatmap']
 		axtitles = [u'cancellation path',u'cancellation heatmap',u'analysis output']
@@ -1362,9 +1932,17 @@ class Analysis():
 			ax = pyplot.Axes(pdf, [0,bottoms[i],1,0.3])
 			ax.set_axis_off()
 			pdf.add_axes(ax)
-			# load and draw the image
-			img = image.imread(self.files[imgnames[i]])
-			ax.imshow(img)	
+			# scale the image (which is still in memory) to the resolution
+			# it gets in the axis, and drop its (opaque) alpha channel
+			img = self.images[imgnames[i]]
+			width = self.pdfsize[0] * dpi
+			height = self.pdfsize[1] * 0.3 * dpi
+			scale = min(1.0, width / numpy.size(img,axis=1), height / numpy.size(img,axis=0))
+			shape = (max(1, int(round(numpy.size(img,axis=0) * scale))), max(1, int(round(numpy.size(img,axis=1) * scale))))
+			img = downscale(img[:,:,:3], shape)
+			# draw the image; without interpolation, the PDF backend embeds
+			# the image at its own resolution, instead of resampling it
+			ax.imshow(img, interpolation=u'none')
 			# add title
 			ax.set_title(axtitles[i], fontproperties=self.fontprop)
 		# add axis for text
@@ -1407,5 +1985,100 @@ class Analysis():
 				else:
 					ax.text(0.1+0.5*c, 1-(0.1*r), texts[c][r], fontsize=10, fontproperties=self.fontprop)
 		# save PDF
-		self.files[u'pdf'] = os.path.join(self.outdir, u'summary.pdf')
-		pdf.savefig(self.files[u'pdf'])
+		pdf.savefig(self.files[u'pdf'], dpi=dpi)
+		pyplot.close(pdf)
+	
+	def save_images(self):
+		
+		"""Writes all rendered images to their PNG files"""
+		
+		for name in self.images.keys():
+			write_png(self.files[name], self.images[name])
+	
+	def _render_figure(self, fig):
+		
+		"""For internal use! Renders a Matplotlib figure in memory, and closes
+		the figure
+		
+		arguments
+		
+		fig			-	a Matplotlib figure (with an Agg canvas)
+		
+		returns
+		
+		rgba			-	NumPy array of RGBA bytes, with a (height, width,
+						4) shape
+		"""
+		
+		fig.canvas.draw()
+		w, h = fig.canvas.get_width_height()
+		rgba = numpy.frombuffer(fig.canvas.buffer_rgba(), dtype=numpy.uint8).reshape(h, w, 4).copy()
+		pyplot.close(fig)
+		
+		return rgba
+
+
+class HeatmapAverage():
+	
+	"""Averages the heatmaps of a batch of data sets, one heatmap at a time:
+	only a running sum and count are kept for every map type (and for every
+	task size, as heatmaps of different sizes can not be averaged), so the
+	memory use does not depend on the number of data sets"""
+	
+	# the types of heatmaps (see Analysis.calc_heatmap)
+	maptypes = [u'cancellation', u'intersection', u'omission']
+	
+	def __init__(self):
+		
+		"""Initializes a new HeatmapAverage instance, without any heatmaps"""
+		
+		# running sums and counts, with (maptype, (width,height)) keys
+		self.sums = {}
+		self.counts = {}
+	
+	
+	def add(self, maptype, heatmap):
+		
+		"""Adds a heatmap to the average; the heatmap is scaled to a maximum
+		of 1, and NaN values do not add anything to the sum
+		
+		arguments
+		
+		maptype		-	string indicating the type of heatmap (see
+						maptypes)
+		heatmap		-	NumPy array of a data set's raw heatmap data
+		"""
+		
+		key = (maptype, (int(numpy.size(heatmap,axis=1)),int(numpy.size(heatmap,axis=0))))
+		if key not in self.sums.keys():
+			self.sums[key] = numpy.zeros(heatmap.shape, dtype=float)
+			self.counts[key] = 0
+		
+		# proportionalize data (a heatmap without any values, e.g. of a
+		# data set without intersections, adds nothing to the sum, but it
+		# does count towards the average)
+		vmax = numpy.nanmax(heatmap)
+		if vmax > 0:
+			hm = heatmap / vmax
+			self.sums[key] += numpy.where(numpy.isnan(hm), 0, hm)
+		self.counts[key] += 1
+	
+	
+	def averages(self):
+		
+		"""Returns all average heatmaps
+		
+		returns
+		
+		averages		-	list of (maptype, dispsize, heatmap, n) tuples,
+						sorted by map type and size, where dispsize is a
+						(width,height) tuple, heatmap is a NumPy array of
+						the average heatmap, and n is the number of data
+						sets that it is based on
+		"""
+		
+		averages = []
+		for key in sorted(self.sums.keys()):
+			averages.append((key[0], key[1], self.sums[key] / self.counts[key], self.counts[key]))
+		
+		return averages
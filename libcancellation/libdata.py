@@ -0,0 +1,833 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CancellationTools
+#
+# CancellationTools is open-source software for running cancellation tasks,
+# and directly analysing the data they produce.
+#
+# Copyright (C) 2014, Edwin S. Dalmaijer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+__author__ = u"Edwin Dalmaijer"
+
+# native
+import itertools
+import os
+import struct
+# SQLite is not available in every Python build (e.g. on Android), in which
+# case the data directories are listed without a catalogue
+try:
+	import sqlite3
+except ImportError:
+	sqlite3 = None
+
+# external
+import numpy
+
+
+# # # # #
+# BINARY FORMAT
+
+# Raw data can be stored in a binary columnar format, next to the raw.txt of a
+# dataset (as raw.bin), or next to the text file of an online dataset (with
+# the same name, but a .bin extension). A binary file starts with a fixed
+# header: the magic string, the length of the metadata in bytes, and the
+# number of samples (both unsigned 32-bit integers). The metadata follows:
+# UTF-8 encoded lines of a column name and its value (separated by a tab), for
+# all columns that have the same value on every row of the raw data (e.g.
+# 'ppname' and 'taskname'). After padding to a multiple of 16 bytes, the data
+# follows as three contiguous arrays of little-endian 32-bit integers: all
+# timestamps, all x coordinates, and all y coordinates. As the arrays are
+# contiguous, they can be memory-mapped, rather than parsed.
+BINMAGIC = 'CTRAWBIN'
+BINHEADER = '<8sII'
+BINALIGN = 16
+# the columns that are stored as arrays (all other columns are metadata)
+DATACOLUMNS = [u'time', u'x', u'y']
+
+
+# # # # #
+# CATALOGUE
+
+# The catalogue is an SQLite database of all datasets in the data directories,
+# so that the data selection screens do not have to list and inspect every
+# dataset on every visit. For every data directory, it stores the directory's
+# modification time; for every dataset, its name (a directory or file name in
+# the data directory), its modification time, its size in bytes, and its
+# metadata. A data directory is only listed again when its modification time
+# changed (i.e. when datasets were added or removed), or when it was not
+# listed yet since the app started (as datasets can also change from outside
+# of the app); then only the datasets with a new modification time (that of
+# the dataset itself, or of its newest raw data file) are inspected again.
+# the metadata columns of every dataset
+CATALOGUEMETA = [u'ppname', u'taskname', u'testdate', u'testtime']
+# the columns that pages of the catalogue can be sorted on
+CATALOGUEORDERS = [u'name', u'mtime', u'size'] + CATALOGUEMETA
+# the (catalogue, data directory) pairs that were listed since the app started
+# (see update_catalogue)
+_CATALOGUELISTED = set()
+
+
+# # # # #
+# FUNCTIONS
+
+def binary_path(datapath):
+
+	"""Returns the path to the binary raw data file of a dataset
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	returns
+
+	binpath		-	full path to the binary raw data file (which
+					does not necessarily exist)
+	"""
+
+	if os.path.isdir(datapath):
+		return os.path.join(datapath, u'raw.bin')
+	return os.path.splitext(datapath)[0] + u'.bin'
+
+
+def text_path(datapath):
+
+	"""Returns the path to the text raw data file of a dataset
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	returns
+
+	txtpath		-	full path to the raw data text file
+	"""
+
+	if os.path.isdir(datapath):
+		return os.path.join(datapath, u'raw.txt')
+	return datapath
+
+
+def raw_file(datapath, usebinary=True):
+
+	"""Returns the path to the raw data file of a dataset that should be
+	read; this is the binary file if there is one, and if it is at least as
+	recent as the text file
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	keyword arguments
+
+	usebinary		-	Boolean indicating whether the binary raw data
+					file should be used, if it exists (default = True)
+
+	returns
+
+	rawpath		-	full path to the binary or text raw data file
+	"""
+
+	txtpath = text_path(datapath)
+	binpath = binary_path(datapath)
+
+	# use the binary file, unless the text file was changed after the
+	# binary file was written
+	if usebinary and os.path.isfile(binpath):
+		if not os.path.isfile(txtpath) or os.path.getmtime(binpath) >= os.path.getmtime(txtpath):
+			return binpath
+
+	return txtpath
+
+
+def read_raw(datapath, usebinary=True):
+
+	"""Reads the raw data of a dataset; the binary file is used if there is
+	one, and if it is at least as recent as the text file (see raw_file)
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	keyword arguments
+
+	usebinary		-	Boolean indicating whether the binary raw data
+					file should be used, if it exists (default = True)
+
+	returns
+
+	meta, data	-	a dict of the metadata (column names and their
+					values, which are the same on every row), and a
+					dict with the keys 'time', 'x', and 'y', containing
+					NumPy arrays of integers
+	"""
+
+	path = raw_file(datapath, usebinary=usebinary)
+	if path == binary_path(datapath):
+		return read_raw_binary(path)
+
+	return read_raw_text(path)
+
+
+def read_meta(datapath, usebinary=True):
+
+	"""Reads only the metadata of a dataset (see read_raw), e.g. to find out
+	which task it belongs to without reading all data
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	keyword arguments
+
+	usebinary		-	Boolean indicating whether the binary raw data
+					file should be used, if it exists (default = True)
+
+	returns
+
+	meta			-	a dict of the metadata (column names and their
+					values, which are the same on every row)
+	"""
+
+	path = raw_file(datapath, usebinary=usebinary)
+	# the data of a binary file is memory-mapped, so it is not read
+	if path == binary_path(datapath):
+		return read_raw_binary(path)[0]
+
+	# only the first row of a text file is read
+	header, row = read_tsv_head(path)
+	meta = {}
+	if row != None:
+		for i in range(len(header)):
+			if header[i] not in DATACOLUMNS:
+				meta[header[i]] = row[i]
+
+	return meta
+
+
+def read_raw_text(path):
+
+	"""Reads a raw data text file (tab separated, with a header)
+
+	arguments
+
+	path			-	full path to a raw data text file
+
+	returns
+
+	meta, data	-	see read_raw
+	"""
+
+	# METADATA
+	# all columns that are not data columns have the same value on every
+	# row, so they are only read from the first row
+	meta = read_meta(path, usebinary=False)
+
+	# DATA EXTRACTION
+	data = read_tsv(path, dict([(col, int) for col in DATACOLUMNS]))
+
+	return meta, data
+
+
+def read_raw_binary(path, mmap=True):
+
+	"""Reads a binary raw data file
+
+	arguments
+
+	path			-	full path to a binary raw data file
+
+	keyword arguments
+
+	mmap			-	Boolean indicating whether the data should be
+					memory-mapped (read-only) rather than read into
+					memory (default = True)
+
+	returns
+
+	meta, data	-	see read_raw
+	"""
+
+	# HEADER
+	f = open(path, 'rb')
+	magic, metasize, n = struct.unpack(BINHEADER, f.read(struct.calcsize(BINHEADER)))
+	if magic != BINMAGIC:
+		f.close()
+		raise IOError(u"'%s' is not a binary raw data file" % path)
+
+	# METADATA
+	meta = {}
+	for line in f.read(metasize).decode(u'utf-8').split(u'\n'):
+		if len(line) > 0:
+			key, value = line.split(u'\t', 1)
+			meta[key] = value
+	f.close()
+
+	# DATA
+	offset = struct.calcsize(BINHEADER) + metasize
+	offset += (BINALIGN - offset % BINALIGN) % BINALIGN
+	# an empty file can not be memory-mapped
+	if mmap and n > 0:
+		columns = numpy.memmap(path, dtype='<i4', mode='r', offset=offset, shape=(len(DATACOLUMNS),n))
+	else:
+		f = open(path, 'rb')
+		f.seek(offset)
+		columns = numpy.fromfile(f, dtype='<i4', count=len(DATACOLUMNS)*n).reshape(len(DATACOLUMNS),n)
+		f.close()
+	data = {}
+	for i in range(len(DATACOLUMNS)):
+		data[DATACOLUMNS[i]] = columns[i]
+
+	return meta, data
+
+
+def write_raw_binary(path, meta, data):
+
+	"""Writes raw data to a binary raw data file
+
+	arguments
+
+	path			-	full path to the new binary raw data file
+	meta			-	dict of the metadata (column names and values)
+	data			-	dict with the keys 'time', 'x', and 'y', containing
+					NumPy arrays (or lists) of integers
+	"""
+
+	# METADATA
+	metadata = u''
+	for key in sorted(meta.keys()):
+		metadata += u"%s\t%s\n" % (key, meta[key])
+	metadata = metadata.encode(u'utf-8')
+
+	# DATA
+	columns = numpy.array([data[col] for col in DATACOLUMNS], dtype='<i4')
+	n = numpy.size(columns, axis=1)
+
+	# WRITE
+	# the file is written under a temporary name first, so that nobody ever
+	# reads a half-written file
+	tmppath = path + u'.tmp'
+	f = open(tmppath, 'wb')
+	f.write(struct.pack(BINHEADER, BINMAGIC, len(metadata), n))
+	f.write(metadata)
+	offset = struct.calcsize(BINHEADER) + len(metadata)
+	f.write('\x00' * ((BINALIGN - offset % BINALIGN) % BINALIGN))
+	f.write(columns.tostring())
+	f.close()
+	# on Windows, renaming to an existing file is not allowed
+	if os.name == u'nt' and os.path.isfile(path):
+		os.remove(path)
+	os.rename(tmppath, path)
+
+
+def convert_dataset(datapath):
+
+	"""Converts the raw data text file of a dataset to the binary format
+
+	arguments
+
+	datapath		-	full path to a raw data directory, or to the text
+					file of an online dataset
+
+	returns
+
+	binpath		-	full path to the new binary raw data file
+	"""
+
+	meta, data = read_raw_text(text_path(datapath))
+	binpath = binary_path(datapath)
+	write_raw_binary(binpath, meta, data)
+
+	return binpath
+
+
+def read_tsv(path, columns):
+
+	"""Reads columns from a tab separated text file with a header (like the
+	raw data, targets, and distractors files) straight into NumPy arrays
+
+	arguments
+
+	path			-	full path to a tab separated text file
+	columns		-	dict of the names of the columns that should be
+					read, and their types (e.g. int, or object for
+					text), e.g. {u'x':int, u'y':int}
+
+	returns
+
+	data			-	dict with the same keys as columns, containing a
+					NumPy array of all values in every column
+	"""
+
+	# collect all chunks (see iter_tsv), and glue them together
+	chunks = list(iter_tsv(path, columns))
+	data = {}
+	for col in columns.keys():
+		if len(chunks) > 0:
+			data[col] = numpy.concatenate([chunk[col] for chunk in chunks])
+		else:
+			data[col] = numpy.zeros(0, dtype=columns[col])
+
+	return data
+
+
+def iter_tsv(path, columns, chunksize=65536):
+
+	"""Reads columns from a tab separated text file with a header in chunks
+	of rows, so that the memory use does not depend on the file size; this
+	is a generator, which yields a dict (see read_tsv) for every chunk
+
+	arguments
+
+	path			-	full path to a tab separated text file
+	columns		-	dict of the names of the columns that should be
+					read, and their types (see read_tsv)
+
+	keyword arguments
+
+	chunksize		-	maximal number of rows per chunk (default = 65536)
+
+	yields
+
+	data			-	dict with the same keys as columns, containing a
+					NumPy array of the values of every column within
+					the current chunk
+	"""
+
+	f = open(path, 'r')
+	try:
+		# HEADER
+		# find the column numbers only once
+		header = _split_tsv_line(f.readline())
+		index = {}
+		for col in columns.keys():
+			if col not in header:
+				raise ValueError(u"column '%s' not found in '%s'" % (col, path))
+			index[col] = header.index(col)
+
+		# DATA
+		while True:
+			# read the next chunk of rows, as a single string without
+			# quotes, carriage returns, and empty lines
+			text = ''.join(itertools.islice(f, chunksize))
+			if len(text) == 0:
+				break
+			text = text.replace('"', '').replace('\r', '')
+			lines = text.split('\n')
+			if '' in lines[:-1]:
+				lines = [line for line in lines if line != '']
+				text = '\n'.join(lines)
+			elif lines[-1] == '':
+				lines.pop(-1)
+				text = text[:-1]
+			if len(lines) == 0:
+				continue
+			# split all values at once; if every row has as many values
+			# as the header, every column is a slice of all values, and
+			# otherwise the rows are split one by one
+			values = text.replace('\n', '\t').split('\t')
+			if len(values) == len(lines) * len(header):
+				columnvalues = lambda i: values[i::len(header)]
+			else:
+				rows = [line.split('\t') for line in lines]
+				columnvalues = lambda i: [row[i] for row in rows]
+			# convert every column to a NumPy array
+			data = {}
+			for col in columns.keys():
+				if columns[col] == object:
+					data[col] = numpy.array([v.decode(u'utf-8') for v in columnvalues(index[col])], dtype=object)
+				else:
+					data[col] = numpy.array(columnvalues(index[col]), dtype=columns[col])
+			yield data
+	finally:
+		f.close()
+
+
+def read_tsv_head(path):
+
+	"""Reads the header and the first row of a tab separated text file
+
+	arguments
+
+	path			-	full path to a tab separated text file
+
+	returns
+
+	header, row	-	lists of the column names and of the values on
+					the first row (None if the file has no rows)
+	"""
+
+	f = open(path, 'r')
+	header = _split_tsv_line(f.readline())
+	row = None
+	for line in f:
+		if _split_tsv_line(line) != [u'']:
+			row = _split_tsv_line(line)
+			break
+	f.close()
+
+	return header, row
+
+
+def _split_tsv_line(line):
+
+	"""For internal use! Returns the values on a line of a tab separated text
+	file, without line endings and quotes"""
+
+	return line.replace(u'\n',u'').replace(u'\r',u'').replace(u'"',u'').split(u'\t')
+
+
+def is_dataset(path):
+
+	"""Returns True if the passed path is a dataset: a raw data directory
+	of a local task, the text file of an online dataset (but not the
+	README), or a binary raw data file without a text file
+
+	arguments
+
+	path			-	full path to a directory or file
+
+	returns
+
+	isdataset		-	Boolean indicating if the path is a dataset
+	"""
+
+	name = os.path.basename(path)
+	if os.path.isdir(path):
+		return True
+	elif os.path.splitext(name)[1] == u'.txt' and name != u'README.txt':
+		return True
+	elif os.path.splitext(name)[1] == u'.bin' and not os.path.isfile(os.path.splitext(path)[0] + u'.txt'):
+		return True
+	return False
+
+
+def is_local_dataset(path):
+
+	"""Returns True if the passed path is the raw data directory of a local
+	task (the datasets on the data selection screen)
+
+	arguments
+
+	path			-	full path to a directory or file
+
+	returns
+
+	isdataset		-	Boolean indicating if the path is a dataset
+	"""
+
+	return os.path.isdir(path)
+
+
+def is_online_dataset(path):
+
+	"""Returns True if the passed path is the text file of an online
+	dataset (but not the README), or a binary raw data file without a text
+	file (the datasets on the online data selection screen)
+
+	arguments
+
+	path			-	full path to a directory or file
+
+	returns
+
+	isdataset		-	Boolean indicating if the path is a dataset
+	"""
+
+	return os.path.isfile(path) and is_dataset(path)
+
+
+def update_catalogue(catpath, datadir, isdataset):
+
+	"""Updates the catalogue of a data directory (see CATALOGUE); this only
+	lists the data directory if it changed since the previous update (or if
+	it was not listed yet since the app started), and only inspects the
+	datasets that changed
+
+	arguments
+
+	catpath		-	full path to the catalogue database file (it is
+					created when it doesn't exist yet)
+	datadir		-	full path to a data directory
+	isdataset		-	function that is called with the full path to
+					every directory and file in the data directory,
+					and that returns True if it is a dataset that
+					should be catalogued (e.g. is_local_dataset, or
+					is_online_dataset)
+
+	returns
+
+	nupdated		-	number of datasets that were added, updated, or
+					removed
+	"""
+
+	if sqlite3 == None:
+		return 0
+
+	mtime = os.path.getmtime(datadir)
+	conn = _connect_catalogue(catpath)
+	# a catalogue that can not be opened is not used (see query_catalogue)
+	if conn == None:
+		return 0
+	try:
+		# nothing was added or removed if the directory did not change
+		row = conn.execute(u"SELECT mtime FROM directories WHERE datadir = ?", (datadir,)).fetchone()
+		if row != None and row[0] == mtime and (catpath, datadir) in _CATALOGUELISTED:
+			return 0
+		# compare all datasets to their catalogued modification time
+		known = dict(conn.execute(u"SELECT name, mtime FROM sessions WHERE datadir = ?", (datadir,)))
+		names = [name for name in map(unicode, os.listdir(datadir)) if isdataset(os.path.join(datadir, name))]
+		nupdated = 0
+		for name in names:
+			path = os.path.join(datadir, name)
+			smtime = _dataset_mtime(path)
+			if name in known.keys() and known[name] == smtime:
+				continue
+			# datasets that can not be read are still listed (so that they
+			# can be selected, and report their own error when analysed)
+			try:
+				meta = read_meta(path)
+			except (IOError, OSError, ValueError, struct.error):
+				meta = {}
+			values = [datadir, name, smtime, _dataset_size(path)]
+			values.extend([meta.get(col, None) for col in CATALOGUEMETA])
+			conn.execute(u"INSERT OR REPLACE INTO sessions VALUES (%s)" % u", ".join([u"?"] * len(values)), values)
+			nupdated += 1
+		# forget the datasets that were removed
+		for name in set(known.keys()) - set(names):
+			conn.execute(u"DELETE FROM sessions WHERE datadir = ? AND name = ?", (datadir, name))
+			nupdated += 1
+		conn.execute(u"INSERT OR REPLACE INTO directories VALUES (?, ?)", (datadir, mtime))
+		conn.commit()
+	# e.g. a read-only catalogue
+	except sqlite3.Error:
+		return 0
+	finally:
+		conn.close()
+	_CATALOGUELISTED.add((catpath, datadir))
+
+	return nupdated
+
+
+def query_catalogue(catpath, datadir, isdataset, offset=0, limit=None, order=u'name', descending=False, ppname=None, taskname=None):
+
+	"""Returns a page of the datasets in the catalogue of a data directory
+	(see update_catalogue), sorted and optionally filtered on participant
+	or task; as the catalogue is indexed on every sort column, this only
+	reads the rows on the page
+
+	arguments
+
+	catpath		-	full path to the catalogue database file
+	datadir		-	full path to a data directory
+	isdataset		-	function that returns True if a path is a dataset
+					(see update_catalogue), which is used to list the
+					data directory when there is no catalogue
+
+	keyword arguments
+
+	offset		-	number of datasets to skip (default = 0)
+	limit			-	maximal number of datasets to return, or None to
+					return all (default = None)
+	order			-	column to sort the datasets on, see
+					CATALOGUEORDERS (default = 'name')
+	descending	-	Boolean indicating if the datasets should be sorted
+					in descending order (default = False)
+	ppname		-	only return the datasets of this participant, or
+					None for all participants (default = None)
+	taskname		-	only return the datasets of this task, or None for
+					all tasks (default = None)
+
+	returns
+
+	sessions		-	a list of dicts, with the keys 'name', 'mtime',
+					'size', and those in CATALOGUEMETA (None for
+					metadata that could not be read)
+	"""
+
+	if order not in CATALOGUEORDERS:
+		raise ValueError(u"can not sort the catalogue on '%s'" % order)
+	if limit == None:
+		limit = -1
+
+	# without SQLite, or without a catalogue that can be opened, the data
+	# directory is simply listed
+	if sqlite3 == None:
+		return _list_catalogue(datadir, offset, limit, order, descending, ppname, taskname, isdataset)
+	conn = _connect_catalogue(catpath)
+	if conn == None:
+		return _list_catalogue(datadir, offset, limit, order, descending, ppname, taskname, isdataset)
+
+	# QUERY
+	where = u"datadir = ?"
+	values = [datadir]
+	if ppname != None:
+		where += u" AND ppname = ?"
+		values.append(ppname)
+	if taskname != None:
+		where += u" AND taskname = ?"
+		values.append(taskname)
+	if descending:
+		direction = u"DESC"
+	else:
+		direction = u"ASC"
+	columns = [u'name', u'mtime', u'size'] + CATALOGUEMETA
+	query = u"SELECT %s FROM sessions WHERE %s ORDER BY %s %s, name %s LIMIT ? OFFSET ?" % \
+		(u", ".join(columns), where, order, direction, direction)
+	try:
+		rows = conn.execute(query, values + [limit, offset]).fetchall()
+	finally:
+		conn.close()
+
+	return [dict(zip(columns, row)) for row in rows]
+
+
+def _connect_catalogue(catpath):
+
+	"""For internal use! Opens the catalogue database, and creates its
+	tables and indices if they do not exist yet; a database that can not
+	be read is replaced by a new one
+
+	arguments
+
+	catpath		-	full path to the catalogue database file
+
+	returns
+
+	conn			-	an sqlite3.Connection instance, or None if the
+					database could not be opened or made (e.g. in a
+					read-only data directory)
+	"""
+
+	statements = [u"CREATE TABLE IF NOT EXISTS directories (datadir TEXT PRIMARY KEY, mtime REAL)",
+		u"CREATE TABLE IF NOT EXISTS sessions (datadir TEXT, name TEXT, mtime REAL, size INTEGER, %s, PRIMARY KEY (datadir, name))" % \
+		u", ".join([u"%s TEXT" % col for col in CATALOGUEMETA])]
+	# the primary key already sorts the datasets on name
+	for col in CATALOGUEORDERS[1:]:
+		statements.append(u"CREATE INDEX IF NOT EXISTS sessions_%s ON sessions (datadir, %s)" % (col, col))
+
+	conn = None
+	try:
+		conn = sqlite3.connect(catpath)
+		for statement in statements:
+			conn.execute(statement)
+		conn.commit()
+	except sqlite3.Error:
+		# the catalogue can always be made again from the data directories
+		if conn != None:
+			conn.close()
+		conn = None
+		try:
+			if os.path.isfile(catpath):
+				os.remove(catpath)
+			conn = sqlite3.connect(catpath)
+			for statement in statements:
+				conn.execute(statement)
+			conn.commit()
+		except (sqlite3.Error, OSError):
+			if conn != None:
+				conn.close()
+			return None
+
+	return conn
+
+
+def _dataset_mtime(path):
+
+	"""For internal use! Returns the modification time of a dataset: that of
+	its directory or file, or of its raw data files if they changed later
+	(e.g. when a binary raw data file was added, or a session was recorded
+	again)
+
+	arguments
+
+	path			-	full path to a dataset
+
+	returns
+
+	mtime			-	modification time in seconds since the epoch
+	"""
+
+	mtime = os.path.getmtime(path)
+	for rawpath in [text_path(path), binary_path(path)]:
+		if os.path.isfile(rawpath):
+			mtime = max(mtime, os.path.getmtime(rawpath))
+
+	return mtime
+
+
+def _dataset_size(path):
+
+	"""For internal use! Returns the size of a dataset in bytes: the size of
+	its file, or the total size of the files in its directory
+
+	arguments
+
+	path			-	full path to a dataset
+
+	returns
+
+	size			-	size in bytes
+	"""
+
+	if os.path.isdir(path):
+		size = 0
+		for name in os.listdir(path):
+			if os.path.isfile(os.path.join(path, name)):
+				size += os.path.getsize(os.path.join(path, name))
+		return size
+
+	return os.path.getsize(path)
+
+
+def _list_catalogue(datadir, offset, limit, order, descending, ppname, taskname, isdataset):
+
+	"""For internal use! Returns a page of the datasets in a data directory
+	like query_catalogue does, but by listing and inspecting all datasets
+	(for Python builds without SQLite)
+
+	arguments
+
+	see query_catalogue
+
+	returns
+
+	sessions		-	see query_catalogue
+	"""
+
+	sessions = []
+	for name in map(unicode, os.listdir(datadir)):
+		path = os.path.join(datadir, name)
+		if not isdataset(path):
+			continue
+		try:
+			meta = read_meta(path)
+		except (IOError, OSError, ValueError, struct.error):
+			meta = {}
+		session = {u'name':name, u'mtime':_dataset_mtime(path), u'size':_dataset_size(path)}
+		for col in CATALOGUEMETA:
+			session[col] = meta.get(col, None)
+		if (ppname == None or session[u'ppname'] == ppname) and (taskname == None or session[u'taskname'] == taskname):
+			sessions.append(session)
+	sessions.sort(key=lambda session: (session[order], session[u'name']), reverse=descending)
+	if limit < 0:
+		return sessions[offset:]
+
+	return sessions[offset:offset+limit]
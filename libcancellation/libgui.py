@@ -23,8 +23,8 @@
 __author__ = u"Edwin Dalmaijer"
 
 # CancellationTools
-import libanalysis
-from libhelper import draw_Landolt_C
+from libdata import is_local_dataset, is_online_dataset, query_catalogue, update_catalogue
+from libhelper import draw_Landolt_C, get_font, get_thumbnail, prefetch_thumbnails, render_text
 from libinput import *
 import libtask
 
@@ -35,12 +35,6 @@ import time
 
 # external
 import pygame
-# try importing Android, to support the Android app
-try:
-	import android
-# if the import fails, we're probably not running the Android app, so no panic
-except:
-	pass
 
 
 # # # # #
@@ -225,14 +219,14 @@ def load_scan(settings):
 				int(settings[u'dispsize'][0]/2),
 				int(settings[u'dispsize'][0]/6)]
 	# draw text input screen	
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"please provide a name for your new task:", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"please provide a name for your new task:", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/4-textsurf.get_height()/2)))
 	disp.fill(settings[u'tfbgc'], inputrect)
 	pygame.display.flip()
 	# ask for the task name
 	taskname = u""
 	while not taskname:
-		taskname = textfield(inputrect, settings[u'font'][u'large'][u'regular'], settings, loadtext=False)
+		taskname = textfield(inputrect, get_font(settings, size=u'large', style=u'regular'), settings, loadtext=False)
 	
 	# TASK DIRECTORY
 	# new task directory
@@ -267,7 +261,7 @@ def load_scan(settings):
 				int(settings[u'dispsize'][1]-settings[u'dispsize'][1]/20),
 				int(settings[u'dispsize'][0]/20),
 				int(settings[u'dispsize'][1]/20)]
-	savetext = settings[u'font'][u'medium'][u'bold'].render(u"save", False, settings[u'fgc'])
+	savetext = render_text(settings, u"save", size=u'medium', style=u'bold')
 	savetextpos = (int(saverect[0]+saverect[2]/2 - savetext.get_width()/2),
 				int(saverect[1]+saverect[3]/2 - savetext.get_height()/2))
 	# backspace button properties
@@ -275,7 +269,7 @@ def load_scan(settings):
 				int(settings[u'dispsize'][1]-settings[u'dispsize'][1]/20),
 				int(settings[u'dispsize'][0]/20),
 				int(settings[u'dispsize'][1]/20)]
-	backtext = settings[u'font'][u'medium'][u'bold'].render(u"back", False, settings[u'fgc'])
+	backtext = render_text(settings, u"back", size=u'medium', style=u'bold')
 	backtextpos = (int(backrect[0]+backrect[2]/2 - backtext.get_width()/2),
 				int(backrect[1]+backrect[3]/2 - backtext.get_height()/2))
 	# click interaction
@@ -283,8 +277,8 @@ def load_scan(settings):
 	distractors = []
 	running = True
 	while running:
-		# get the mouse state
-		button, pos = check_mouseclicks()
+		# wait for a mouse click (this also allows an Android interrupt)
+		button, pos = wait_for_click(settings)
 		# handle the mouse input
 		if button != None:
 			# on a left click, do stuff to the targets
@@ -353,12 +347,6 @@ def load_scan(settings):
 			disp.blit(backtext, backtextpos)
 			# show the screen
 			pygame.display.flip()
-			# wait a bit, to allow to unclick
-			pygame.time.wait(200)
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
 	
 	# REMOVE DOUBLES
 	# loop through all coordinates
@@ -571,7 +559,7 @@ def run_colourpicker(settings):
 	bdict = settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']]
 	disp.fill(bdict[u'colour'], bdict[u'rect'])
 	# render the new button
-	txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+	txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 	txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 			(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 	disp.blit(txtsurf, txtpos)
@@ -586,7 +574,7 @@ def run_numfield(settings):
 	"""Runs a text field interaction"""
 	
 	rect = settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'rect']
-	font = settings[u'font'][u'medium'][u'bold']
+	font = get_font(settings, size=u'medium', style=u'bold')
 	
 	settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'text'] = numfield(rect, font, settings)
 	
@@ -598,7 +586,7 @@ def run_textfield(settings):
 	"""Runs a text field interaction"""
 	
 	rect = settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'rect']
-	font = settings[u'font'][u'medium'][u'bold']
+	font = get_font(settings, size=u'medium', style=u'bold')
 	
 	settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'text'] = textfield(rect, font, settings)
 	
@@ -643,6 +631,10 @@ def save_and_start_analysis(settings):
 		if b == 0:
 			settings[u'analysisproperties'][u'disthreshold'] = int(settings[u'guibuttons'][settings[u'currentscreen']][b][u'text'])
 	
+	# the analysis stack (Matplotlib) takes a while to import, so it is
+	# only imported when an analysis actually starts
+	import libanalysis
+	
 	# if the option for batch analysis is chosen, run a batch analysis
 	if os.path.basename(settings[u'analysisproperties'][u'datapath']) == u"batch":
 		libanalysis.batch_analysis(settings)
@@ -743,7 +735,7 @@ def save_task_settings(settings):
 				int(settings[u'dispsize'][0]/6)]
 	# draw text input screen	
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"please provide a name for your new task", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"please provide a name for your new task", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/4-textsurf.get_height()/2)))
 	disp.fill(settings[u'tfbgc'], inputrect)
 	pygame.display.flip()
@@ -765,7 +757,7 @@ def save_task_settings(settings):
 	oldtxt = copy.copy(settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'text'])
 	settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'text'] = copy.copy(settings[u'newtaskname'])
 	# ask for the participant name
-	settings[u'newtaskname'] = textfield(inputrect, settings[u'font'][u'large'][u'regular'], settings, loadtext=True)
+	settings[u'newtaskname'] = textfield(inputrect, get_font(settings, size=u'large', style=u'regular'), settings, loadtext=True)
 	# reset text for currently active button
 	settings[u'guibuttons'][settings[u'currentscreen']][settings[u'currentbutton']][u'text'] = copy.copy(oldtxt)	
 	
@@ -800,19 +792,15 @@ def select_this_dataset(settings):
 		text = u"you chose all datasets (click to continue)"
 	else:
 		text = u"you chose dataset '%s' (click to continue)" % dataname
-	textsurf = settings[u'font'][u'medium'][u'regular'].render(text, False, settings[u'fgc'])
+	textsurf = get_font(settings, size=u'medium', style=u'regular').render(text, False, settings[u'fgc'])
 	textpos = (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2))
 	# display message
 	disp.fill(settings[u'bgc'])
 	disp.blit(textsurf, textpos)
 	pygame.display.flip()
-	# wait for a click (allow time to unclick first)
-	pygame.time.wait(200)
-	while check_mouseclicks()[0] == None:
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+	# wait for a click (ignoring the clicks that were made before the message
+	# was shown; this also allows an Android interrupt)
+	wait_for_click(settings, discard=True)
 	
 	return after_data_selection(settings)
 
@@ -858,19 +846,15 @@ def select_this_task(settings):
 	# get display handle
 	disp = pygame.display.get_surface()
 	# render text
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"you chose task '%s' (click to continue)" % taskname, False, settings[u'fgc'])
+	textsurf = get_font(settings, size=u'large', style=u'regular').render(u"you chose task '%s' (click to continue)" % taskname, False, settings[u'fgc'])
 	textpos = (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2))
 	# display message
 	disp.fill(settings[u'bgc'])
 	disp.blit(textsurf, textpos)
 	pygame.display.flip()
-	# wait for a click (allow time to unclick first)
-	pygame.time.wait(200)
-	while check_mouseclicks()[0] == None:
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+	# wait for a click (ignoring the clicks that were made before the message
+	# was shown; this also allows an Android interrupt)
+	wait_for_click(settings, discard=True)
 	
 	return after_task_selection(settings)
 
@@ -995,7 +979,7 @@ def aftertaskselectionscreen(settings):
 	
 	# TITLE
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"task settings", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"task settings", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1010,7 +994,7 @@ def aftertaskselectionscreen(settings):
 	# render and blit texts
 	for j in range(len(texts)):
 		for i in range(len(texts[j])):
-			textsurf = settings[u'font'][u'medium'][u'regular'].render(texts[j][i], False, settings[u'fgc'])
+			textsurf = render_text(settings, texts[j][i], size=u'medium', style=u'regular')
 			textpos = (x[j] - textsurf.get_width()/2, int(ds[1]/20 + y[i] - textsurf.get_height()/2))
 			screen.blit(textsurf, textpos)
 	
@@ -1066,7 +1050,7 @@ def aftertaskselectionscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1119,7 +1103,7 @@ def afterdataselectionscreen(settings):
 	
 	# TITLE
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"analysis settings", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"analysis settings", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1131,7 +1115,7 @@ def afterdataselectionscreen(settings):
 	texts = [u"distance threshold"]
 	# render and blit texts
 	for i in range(len(texts)):
-		textsurf = settings[u'font'][u'medium'][u'regular'].render(texts[i], False, settings[u'fgc'])
+		textsurf = render_text(settings, texts[i], size=u'medium', style=u'regular')
 		textpos = (int(4*ds[0]/9 - textsurf.get_width()/2), int(ds[1]/20 + y[i] - textsurf.get_height()/2))
 		screen.blit(textsurf, textpos)
 	
@@ -1157,7 +1141,7 @@ def afterdataselectionscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1231,7 +1215,7 @@ def analysisoptionsscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1305,7 +1289,7 @@ def browserscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(os.path.basename(settings[u'dir'][u'browsing']), False, settings[u'fgc'])
+	titsurf = render_text(settings, os.path.basename(settings[u'dir'][u'browsing']), size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1377,14 +1361,21 @@ def browserscreen(settings):
 		# render and blit a thumbnail
 		if (0 < i < 9) and (os.path.splitext(itemnames[i])[1] in [u'.jpg',u'.png',u'.gif',u'.bmp',u'.tif']):
 			imgpath = os.path.join(settings[u'dir'][u'browsing'], itemnames[i])
-			imgsurf = pygame.transform.scale(pygame.image.load(imgpath),(bdict[u'rect'][2],bdict[u'rect'][3]))
+			imgsurf = get_thumbnail(imgpath, (bdict[u'rect'][2],bdict[u'rect'][3]), cachedir=settings[u'dir'][u'thumbnails'])
 			screen.blit(imgsurf,(bdict[u'rect'][0],bdict[u'rect'][1]))
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
 	
+	# PREFETCH
+	# load the thumbnails of the next page in the background, so that it
+	# opens straight away
+	imgpaths = [os.path.join(settings[u'dir'][u'browsing'], name) for name in itemnames[9:17] \
+		if os.path.splitext(name)[1] in [u'.jpg',u'.png',u'.gif',u'.bmp',u'.tif']]
+	prefetch_thumbnails(imgpaths, buttsize, cachedir=settings[u'dir'][u'thumbnails'])
+	
 	# draw the top buttons
 	screen = draw_top_buttons(settings, screen)
 	
@@ -1425,15 +1416,13 @@ def dataselectionscreen(settings):
 	"""
 	
 	# DATA
-	# get all the data files
-	datanames = map(unicode, os.listdir(settings[u'dir'][u'rawout']))
-	# throw out anything that is not a folder
-	for name in datanames:
-		if not os.path.isdir(os.path.join(settings[u'dir'][u'rawout'], name)):
-			datanames.pop(datanames.index(name))
-	# only use eight
+	# get the datasets on this page (eight) and the next (for prefetching
+	# their thumbnails, and to find out if there is a next page) from the
+	# catalogue, which is only updated with the datasets that changed
+	update_catalogue(settings[u'dir'][u'catalogue'], settings[u'dir'][u'rawout'], is_local_dataset)
 	si = settings[u'currentdatapage'] * 8
-	datanames = datanames[si:]
+	datanames = [session[u'name'] for session in query_catalogue(settings[u'dir'][u'catalogue'], \
+		settings[u'dir'][u'rawout'], is_local_dataset, offset=si, limit=16)]
 	# insert the batch option as the first option
 	datanames.insert(0,u"batch")
 	
@@ -1449,7 +1438,7 @@ def dataselectionscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"select a dataset", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"select a dataset", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1513,14 +1502,20 @@ def dataselectionscreen(settings):
 		# render and blit a thumbnail
 		if 0 < i < 9:
 			imgpath = os.path.join(settings[u'dir'][u'rawout'], datanames[i], u'task.png')
-			imgsurf = pygame.transform.scale(pygame.image.load(imgpath),(bdict[u'rect'][2],bdict[u'rect'][3]))
+			imgsurf = get_thumbnail(imgpath, (bdict[u'rect'][2],bdict[u'rect'][3]), cachedir=settings[u'dir'][u'thumbnails'])
 			screen.blit(imgsurf,(bdict[u'rect'][0],bdict[u'rect'][1]))
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
 	
+	# PREFETCH
+	# load the thumbnails of the next page in the background, so that it
+	# opens straight away
+	imgpaths = [os.path.join(settings[u'dir'][u'rawout'], name, u'task.png') for name in datanames[9:17]]
+	prefetch_thumbnails(imgpaths, buttsize, cachedir=settings[u'dir'][u'thumbnails'])
+	
 	# draw the top buttons
 	screen = draw_top_buttons(settings, screen)
 	
@@ -1541,7 +1536,7 @@ def draw_top_buttons(settings, screen):
 		bdict = settings[u'topbuttons'][i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'small'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'small', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1583,15 +1578,13 @@ def onlinedataselectionscreen(settings):
 	"""
 	
 	# DATA
-	# get all the data files
-	datanames = map(unicode, os.listdir(settings[u'dir'][u'onlinedata']))
-	# throw out anything that is not a folder
-	for name in datanames:
-		if not os.path.isfile(os.path.join(settings[u'dir'][u'onlinedata'], name)):
-			datanames.pop(datanames.index(name))
-	# only use eight
+	# get the datasets on this page (eight), and one more to find out if
+	# there is a next page, from the catalogue, which is only updated with
+	# the datasets that changed
+	update_catalogue(settings[u'dir'][u'catalogue'], settings[u'dir'][u'onlinedata'], is_online_dataset)
 	si = settings[u'currentonlinedatapage'] * 8
-	datanames = datanames[si:]
+	datanames = [session[u'name'] for session in query_catalogue(settings[u'dir'][u'catalogue'], \
+		settings[u'dir'][u'onlinedata'], is_online_dataset, offset=si, limit=9)]
 	# insert the batch option as the first option
 	datanames.insert(0, u'batch')
 	
@@ -1607,7 +1600,7 @@ def onlinedataselectionscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"select a dataset", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"select a dataset", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1674,7 +1667,7 @@ def onlinedataselectionscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1727,7 +1720,7 @@ def startscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"CancellationTools", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"CancellationTools", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1769,7 +1762,7 @@ def startscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1851,7 +1844,7 @@ def taskoptionsscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -1914,7 +1907,7 @@ def taskselectionscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"select a task", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"select a task", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -1978,14 +1971,20 @@ def taskselectionscreen(settings):
 		# render and blit a thumbnail
 		if i < 9:
 			imgpath = os.path.join(settings[u'dir'][u'tasks'], tasknames[i], u'task.png')
-			imgsurf = pygame.transform.scale(pygame.image.load(imgpath),(bdict[u'rect'][2],bdict[u'rect'][3]))
+			imgsurf = get_thumbnail(imgpath, (bdict[u'rect'][2],bdict[u'rect'][3]), cachedir=settings[u'dir'][u'thumbnails'])
 			screen.blit(imgsurf,(bdict[u'rect'][0],bdict[u'rect'][1]))
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
 	
+	# PREFETCH
+	# load the thumbnails of the next page in the background, so that it
+	# opens straight away
+	imgpaths = [os.path.join(settings[u'dir'][u'tasks'], name, u'task.png') for name in tasknames[9:18]]
+	prefetch_thumbnails(imgpaths, buttsize, cachedir=settings[u'dir'][u'thumbnails'])
+	
 	# draw the top buttons
 	screen = draw_top_buttons(settings, screen)
 	
@@ -2059,7 +2058,7 @@ def tasksettingsscreen(settings):
 	# TITLE
 	# title space: full width, 1/3 of the height
 	# render title surface
-	titsurf = settings[u'font'][u'large'][u'bold'].render(u"task settings", False, settings[u'fgc'])
+	titsurf = render_text(settings, u"task settings", size=u'large', style=u'bold')
 	# title position
 	titpos = [dc[0]-titsurf.get_width()/2, ds[1]/6-titsurf.get_height()/2]
 	# draw the title
@@ -2075,7 +2074,7 @@ def tasksettingsscreen(settings):
 			u"target":(int(11*ds[0]/18), int(9*ds[1]/18)),
 			u"distractor":(int(11*ds[0]/18), int(11*ds[1]/18))}
 	for t in texts.keys():
-		surf = settings[u'font'][u'medium'][u'regular'].render(t, False, settings[u'fgc'])
+		surf = render_text(settings, t, size=u'medium', style=u'regular')
 		blitpos = (int(texts[t][0] - surf.get_width()/2), int(texts[t][1] - surf.get_height()/2))
 		screen.blit(surf, blitpos)
 	
@@ -2211,7 +2210,7 @@ def tasksettingsscreen(settings):
 		bdict = buttons[i]
 		screen.fill(bdict[u'colour'], bdict[u'rect'])
 		# render and blit the text
-		txtsurf = settings[u'font'][u'medium'][bdict[u'font']].render(bdict[u'text'], False, settings[u'fgc'])
+		txtsurf = render_text(settings, bdict[u'text'], size=u'medium', style=bdict[u'font'])
 		txtpos = [(bdict[u'rect'][0]+bdict[u'rect'][2]/2)-txtsurf.get_width()/2,
 				(bdict[u'rect'][1]+bdict[u'rect'][3]/2)-txtsurf.get_height()/2]
 		screen.blit(txtsurf, txtpos)
@@ -23,7 +23,14 @@
 __author__ = u"Edwin Dalmaijer"
 
 # native
+import hashlib
+import os
 import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
 
 # external
 import numpy
@@ -34,6 +41,64 @@ import pygame
 # # # # #
 
 
+# # # # #
+# COLOUR MAPS
+
+# segments of the 'jet' colour map (as defined by Matplotlib), for every
+# colour channel a list of (x, y0, y1) tuples: between two x values, the
+# channel's value increases linearly from the y1 of the first to the y0 of
+# the second tuple
+JETDATA = {	u'red':		[(0.0, 0.0, 0.0), (0.35, 0.0, 0.0), (0.66, 1.0, 1.0), (0.89, 1.0, 1.0), (1.0, 0.5, 0.5)],
+			u'green':	[(0.0, 0.0, 0.0), (0.125, 0.0, 0.0), (0.375, 1.0, 1.0), (0.64, 1.0, 1.0), (0.91, 0.0, 0.0), (1.0, 0.0, 0.0)],
+			u'blue':	[(0.0, 0.5, 0.5), (0.11, 1.0, 1.0), (0.34, 1.0, 1.0), (0.65, 0.0, 0.0), (1.0, 0.0, 0.0)]}
+
+
+# # # # #
+# CACHES
+
+# the most recently used Gaussian matrices (see gaussian and gaussian1d);
+# keys are tuples of the sizes and standard deviations
+_GAUSSIANCACHE = OrderedDict()
+_GAUSSIANCACHESIZE = 8
+
+# colour lookup tables (see colourmap_lut); keys are the number of colours
+_LUTCACHE = {}
+
+# fonts that have been loaded (see get_font); keys are (path, size) tuples
+_FONTCACHE = {}
+
+# the most recently rendered text surfaces (see render_text); keys are
+# (text, path, size, colour) tuples
+_TEXTCACHE = OrderedDict()
+_TEXTCACHESIZE = 256
+
+# the most recently used thumbnails (see get_thumbnail); keys are (path,
+# modification time, (width, height)) tuples; the lock guards the cache, as
+# thumbnails are also loaded by prefetching threads (see prefetch_thumbnails)
+_THUMBCACHE = OrderedDict()
+_THUMBCACHESIZE = 64
+_THUMBLOCK = threading.Lock()
+# maximal number of thumbnails in the cache directory (the least recently
+# used ones are removed, see _prune_thumbnails)
+_THUMBDISKSIZE = 1024
+
+# the latest request of prefetch_thumbnails, and the single thread that
+# handles the requests; the condition guards both
+_PREFETCHREQUEST = None
+_PREFETCHTHREAD = None
+_PREFETCHCONDITION = threading.Condition()
+
+
+# # # # #
+# FONTS
+
+# font files of every font style (all fonts are from the Ubuntu font family,
+# see: http://font.ubuntu.com/)
+FONTFILES = {	u'regular':u'Ubuntu-R.ttf',
+			u'bold':u'Ubuntu-B.ttf',
+			u'italic':u'Ubuntu-RI.ttf'}
+
+
 # # # # #
 # HELPER FUNCTIONS
 
@@ -154,6 +219,368 @@ def draw_Landolt_C(size, direction, fgc, bgc, pw, ow):
 	return surf
 
 
+def get_colours():
+
+	"""Returns the colours that are used throughout the app; these colours are
+	all from the Tango theme, see:
+	http://tango.freedesktop.org/Tango_Icon_Theme_Guidelines#Color_Palette
+
+	arguments
+
+	None
+
+	returns
+
+	colours		--	a dict with a list of RGB lists for every colour name,
+					e.g. {u'butter':[[252,233,79],[237,212,0],[196,160,0]]}
+	"""
+
+	colours = {	u'butter': 	[	u'#fce94f',
+							u'#edd400',
+							u'#c4a000'],
+			u'orange': 	[	u'#fcaf3e',
+							u'#f57900',
+							u'#ce5c00'],
+			u'chocolate': 	[	u'#e9b96e',
+							u'#c17d11',
+							u'#8f5902'],
+			u'chameleon': 	[	u'#8ae234',
+							u'#73d216',
+							u'#4e9a06'],
+			u'skyblue': 	[	u'#729fcf',
+							u'#3465a4',
+							u'#204a87'],
+			u'plum': 		[	u'#ad7fa8',
+							u'#75507b',
+							u'#5c3566'],
+			u'scarletred':	[	u'#ef2929',
+							u'#cc0000',
+							u'#a40000'],
+			u'aluminium':	[	u'#eeeeec',
+							u'#d3d7cf',
+							u'#babdb6',
+							u'#888a85',
+							u'#555753',
+							u'#2e3436']
+						}
+	# hex2rgb
+	for cn in colours.keys():
+		for i in range(len(colours[cn])):
+			colours[cn][i] = check_colour(colours[cn][i])
+
+	return colours
+
+
+def get_font(settings, size=u'medium', style=u'regular'):
+	
+	"""Returns a font of the app; every font is only loaded the first time it
+	is used
+	
+	arguments
+	
+	settings		--	the app settings dict, which contains a 'fontsize'
+					dict (see app.run)
+	
+	keyword arguments
+	
+	size			--	size of the font, as a key of the 'fontsize'
+					dict: u'large', u'medium', or u'small'
+					(default = u'medium')
+	style		--	font style: u'regular', u'bold', or u'italic'
+					(default = u'regular')
+	
+	returns
+	
+	font			--	a pygame.font.Font instance
+	"""
+	
+	key = (os.path.join(settings[u'dir'][u'fonts'], FONTFILES[style]), settings[u'fontsize'][size])
+	if key not in _FONTCACHE.keys():
+		_FONTCACHE[key] = pygame.font.Font(key[0], key[1])
+	
+	return _FONTCACHE[key]
+
+
+def render_text(settings, text, size=u'medium', style=u'regular', colour=None):
+	
+	"""Renders a text in one of the app's fonts (without antialiasing); the
+	most recently rendered texts are cached, so that the same labels are not
+	rendered again every time a screen is drawn; hence, the returned Surface
+	should not be drawn on (blit it, or copy it before changing it); texts
+	that change all the time (e.g. progress messages) would only push the
+	labels out of the cache, so render those with get_font directly
+	
+	arguments
+	
+	settings		--	the app settings dict, which contains a 'fontsize'
+					dict (see app.run)
+	text			--	the text to render
+	
+	keyword arguments
+	
+	size			--	size of the font, as a key of the 'fontsize'
+					dict: u'large', u'medium', or u'small'
+					(default = u'medium')
+	style		--	font style: u'regular', u'bold', or u'italic'
+					(default = u'regular')
+	colour		--	text colour as an (r,g,b) tuple, or None to use
+					the foreground colour of the app (default = None)
+	
+	returns
+	
+	textsurf		--	a pygame.Surface instance
+	"""
+	
+	if colour == None:
+		colour = settings[u'fgc']
+	
+	# CACHE
+	# return the surface straight away if it has been rendered recently
+	key = (text, os.path.join(settings[u'dir'][u'fonts'], FONTFILES[style]), settings[u'fontsize'][size], tuple(colour))
+	if key in _TEXTCACHE:
+		textsurf = _TEXTCACHE.pop(key)
+		_TEXTCACHE[key] = textsurf
+		return textsurf
+	
+	# RENDER
+	textsurf = get_font(settings, size=size, style=style).render(text, False, colour)
+	
+	# store the surface, and forget the least recently used one if the cache
+	# is full
+	_TEXTCACHE[key] = textsurf
+	if len(_TEXTCACHE) > _TEXTCACHESIZE:
+		_TEXTCACHE.popitem(last=False)
+	
+	return textsurf
+
+
+def get_directories(directory):
+
+	"""Returns a dict with the paths to all directories (and the plot fonts)
+	that the app uses
+
+	arguments
+
+	directory		--	the main directory of the application
+
+	returns
+
+	dirs			--	a dict with the following keys: 'main', 'data',
+					'out', 'rawout', 'onlinedata', 'res', 'tasks',
+					'fonts', 'plotfont', 'boldplotfont', 'browsing',
+					'thumbnails', 'catalogue'
+	"""
+
+	# main and lib directories
+	dirs = {}
+	dirs[u'main'] = directory
+
+	# data directory
+	dirs[u'data'] = os.path.join(dirs[u'main'], u'data')
+	dirs[u'out'] = os.path.join(dirs[u'data'], u'output')
+	dirs[u'rawout'] = os.path.join(dirs[u'data'], u'raw')
+	dirs[u'onlinedata'] = os.path.join(dirs[u'data'], u'online')
+	dirs[u'thumbnails'] = os.path.join(dirs[u'data'], u'thumbnails')
+	dirs[u'catalogue'] = os.path.join(dirs[u'data'], u'catalogue.sqlite')
+
+	# resources
+	dirs[u'res'] = os.path.join(dirs[u'main'], u'resources')
+	dirs[u'tasks'] = os.path.join(dirs[u'res'], u'tasks')
+	dirs[u'fonts'] = os.path.join(dirs[u'res'], u'text', u'ubuntu-font-family-0.80')
+	dirs[u'plotfont'] = os.path.join(dirs[u'fonts'], u'Ubuntu-R.ttf')
+	dirs[u'boldplotfont'] = os.path.join(dirs[u'fonts'], u'Ubuntu-B.ttf')
+
+	# browser
+	dirs[u'browsing'] = os.path.join(dirs[u'res'], u'tasks')
+
+	return dirs
+
+
+def get_thumbnail(path, size, cachedir=None):
+	
+	"""Returns an image, scaled to the passed size; the most recently used
+	thumbnails are kept in memory, and stored in the cache directory (up to
+	_THUMBDISKSIZE files), so that an image (which can be a large scan on a
+	slow drive) only has to be loaded and scaled once; the thumbnails are
+	shared, so the returned Surface should not be drawn on (blit it, or copy
+	it before changing it)
+	
+	arguments
+	
+	path			--	full path to an image file
+	size			--	(width, height) of the thumbnail in pixels
+	
+	keyword arguments
+	
+	cachedir		--	directory to store the thumbnails in (it is
+					created when it doesn't exist yet), or None to only
+					keep them in memory (default = None)
+	
+	returns
+	
+	thumbnail		--	a pygame.Surface instance
+	"""
+	
+	# CACHE
+	# the thumbnail of an image that changed is made again
+	size = (int(size[0]), int(size[1]))
+	key = (path, os.path.getmtime(path), size)
+	# return the thumbnail straight away if it has been used recently
+	with _THUMBLOCK:
+		if key in _THUMBCACHE:
+			thumbnail = _THUMBCACHE.pop(key)
+			_THUMBCACHE[key] = thumbnail
+			return thumbnail
+	
+	# DISK
+	thumbnail = None
+	if cachedir != None:
+		cachepath = os.path.join(cachedir, u'%s.bmp' % hashlib.sha1(repr(key)).hexdigest())
+		if os.path.isfile(cachepath):
+			try:
+				thumbnail = pygame.image.load(cachepath)
+				# mark the thumbnail as recently used (see _prune_thumbnails)
+				os.utime(cachepath, None)
+			except (pygame.error, OSError):
+				thumbnail = None
+	
+	# IMAGE
+	if thumbnail == None:
+		thumbnail = pygame.transform.scale(pygame.image.load(path), size)
+		# store the thumbnail in the cache directory (under a temporary name
+		# first, so that other threads never load half a file); a thumbnail
+		# that can not be stored is simply made again next time
+		if cachedir != None:
+			tmppath = u'%s_%d.bmp' % (os.path.splitext(cachepath)[0], threading.current_thread().ident)
+			try:
+				if not os.path.isdir(cachedir):
+					os.makedirs(cachedir)
+				pygame.image.save(thumbnail, tmppath)
+				if not os.path.isfile(cachepath):
+					os.rename(tmppath, cachepath)
+			except (pygame.error, IOError, OSError):
+				pass
+			if os.path.isfile(tmppath):
+				try:
+					os.remove(tmppath)
+				except OSError:
+					pass
+			# keep the cache directory from growing forever (e.g. with old
+			# versions of changed images, or thumbnails of other sizes)
+			_prune_thumbnails(cachedir, _THUMBDISKSIZE)
+	
+	# store the thumbnail, and forget the least recently used one if the
+	# cache is full
+	with _THUMBLOCK:
+		_THUMBCACHE[key] = thumbnail
+		if len(_THUMBCACHE) > _THUMBCACHESIZE:
+			_THUMBCACHE.popitem(last=False)
+	
+	return thumbnail
+
+
+def _prune_thumbnails(cachedir, maxfiles):
+	
+	"""For internal use! Removes the least recently used thumbnails from the
+	cache directory (see get_thumbnail), until no more than the passed
+	number of thumbnails is left; thumbnails that can not be removed (e.g.
+	because another thread just did) are skipped
+	
+	arguments
+	
+	cachedir		--	directory that contains the thumbnails
+	maxfiles		--	maximal number of thumbnails to keep
+	"""
+	
+	# only the stored thumbnails count (not the temporary files of the
+	# thumbnails that are being stored)
+	try:
+		names = [name for name in os.listdir(cachedir) if os.path.splitext(name)[1] == u'.bmp' and u'_' not in name]
+	except OSError:
+		return
+	if len(names) <= maxfiles:
+		return
+	
+	# sort on the last time every thumbnail was used
+	times = []
+	for name in names:
+		try:
+			times.append((os.path.getmtime(os.path.join(cachedir, name)), name))
+		except OSError:
+			pass
+	times.sort()
+	for t, name in times[:len(times)-maxfiles]:
+		try:
+			os.remove(os.path.join(cachedir, name))
+		except OSError:
+			pass
+
+
+def prefetch_thumbnails(paths, size, cachedir=None):
+	
+	"""Loads the thumbnails of a list of images in a background thread (see
+	get_thumbnail), e.g. those on the next page of a screen, so that they
+	are available straight away when they are needed; all requests are
+	handled by the same thread, and a new request replaces the images of
+	the previous one that have not been loaded yet
+	
+	arguments
+	
+	paths		--	list of full paths to image files
+	size			--	(width, height) of the thumbnails in pixels
+	
+	keyword arguments
+	
+	cachedir		--	directory to store the thumbnails in, or None to
+					only keep them in memory (default = None)
+	
+	returns
+	
+	thread		--	the threading.Thread instance that loads the
+					thumbnails
+	"""
+	
+	global _PREFETCHREQUEST, _PREFETCHTHREAD
+	
+	with _PREFETCHCONDITION:
+		_PREFETCHREQUEST = (list(paths), size, cachedir)
+		# start the thread on the first request
+		if _PREFETCHTHREAD == None or not _PREFETCHTHREAD.is_alive():
+			_PREFETCHTHREAD = threading.Thread(target=_prefetch_thumbnails)
+			# the thread should not keep the app from quitting
+			_PREFETCHTHREAD.daemon = True
+			_PREFETCHTHREAD.start()
+		_PREFETCHCONDITION.notify()
+	
+	return _PREFETCHTHREAD
+
+
+def _prefetch_thumbnails():
+	
+	"""For internal use! Handles the requests of prefetch_thumbnails, one
+	at a time; images that can not be loaded are skipped, as their errors
+	should only show up when they are actually drawn
+	"""
+	
+	global _PREFETCHREQUEST
+	
+	while True:
+		# wait for the next request
+		with _PREFETCHCONDITION:
+			while _PREFETCHREQUEST == None:
+				_PREFETCHCONDITION.wait()
+			paths, size, cachedir = _PREFETCHREQUEST
+			_PREFETCHREQUEST = None
+		# load the thumbnails, until a newer request comes in
+		for path in paths:
+			if _PREFETCHREQUEST != None:
+				break
+			try:
+				get_thumbnail(path, size, cachedir=cachedir)
+			except (pygame.error, IOError, OSError):
+				pass
+
+
 def intersection(line1, line2):
 	
 	"""Checks if the passed lines intersect, and returns the coordinates of
@@ -204,6 +631,83 @@ def intersection(line1, line2):
 		return None
 
 
+def path_intersections(x, y):
+	
+	"""Finds all intersections between the line segments of a path, with
+	exactly the same outcome as calling intersection on every pair of
+	segments (i,j) with i < j, in that order; instead of checking all pairs,
+	the segments are sorted by their horizontal starting point, and a sweep
+	over the sorted segments only passes on pairs with overlapping bounding
+	boxes, which are then checked all at once
+	
+	arguments
+	
+	x		--	a NumPy array of the horizontal coordinates of all
+					points on the path
+	y		--	a NumPy array of the vertical coordinates of all points
+					on the path
+	
+	returns
+	
+	intersects	--	a list of the (x,y) coordinates of all intersections
+	"""
+	
+	# a path with less than three points can not intersect itself
+	if len(x) < 3:
+		return []
+	
+	# SEGMENTS
+	# starting and ending points of all segments
+	x1, x2 = x[:-1], x[1:]
+	y1, y2 = y[:-1], y[1:]
+	# bounding boxes
+	xmin, xmax = numpy.minimum(x1,x2), numpy.maximum(x1,x2)
+	ymin, ymax = numpy.minimum(y1,y2), numpy.maximum(y1,y2)
+	
+	# SWEEP
+	# sort the segments on their horizontal starting point
+	order = numpy.argsort(xmin, kind='mergesort')
+	# for every segment, all segments further on in the sorted order that
+	# start before it ends have an overlapping horizontal extent
+	last = numpy.searchsorted(xmin[order], xmax[order], side='left')
+	first = numpy.arange(len(order)) + 1
+	count = numpy.maximum(last - first, 0)
+	# candidate pairs (as positions in the sorted order)
+	p = numpy.repeat(numpy.arange(len(order)), count)
+	q = numpy.arange(numpy.sum(count)) - numpy.repeat(numpy.cumsum(count) - count, count) + numpy.repeat(first, count)
+	# candidate pairs (as segment numbers, with i < j)
+	i = numpy.minimum(order[p], order[q])
+	j = numpy.maximum(order[p], order[q])
+	# only keep the pairs with (strictly) overlapping bounding boxes, as
+	# intersections on the edge of a segment's domain are not counted
+	keep = (numpy.maximum(xmin[i],xmin[j]) < numpy.minimum(xmax[i],xmax[j])) \
+		& (numpy.maximum(ymin[i],ymin[j]) < numpy.minimum(ymax[i],ymax[j]))
+	i, j = i[keep], j[keep]
+	# sort pairs in the same order as a nested loop would produce them
+	pairs = numpy.lexsort((j, i))
+	i, j = i[pairs], j[pairs]
+	
+	# INTERSECTIONS
+	# the same calculations as in intersection, but for all pairs at once
+	A = [y1[i]-y2[i], y1[j]-y2[j]]
+	B = [x2[i]-x1[i], x2[j]-x1[j]]
+	C = [-1 * (x1[i]*y2[i] - x2[i]*y1[i]),
+		-1 * (x1[j]*y2[j] - x2[j]*y1[j])]
+	D  = A[0]*B[1] - B[0]*A[1]
+	Dx = C[0]*B[1] - B[0]*C[1]
+	Dy = A[0]*C[1] - C[0]*A[1]
+	# parallel segments do not intersect
+	valid = D != 0
+	i, j = i[valid], j[valid]
+	ix = Dx[valid] / D[valid]
+	iy = Dy[valid] / D[valid]
+	# check if the intersections are in the domain of both segments
+	valid = (xmin[i] < ix) & (ix < xmax[i]) & (ymin[i] < iy) & (iy < ymax[i]) \
+		& (xmin[j] < ix) & (ix < xmax[j]) & (ymin[j] < iy) & (iy < ymax[j])
+	
+	return zip(ix[valid], iy[valid])
+
+
 def isrgb(value):
 	
 	"""Checks if a value is between 0 and 255 (inlcuding 0 and 255)
@@ -226,7 +730,9 @@ def isrgb(value):
 def gaussian(x, sx, y=None, sy=None):
 	
 	"""Returns an array of numpy arrays (a matrix) containing values between
-	1 and 0 in a 2D Gaussian distribution
+	1 and 0 in a 2D Gaussian distribution; the most recently used matrices
+	are cached, so the returned matrix is read-only (copy it before changing
+	any values)
 	
 	arguments
 	x		-- width in pixels
@@ -243,6 +749,14 @@ def gaussian(x, sx, y=None, sy=None):
 		y = x
 	if sy == None:
 		sy = sx
+	
+	# CACHE
+	# return the matrix straight away if it has been computed recently
+	key = (x, sx, y, sy)
+	if key in _GAUSSIANCACHE:
+		M = _GAUSSIANCACHE.pop(key)
+		_GAUSSIANCACHE[key] = M
+		return M
 
 	# MATRIX
 	#(gives pixelated results; array takes more processing, but looks nicer)
@@ -252,16 +766,343 @@ def gaussian(x, sx, y=None, sy=None):
 	# centers	
 	xo = x/2
 	yo = y/2
-	# matrix of zeros
-	M = numpy.zeros([y,x], dtype=float)
-	# gaussian matrix
-	for i in range(x):
-		for j in range(y):
-			M[j,i] = numpy.exp((((float(i)-xo)**2/(2*sx*sx)) + ((float(j)-yo)**2/(2*sy*sy)) ) * -1.0 )
+	# squared distances to the centre, scaled by the standard deviations
+	dx = (numpy.arange(x, dtype=float) - xo)**2 / (2*sx*sx)
+	dy = (numpy.arange(y, dtype=float) - yo)**2 / (2*sy*sy)
+	# gaussian matrix (the exponent is the sum of both distances, which
+	# gives the exact same values as computing every pixel separately)
+	M = numpy.exp((dy.reshape(y,1) + dx.reshape(1,x)) * -1.0)
+	M.flags.writeable = False
+	
+	# store the matrix, and forget the least recently used one if the cache
+	# is full
+	_GAUSSIANCACHE[key] = M
+	if len(_GAUSSIANCACHE) > _GAUSSIANCACHESIZE:
+		_GAUSSIANCACHE.popitem(last=False)
 
 	return M
 
 
+def gaussian1d(x, sx):
+	
+	"""Returns a numpy array containing values between 1 and 0 in a 1D
+	Gaussian distribution; a 2D Gaussian is separable, i.e.
+	numpy.outer(gaussian1d(y,sy), gaussian1d(x,sx)) equals gaussian(x,sx,
+	y,sy) (up to rounding errors), which allows for convolving a matrix with
+	two 1D Gaussians instead of a 2D one; the returned array is read-only
+	
+	arguments
+	x		-- width in pixels
+	sx		-- width standard deviation
+	"""
+	
+	# CACHE
+	key = (x, sx)
+	if key in _GAUSSIANCACHE:
+		M = _GAUSSIANCACHE.pop(key)
+		_GAUSSIANCACHE[key] = M
+		return M
+	
+	# ARRAY
+	M = numpy.exp(((numpy.arange(x, dtype=float) - x/2)**2 / (2*sx*sx)) * -1.0)
+	M.flags.writeable = False
+	
+	# store the array, and forget the least recently used one if the cache
+	# is full
+	_GAUSSIANCACHE[key] = M
+	if len(_GAUSSIANCACHE) > _GAUSSIANCACHESIZE:
+		_GAUSSIANCACHE.popitem(last=False)
+	
+	return M
+
+
+def gaussian_heatmap(x, y, dispsize, gwh, gsdwh):
+	
+	"""Returns a heatmap of the passed points, which is the sum of a
+	Gaussian (see gaussian) for every point; the result is the same (up to
+	rounding errors) as adding a gwh x gwh Gaussian to a padded matrix for
+	every point, with the top-left of each Gaussian at the point's
+	coordinate, and with all parts of Gaussians that fall outside of the
+	padded matrix clipped off; rather than adding a 2D Gaussian for every
+	point, every point is treated as an impulse, and the impulses are
+	convolved with the horizontal and the vertical 1D Gaussian (see
+	gaussian1d) in two separate passes
+	
+	arguments
+	
+	x		--	a list or NumPy array of the horizontal coordinates
+					of all points
+	y		--	a list or NumPy array of the vertical coordinates of
+					all points
+	dispsize	--	a (width,height) tuple of the display size in pixels
+	gwh		--	width and height of the Gaussian in pixels
+	gsdwh		--	standard deviation of the Gaussian
+	
+	returns
+	
+	padded, cropped	--	the heatmap with a padding of gwh/2 pixels on
+					every side, and a view of the same heatmap without
+					the padding (i.e. of the display size)
+	"""
+	
+	# padded heatmap size
+	strt = gwh/2
+	h, w = dispsize[1] + 2*strt, dispsize[0] + 2*strt
+	
+	# coordinates to arrays of integers
+	x = numpy.array(x, dtype=int).ravel()
+	y = numpy.array(y, dtype=int).ravel()
+	
+	# without any points, the heatmap is empty
+	if len(x) == 0:
+		padded = numpy.zeros((h,w), dtype=float)
+		return padded, padded[strt:strt+dispsize[1],strt:strt+dispsize[0]]
+	
+	# 1D Gaussian
+	gaus = gaussian1d(gwh, gsdwh)
+	
+	# HORIZONTAL PASS
+	# sort the points on their vertical coordinate, so that the points on
+	# the same row are next to each other
+	order = numpy.argsort(y, kind='mergesort')
+	x, y = x[order], y[order]
+	rows, first = numpy.unique(y, return_index=True)
+	# the horizontal convolution of every row (only rows that contain any
+	# points are considered, the others are all zeros)
+	hpass = numpy.zeros((len(rows),w), dtype=float)
+	# process the points in chunks, to limit the memory use with many points
+	chunksize = 256
+	for start in range(0, len(x), chunksize):
+		stop = min(start+chunksize, len(x))
+		# Gaussian profile of every point in this chunk
+		profiles = _gaussian_profiles(x[start:stop], w, gaus)
+		# sum the profiles of all points on the same row (numpy.unique
+		# returns the row numbers, as y is sorted)
+		chunkrows, chunkfirst = numpy.unique(y[start:stop], return_index=True)
+		hpass[numpy.searchsorted(rows, chunkrows)] += numpy.add.reduceat(profiles, chunkfirst, axis=0)
+	
+	# VERTICAL PASS
+	# the vertical Gaussian profile of every row, multiplied by the
+	# horizontal pass of that row, and summed over all rows
+	vpass = _gaussian_profiles(rows, h, gaus)
+	padded = numpy.dot(vpass.T, hpass)
+	
+	return padded, padded[strt:strt+dispsize[1],strt:strt+dispsize[0]]
+
+
+def _gaussian_profiles(pos, n, gaus):
+	
+	"""For internal use! Returns a matrix with a row for every position,
+	containing the 1D Gaussian starting at that position, clipped to the
+	range 0-n
+	
+	arguments
+	
+	pos		--	NumPy array of integer starting positions
+	n		--	length of every profile
+	gaus		--	NumPy array of a 1D Gaussian
+	
+	returns
+	
+	profiles	--	NumPy array of shape (len(pos),n)
+	"""
+	
+	# index of the Gaussian value at every point in every profile
+	i = numpy.arange(n).reshape(1,n) - pos.reshape(len(pos),1)
+	# only the parts that overlap with the Gaussian are non-zero
+	inside = (i >= 0) & (i < len(gaus))
+	
+	return numpy.where(inside, gaus[numpy.clip(i, 0, len(gaus)-1)], 0.0)
+
+
+def alpha_blend(background, foreground, alpha=1.0):
+	
+	"""Draws an image over an opaque background image of the same size, with
+	the same integer arithmetic as Matplotlib's Agg renderer, so that the
+	result is exactly the same as drawing both images in a figure
+	
+	arguments
+	
+	background	--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, 3) or (height, width, 4) shape (the
+					alpha channel is ignored)
+	foreground	--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, 4) shape
+	
+	keyword arguments
+	
+	alpha		--	opacity of the whole foreground image, between 0
+					and 1 (default = 1.0)
+	
+	returns
+	
+	blended		--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, 4) shape, and an opaque alpha channel
+	"""
+	
+	# the opacity of every foreground pixel, as a byte
+	a = (foreground[:,:,3:4] / 255.0 * alpha * 255).astype(numpy.int64)
+	# blend every colour channel (for an opaque background pixel p, the
+	# Agg blender calculates ((c*256 - p*255) * a + p*255*256) / (255*256 + a))
+	p = background[:,:,:3].astype(numpy.int64) * 255
+	c = foreground[:,:,:3].astype(numpy.int64)
+	blended = numpy.zeros(foreground.shape, dtype=numpy.uint8)
+	blended[:,:,:3] = (((c << 8) - p) * a + (p << 8)) // ((255 << 8) + a)
+	blended[:,:,3] = 255
+	
+	return blended
+
+
+def downscale(image, shape):
+	
+	"""Scales an image down, by averaging the pixels that end up in the same
+	pixel of the smaller image
+	
+	arguments
+	
+	image		--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, channels) shape
+	shape		--	a (height, width) tuple of the new size, which is
+					not larger than the image
+	
+	returns
+	
+	scaled		--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, channels) shape; this is the passed
+					image if it already has the new size
+	"""
+	
+	if tuple(shape) == image.shape[:2]:
+		return image
+	
+	# the first row and column of the image in every new pixel
+	rows = (numpy.arange(shape[0]) * image.shape[0]) // shape[0]
+	cols = (numpy.arange(shape[1]) * image.shape[1]) // shape[1]
+	# sum and count the pixels in every new pixel
+	sums = numpy.add.reduceat(image.astype(float), rows, axis=0)
+	sums = numpy.add.reduceat(sums, cols, axis=1)
+	counts = numpy.outer(numpy.diff(numpy.append(rows, image.shape[0])), \
+		numpy.diff(numpy.append(cols, image.shape[1])))
+	
+	return (sums / counts[:,:,numpy.newaxis]).round().astype(numpy.uint8)
+
+
+def colourmap_lut(n=256):
+	
+	"""Returns a lookup table of the 'jet' colour map; the table is only
+	calculated once, so it is read-only
+	
+	keyword arguments
+	
+	n			--	number of colours in the table (default = 256)
+	
+	returns
+	
+	lut			--	a NumPy array of unsigned 8-bit integers, with an
+					(R,G,B,A) row for every colour
+	"""
+	
+	if n in _LUTCACHE.keys():
+		return _LUTCACHE[n]
+	
+	lut = numpy.zeros((n,4), dtype=float)
+	for i, channel in enumerate([u'red', u'green', u'blue']):
+		segments = numpy.array(JETDATA[channel], dtype=float)
+		lut[:,i] = numpy.interp(numpy.linspace(0, 1, n), segments[:,0], segments[:,1])
+	lut[:,3] = 1.0
+	# like Matplotlib, convert to bytes by rounding down
+	lut = (lut * 255).astype(numpy.uint8)
+	lut.setflags(write=False)
+	_LUTCACHE[n] = lut
+	
+	return lut
+
+
+def heatmap_rgba(heatmap, vmin=None, vmax=None, lowbound=None, n=256):
+	
+	"""Colours a heatmap with the 'jet' colour map, like Matplotlib's imshow
+	would: the values are scaled between vmin and vmax, and then looked up
+	in a table of n colours; NaN values are transparent
+	
+	arguments
+	
+	heatmap		--	a NumPy array of the heatmap's values
+	
+	keyword arguments
+	
+	vmin			--	value that gets the first colour, or None to use
+					the lowest value in the heatmap (default = None)
+	vmax			--	value that gets the last colour, or None to use
+					the highest value in the heatmap (default = None)
+	lowbound		--	values up to this bound are made transparent (the
+					colours of all other values are not affected), or
+					None to keep all values (default = None)
+	n			--	number of colours (default = 256)
+	
+	returns
+	
+	rgba			--	a NumPy array of unsigned 8-bit integers, with
+					the same height and width as the heatmap, and an
+					(R,G,B,A) value for every pixel
+	"""
+	
+	heatmap = numpy.asarray(heatmap, dtype=float)
+	bad = numpy.isnan(heatmap)
+	if lowbound != None:
+		bad |= heatmap <= lowbound
+	rgba = numpy.zeros(heatmap.shape + (4,), dtype=numpy.uint8)
+	# a heatmap without any values is completely transparent
+	if numpy.all(numpy.isnan(heatmap)):
+		return rgba
+	
+	# scale the values between vmin and vmax
+	if vmin == None:
+		vmin = numpy.nanmin(heatmap)
+	if vmax == None:
+		vmax = numpy.nanmax(heatmap)
+	if vmax > vmin:
+		scaled = (heatmap - vmin) / (vmax - vmin)
+	else:
+		scaled = numpy.zeros(heatmap.shape)
+	# colour number of every value; values below vmin get the first, and
+	# values above vmax the last colour
+	scaled[numpy.isnan(scaled)] = 0
+	index = numpy.clip(scaled * n, 0, n-1).astype(int)
+	rgba[:] = colourmap_lut(n)[index]
+	rgba[bad] = 0
+	
+	return rgba
+
+
+def write_png(path, rgba):
+	
+	"""Writes an image to a PNG file (8 bits per channel, with an alpha
+	channel), without any compression filters
+	
+	arguments
+	
+	path			--	full path to the new PNG file
+	rgba			--	a NumPy array of unsigned 8-bit integers, with a
+					(height, width, 4) shape
+	"""
+	
+	h, w = rgba.shape[0], rgba.shape[1]
+	# every row starts with a filter type byte (0: no filter)
+	raw = numpy.zeros((h, w*4+1), dtype=numpy.uint8)
+	raw[:,1:] = numpy.asarray(rgba, dtype=numpy.uint8).reshape(h, w*4)
+	
+	# a PNG file consists of a signature, and of chunks with a length, a
+	# type, the data, and a checksum of the type and data
+	def chunk(chunktype, data):
+		return struct.pack('>I', len(data)) + chunktype + data + struct.pack('>I', zlib.crc32(chunktype + data) & 0xffffffff)
+	f = open(path, 'wb')
+	f.write('\x89PNG\r\n\x1a\n')
+	f.write(chunk('IHDR', struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0)))
+	f.write(chunk('IDAT', zlib.compress(raw.tostring(), 6)))
+	f.write(chunk('IEND', ''))
+	f.close()
+
+
 def pearsonr(x, y):
 
 	"""Calculates the Pearson rank correlation; source directly from SciPy,
@@ -292,4 +1133,284 @@ def pearsonr(x, y):
 	# Presumably, if abs(r) > 1, then it is only some small artifact of floating
 	# point arithmetic.
 	r = max(min(r, 1.0), -1.0)
-	return r
\ No newline at end of file
+	return r
+
+# # # # #
+# CLASSES
+
+class PointIndex():
+	
+	"""A spatial index over a set of (x,y) points, for fast nearest-point
+	lookups; the points are sorted into the cells of a uniform grid, so that
+	only the points in the cells around a position have to be checked,
+	instead of all points"""
+	
+	def __init__(self, x, y):
+		
+		"""Initializes a PointIndex instance, sorting the passed points into
+		a grid of cells that contain about two points each
+		
+		arguments
+		
+		x			-	NumPy array (or list) of horizontal coordinates
+		y			-	NumPy array (or list) of vertical coordinates
+		"""
+		
+		# POINTS
+		self.x = numpy.array(x, dtype=float)
+		self.y = numpy.array(y, dtype=float)
+		self.n = len(self.x)
+		
+		# GRID
+		# bounding box of all points
+		if self.n > 0:
+			self.xmin, self.ymin = numpy.min(self.x), numpy.min(self.y)
+			w = max(numpy.max(self.x) - self.xmin, 1.0)
+			h = max(numpy.max(self.y) - self.ymin, 1.0)
+		else:
+			self.xmin, self.ymin = 0.0, 0.0
+			w, h = 1.0, 1.0
+		# cell size (in pixels) that results in about two points per cell
+		self.cellsize = max(1.0, ((w * h * 2.0) / max(self.n, 1)) ** 0.5)
+		# number of columns and rows
+		self.ncols = int(w / self.cellsize) + 1
+		self.nrows = int(h / self.cellsize) + 1
+		
+		# CELLS
+		# the cell number of every point
+		cols = ((self.x - self.xmin) / self.cellsize).astype(int)
+		rows = ((self.y - self.ymin) / self.cellsize).astype(int)
+		cells = rows * self.ncols + cols
+		# point indices sorted by cell (a stable sort keeps the indices
+		# within a cell in ascending order)
+		self.order = numpy.argsort(cells, kind=u'mergesort')
+		# the points in cell c are self.order[self.starts[c]:self.starts[c+1]]
+		counts = numpy.bincount(cells, minlength=self.ncols*self.nrows)
+		self.starts = numpy.hstack([[0], numpy.cumsum(counts)])
+		# a table with a row of point indices for every cell (padded with -1),
+		# plus an empty row at the end for cells outside of the grid; this
+		# allows for looking up many positions at once
+		self.table = numpy.zeros((self.ncols*self.nrows+1, max(1, numpy.max(counts))), dtype=int) - 1
+		if self.n > 0:
+			sortedcells = cells[self.order]
+			self.table[sortedcells, numpy.arange(self.n) - self.starts[sortedcells]] = self.order
+	
+	
+	def nearest(self, x, y, skipzero=False):
+		
+		"""Finds the point that is closest to the passed position, by checking
+		rings of cells around that position until no closer point can be
+		found; when several points are equally close, the one with the
+		lowest index is returned (like numpy.argmin would)
+		
+		arguments
+		
+		x			-	horizontal coordinate of the position
+		y			-	vertical coordinate of the position
+		
+		keyword arguments
+		
+		skipzero		-	Boolean indicating whether points at the exact
+						passed position should be ignored, e.g. to find
+						the closest neighbour of a point in the index
+						(default = False)
+		
+		returns
+		
+		i, d			-	i is the index of the closest point (or -1 if the
+						index contains no points)
+						d is the squared distance to that point
+		"""
+		
+		besti, bestd = -1, numpy.inf
+		if self.n == 0:
+			return besti, bestd
+		
+		# the cell the position is in (or the closest cell, for positions
+		# outside of the grid)
+		c0 = min(max(int(numpy.floor((x - self.xmin) / self.cellsize)), 0), self.ncols-1)
+		r0 = min(max(int(numpy.floor((y - self.ymin) / self.cellsize)), 0), self.nrows-1)
+		
+		# check the cells in rings around the starting cell
+		for k in range(max(self.ncols, self.nrows)):
+			# collect the points in all cells of the current ring
+			candidates = []
+			for r in range(max(r0-k, 0), min(r0+k, self.nrows-1)+1):
+				# the top and bottom row of a ring contain all its columns,
+				# the other rows only contain the outer two
+				if abs(r-r0) == k:
+					cols = range(max(c0-k, 0), min(c0+k, self.ncols-1)+1)
+				else:
+					cols = [c for c in (c0-k, c0+k) if 0 <= c < self.ncols]
+				for c in cols:
+					cell = r * self.ncols + c
+					candidates.append(self.order[self.starts[cell]:self.starts[cell+1]])
+			candidates = numpy.hstack(candidates + [numpy.zeros(0, dtype=int)])
+			# find the closest candidate
+			if len(candidates) > 0:
+				d = (self.x[candidates] - x)**2 + (self.y[candidates] - y)**2
+				if skipzero:
+					d[d == 0] = numpy.inf
+				dmin = numpy.min(d)
+				i = numpy.min(candidates[d == dmin])
+				if dmin < bestd or (dmin == bestd and i < besti):
+					besti, bestd = i, dmin
+			# all points outside of the current ring are at least k cells
+			# away, so if the closest point is closer, we're done
+			if besti >= 0 and bestd < (k * self.cellsize)**2:
+				break
+		
+		return int(besti), bestd
+	
+	
+	def nearest_many(self, x, y, skipzero=False):
+		
+		"""Finds the closest point for each of the passed positions at once;
+		all points in the block of three by three cells around each position
+		are checked in one go, and only for the positions for which that
+		does not guarantee the right answer (e.g. positions outside of the
+		grid) the nearest method is used
+		
+		arguments
+		
+		x			-	NumPy array of horizontal coordinates
+		y			-	NumPy array of vertical coordinates
+		
+		keyword arguments
+		
+		skipzero		-	Boolean indicating whether points at the exact
+						passed positions should be ignored (see nearest)
+						(default = False)
+		
+		returns
+		
+		i, d			-	i is a NumPy array with the index of the closest
+						point for every position (-1 if the index contains
+						no points)
+						d is a NumPy array with the squared distances
+		"""
+		
+		x = numpy.asarray(x, dtype=float)
+		y = numpy.asarray(y, dtype=float)
+		besti = numpy.zeros(len(x), dtype=int) - 1
+		bestd = numpy.zeros(len(x), dtype=float) + numpy.inf
+		if self.n == 0 or len(x) == 0:
+			return besti, bestd
+		
+		# cell of every position
+		cols = numpy.floor((x - self.xmin) / self.cellsize).astype(int)
+		rows = numpy.floor((y - self.ymin) / self.cellsize).astype(int)
+		inside = (cols >= 0) & (cols < self.ncols) & (rows >= 0) & (rows < self.nrows)
+		
+		# the point indices in the three by three cells around every position
+		# (cells outside of the grid point to the empty row at the end)
+		candidates = []
+		for dr in (-1, 0, 1):
+			for dc in (-1, 0, 1):
+				c = cols + dc
+				r = rows + dr
+				cells = numpy.where((c >= 0) & (c < self.ncols) & (r >= 0) & (r < self.nrows), r * self.ncols + c, self.ncols * self.nrows)
+				candidates.append(self.table[cells])
+		candidates = numpy.hstack(candidates)
+		
+		# squared distances to all candidates
+		valid = candidates >= 0
+		d = (self.x[candidates] - x[:,numpy.newaxis])**2 + (self.y[candidates] - y[:,numpy.newaxis])**2
+		d[~valid] = numpy.inf
+		if skipzero:
+			d[d == 0] = numpy.inf
+		bestd = numpy.min(d, axis=1)
+		# lowest index among the closest candidates
+		besti = numpy.min(numpy.where(valid & (d == bestd[:,numpy.newaxis]), candidates, self.n), axis=1)
+		
+		# points outside of the block of cells are at least one cell size
+		# away from a position within the grid, so closer results are
+		# certain; all others are checked by searching rings of cells
+		for j in numpy.where(~(inside & (bestd < self.cellsize**2)))[0]:
+			besti[j], bestd[j] = self.nearest(x[j], y[j], skipzero=skipzero)
+		
+		return besti, bestd
+
+
+class StartupProfiler():
+	
+	"""Measures how long every step of the app's start-up takes (e.g. the
+	imports, initializing PyGame, and loading the fonts), and reports this
+	against a start-up time budget"""
+	
+	def __init__(self, starttime=None, enabled=True, budget=None):
+		
+		"""Initializes a StartupProfiler instance
+		
+		keyword arguments
+		
+		starttime		-	time.time() of the very start of the app (e.g.
+						before the first import), or None to start now
+						(default = None)
+		enabled		-	Boolean indicating if the steps should be
+						reported; if False, the profiler does nothing
+						(default = True)
+		budget		-	start-up time budget in seconds, or None for no
+						budget (default = None)
+		"""
+		
+		if starttime == None:
+			starttime = time.time()
+		self.starttime = starttime
+		self.enabled = enabled
+		self.budget = budget
+		# list of (name, duration) tuples, in the order of the steps
+		self.steps = []
+		self.last = starttime
+	
+	def mark(self, name):
+		
+		"""Ends a step of the start-up, which started at the end of the
+		previous step (or at the start of the app)
+		
+		arguments
+		
+		name			-	name of the step, e.g. u'pygame.init'
+		"""
+		
+		if not self.enabled:
+			return
+		now = time.time()
+		self.steps.append((name, now - self.last))
+		self.last = now
+	
+	def report(self, stream=None):
+		
+		"""Writes the duration of every step, and the total start-up time,
+		to a stream
+		
+		keyword arguments
+		
+		stream		-	file-like object to write to, or None to use
+						sys.stdout (default = None)
+		
+		returns
+		
+		total			-	total start-up time in seconds, or None if the
+						profiler is not enabled
+		"""
+		
+		if not self.enabled:
+			return None
+		if stream == None:
+			stream = sys.stdout
+		
+		total = self.last - self.starttime
+		width = max([len(name) for name, duration in self.steps] + [len(u'total')])
+		stream.write(u"start-up time\n")
+		for name, duration in self.steps:
+			stream.write(u"  %s  %6.3f s  %5.1f%%\n" % (name.ljust(width), duration, 100.0 * duration / max(total, 1e-9)))
+		stream.write(u"  %s  %6.3f s\n" % (u'total'.ljust(width), total))
+		if self.budget != None:
+			if total > self.budget:
+				stream.write(u"start-up took %.3f s longer than the budget of %.3f s\n" % (total - self.budget, self.budget))
+			else:
+				stream.write(u"start-up is within the budget of %.3f s\n" % self.budget)
+		stream.flush()
+		
+		return total
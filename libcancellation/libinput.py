@@ -22,6 +22,9 @@
 
 __author__ = u"Edwin Dalmaijer"
 
+# CancellationTools
+from libhelper import get_font, render_text
+
 # external
 import pygame
 # try importing Android, to support the Android app
@@ -60,6 +63,19 @@ for letter in u'abcdefghijklmnopqrstuvwxyz':
 	keymodsdict[letter] = letter.upper()
 
 
+# # # # #
+# EVENTS
+
+# on Android, a wait for input is interrupted this often (in milliseconds), to
+# check if the app should pause (see wait_event)
+ANDROIDPAUSECHECK = 100
+# the mouse buttons that count as a click (the others are scroll wheel moves)
+CLICKBUTTONS = [1, 2, 3]
+# event type that ends a wait with a timeout, in PyGame versions of which
+# event.wait does not accept a timeout (before 2.0)
+TIMEOUTEVENT = pygame.USEREVENT + 1
+
+
 # # # # #
 # FUNCTIONS
 
@@ -135,6 +151,126 @@ def check_mouseclicks():
 		return None, None
 
 
+def wait_event(settings=None, types=None, timeout=None):
+	
+	"""Waits until an event arrives, without using the processor while
+	waiting (unlike polling for events); on Android, the app is paused
+	while waiting if Android asks for it
+	
+	keyword arguments
+	
+	settings		-	the app settings dict, or None if the app should
+					not be paused on Android (default = None)
+	types		-	list of the event types to wait for (all other
+					events are discarded), or None to wait for any
+					event (default = None)
+	timeout		-	longest time to wait in milliseconds, or None to
+					wait until an event arrives (default = None)
+	
+	returns
+	
+	event		-	a pygame.event.Event instance, or None if the
+					timeout passed before an event arrived
+	"""
+	
+	checkpause = settings != None and settings[u'android']
+	if timeout != None:
+		endtime = pygame.time.get_ticks() + timeout
+	
+	while True:
+		# the time to wait for the next event (not longer than the time
+		# left, or than the time between Android pause checks)
+		wait = None
+		if timeout != None:
+			wait = max(0, endtime - pygame.time.get_ticks())
+		if checkpause and (wait == None or wait > ANDROIDPAUSECHECK):
+			wait = ANDROIDPAUSECHECK
+		# wait for the next event
+		event = _wait_event(wait)
+		if event != None and (types == None or event.type in types):
+			return event
+		# allow an Android interrupt
+		if checkpause:
+			if android.check_pause():
+				android.wait_for_resume()
+		# stop if the time is up
+		if timeout != None and pygame.time.get_ticks() >= endtime:
+			return None
+
+
+def wait_for_click(settings=None, timeout=None, discard=False):
+	
+	"""Waits until a mouse button is clicked (see wait_event), and returns
+	the clicked button and position
+	
+	keyword arguments
+	
+	settings		-	the app settings dict, or None if the app should
+					not be paused on Android (default = None)
+	timeout		-	longest time to wait in milliseconds, or None to
+					wait until a click (default = None)
+	discard		-	Boolean indicating if clicks that were made before
+					calling this function (e.g. while a screen was still
+					being drawn) should be ignored (default = False)
+	
+	returns
+	button, pos	-	button is an integer value, indicating which button
+					got pressed (counting starts at 1, on the left mouse
+					button); or None if the timeout passed
+					pos is a (x,y) tuple, indicating where the click
+					occured; or None if the timeout passed
+	"""
+	
+	if discard:
+		pygame.event.clear(pygame.MOUSEBUTTONDOWN)
+	if timeout != None:
+		endtime = pygame.time.get_ticks() + timeout
+	
+	while True:
+		# the time left
+		wait = None
+		if timeout != None:
+			wait = max(0, endtime - pygame.time.get_ticks())
+		event = wait_event(settings, types=[pygame.MOUSEBUTTONDOWN], timeout=wait)
+		if event == None:
+			return None, None
+		# skip scroll wheel moves
+		if event.button in CLICKBUTTONS:
+			return event.button, event.pos
+
+
+def _wait_event(wait):
+	
+	"""For internal use! Waits for the next event
+	
+	arguments
+	
+	wait			-	longest time to wait in milliseconds, or None to
+					wait until an event arrives
+	
+	returns
+	
+	event		-	a pygame.event.Event instance, or None if no event
+					arrived in time
+	"""
+	
+	if wait == None:
+		return pygame.event.wait()
+	
+	# since PyGame 2.0, event.wait accepts a timeout
+	if pygame.version.vernum[0] >= 2:
+		event = pygame.event.wait(wait)
+	# older versions are woken up by a timer
+	else:
+		pygame.time.set_timer(TIMEOUTEVENT, max(1, wait))
+		event = pygame.event.wait()
+		pygame.time.set_timer(TIMEOUTEVENT, 0)
+	if event.type in [pygame.NOEVENT, TIMEOUTEVENT]:
+		return None
+	
+	return event
+
+
 def check_space():
 	
 	"""Checks if the Space key is pressed
@@ -194,7 +330,7 @@ def colourpicker(settings):
 	textrect = [int(ds[0]/4), int(3*ds[1]/5), int(3*ds[0]/8), int(ds[1]/10)]
 	textpos = (int(7*ds[0]/16), int(13*ds[1]/20))
 	# save button
-	savetext = settings[u'font'][u'medium'][u'bold'].render(u"save", False, settings[u'fgc'])
+	savetext = render_text(settings, u"save", size=u'medium', style=u'bold')
 	saverect = [int(5*ds[0]/8), int(12.5*ds[1]/20), int(ds[0]/8), int(ds[1]/20)]
 	savepos = (int(saverect[0]+saverect[2]/2)-savetext.get_width()/2, int(saverect[1]+saverect[3]/2)-savetext.get_height()/2)
 	# sliders
@@ -213,8 +349,8 @@ def colourpicker(settings):
 	disp.fill(settings[u'bgc'])
 	# draw colour rect
 	disp.fill(rgb, crect)
-	# RGB value
-	rgbtext = settings[u'font'][u'medium'][u'bold'].render(unicode(rgb), False, settings[u'fgc'])
+	# RGB value (which changes all the time, so it is not cached)
+	rgbtext = get_font(settings, size=u'medium', style=u'bold').render(unicode(rgb), False, settings[u'fgc'])
 	disp.blit(rgbtext, (textpos[0]-rgbtext.get_width()/2, textpos[1]-rgbtext.get_height()/2))
 	# save button
 	disp.fill(settings[u'colours'][u'chameleon'][2], saverect)
@@ -235,8 +371,15 @@ def colourpicker(settings):
 	# INTERACTION
 	saved = False
 	while not saved:
-		# check for clicks
-		b, pos = check_mouseclicks()
+		# wait for a click, or for the mouse to move with a button pressed
+		# (to drag the sliders)
+		event = wait_event(settings, types=[pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION])
+		if event.type == pygame.MOUSEBUTTONDOWN and event.button in CLICKBUTTONS:
+			b, pos = event.button, event.pos
+		elif event.type == pygame.MOUSEMOTION and sum(event.buttons) > 0:
+			b, pos = list(event.buttons).index(1)+1, event.pos
+		else:
+			b, pos = None, None
 		# handle input
 		if b != None:
 			# save button
@@ -257,14 +400,10 @@ def colourpicker(settings):
 					disp.fill(rgb, crect)
 					# reset and redraw text
 					disp.fill(settings[u'bgc'], textrect)
-					rgbtext = settings[u'font'][u'medium'][u'bold'].render(unicode(rgb), False, settings[u'fgc'])
+					rgbtext = get_font(settings, size=u'medium', style=u'bold').render(unicode(rgb), False, settings[u'fgc'])
 					disp.blit(rgbtext, (textpos[0]-rgbtext.get_width()/2, textpos[1]-rgbtext.get_height()/2))
 					# update display
 					pygame.display.flip()
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
 
 	# DISPLAY
 	# reset display
@@ -345,7 +484,7 @@ def on_off_button(button, settings, ontext=u"o", offtext=u"x"):
 	disp.fill(button[u'colour'], button[u'rect'])
 	
 	# render and blit the text
-	txtsurf = settings[u'font'][u'medium'][button[u'font']].render(button[u'text'], False, settings[u'fgc'])
+	txtsurf = render_text(settings, button[u'text'], size=u'medium', style=button[u'font'])
 	txtpos = [(button[u'rect'][0]+button[u'rect'][2]/2)-txtsurf.get_width()/2,
 			(button[u'rect'][1]+button[u'rect'][3]/2)-txtsurf.get_height()/2]
 	disp.blit(txtsurf, txtpos)
@@ -412,43 +551,39 @@ def textfield(rect, font, settings, onlynums=False, loadtext=True):
 	# run until Enter is pressed
 	enter = False
 	while not enter:
-		# check if there is any event
-		for event in pygame.event.get():
-			# check if the event is a keypress
-			if event.type == pygame.KEYDOWN:
-				# convert the keyname into something readable
-				key = pygame.key.name(event.key)
-				# check if the key is Enter
-				if key == u'return':
-					enter = True
-				# remove the last index of the text if the key was backspace
-				elif key == u'backspace' and len(text) > 0:
-					text = text[:-1]
-				# add the input to the text if the key was an allowed key
-				elif key in allowed:
-					# check if the Shift key is pressed (not when using nums)
-					if (event.mod & pygame.KMOD_SHIFT) and not onlynums:
-						# change key value accordingly
-						key = keymodsdict[key]
-					# append key to the text
-					text += key
-			# render the text
-			textsurf = font.render(text, False, settings[u'fgc'])
-			# text position
-			textpos = (int(textcentre[0] - textsurf.get_width()/2), int(textcentre[1]-textsurf.get_height()/2))
-			# reset text
-			if enter:
-				colour = settings[u'tfbgc']
-			else:
-				colour = settings[u'tfhbgc']
-			disp.fill(colour, rect)
-			# blit text to display
-			disp.blit(textsurf, textpos)
-			pygame.display.flip()
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+		# wait for any event (this also allows an Android interrupt)
+		event = wait_event(settings)
+		# check if the event is a keypress
+		if event.type == pygame.KEYDOWN:
+			# convert the keyname into something readable
+			key = pygame.key.name(event.key)
+			# check if the key is Enter
+			if key == u'return':
+				enter = True
+			# remove the last index of the text if the key was backspace
+			elif key == u'backspace' and len(text) > 0:
+				text = text[:-1]
+			# add the input to the text if the key was an allowed key
+			elif key in allowed:
+				# check if the Shift key is pressed (not when using nums)
+				if (event.mod & pygame.KMOD_SHIFT) and not onlynums:
+					# change key value accordingly
+					key = keymodsdict[key]
+				# append key to the text
+				text += key
+		# render the text
+		textsurf = font.render(text, False, settings[u'fgc'])
+		# text position
+		textpos = (int(textcentre[0] - textsurf.get_width()/2), int(textcentre[1]-textsurf.get_height()/2))
+		# reset text
+		if enter:
+			colour = settings[u'tfbgc']
+		else:
+			colour = settings[u'tfhbgc']
+		disp.fill(colour, rect)
+		# blit text to display
+		disp.blit(textsurf, textpos)
+		pygame.display.flip()
 
 	# hide keyboard on Android
 	if settings[u'android']:
@@ -23,8 +23,9 @@
 __author__ = u"Edwin Dalmaijer"
 
 # CancellationTools
-from libinput import check_click, check_mouseclicks, textfield
-from libhelper import check_colour, draw_Landolt_C
+from libdata import read_tsv
+from libinput import check_click, textfield, wait_event, wait_for_click
+from libhelper import check_colour, draw_Landolt_C, get_font, render_text, PointIndex
 
 # native
 import os
@@ -34,12 +35,6 @@ import time
 # external
 import numpy
 import pygame
-# try importing Android, to support the Android app
-try:
-	import android
-# if the import fails, we're probably not running the Android app, so no panic
-except:
-	pass
 
 
 # # # # #
@@ -79,17 +74,17 @@ def start_task(settings):
 
 	# draw text input screen	
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"please provide a filename", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"please provide a filename", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/4-textsurf.get_height()/2)))
 	disp.fill(settings[u'tfbgc'], inputrect)
 	pygame.display.flip()
 	
 	# ask for the participant name
-	settings[u'ppname'] = textfield(inputrect, settings[u'font'][u'large'][u'regular'], settings, loadtext=False)
+	settings[u'ppname'] = textfield(inputrect, get_font(settings, size=u'large', style=u'regular'), settings, loadtext=False)
 	
 	# show loading message
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"starting task, please wait", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"starting task, please wait", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispcentre'][1]-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
@@ -104,19 +99,15 @@ def start_task(settings):
 	
 	# show ending screen
 	disp.fill(settings[u'bgc'])
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"thank you for participating", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"thank you for participating", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
-	textsurf = settings[u'font'][u'large'][u'regular'].render(u"(click to return to the main menu)", False, settings[u'fgc'])
+	textsurf = render_text(settings, u"(click to return to the main menu)", size=u'large', style=u'regular')
 	disp.blit(textsurf, (int(settings[u'dispcentre'][0]-textsurf.get_width()/2), int(2*settings[u'dispsize'][1]/3-textsurf.get_height()/2)))
 	pygame.display.flip()
 	
-	# wait for a click (allowing some time to unclick)
-	pygame.time.wait(200)
-	while check_mouseclicks()[0] == None:
-		# allow an Android interrupt
-		if settings[u'android']:
-			if android.check_pause():
-				android.wait_for_resume()	
+	# wait for a click (ignoring the clicks that were made before the message
+	# was shown; this also allows an Android interrupt)
+	wait_for_click(settings, discard=True)
 
 	
 	# switch back to start screen
@@ -124,9 +115,6 @@ def start_task(settings):
 	disp.blit(settings[u'guiscreens'][settings[u'currentscreen']], (0,0))
 	pygame.display.flip()
 	
-	# allow a bit of time to unclick
-	pygame.time.wait(200)
-	
 	return settings
 
 
@@ -199,7 +187,7 @@ class Task():
 		self.ppname = settings[u'ppname']
 		self.savebutton = {	u'fgc':settings[u'colours'][u'aluminium'][0],
 						u'bgc':settings[u'colours'][u'chameleon'][2],
-						u'font':settings[u'font'][u'medium'][u'bold']}
+						u'font':get_font(settings, size=u'medium', style=u'bold')}
 		self.cancellationsound = settings[u'sounds']['cancellation']
 
 		# current time
@@ -301,31 +289,16 @@ class Task():
 				# load the image
 				self.image = pygame.image.load(os.path.join(self.path, u'task.png'))
 				
-				# load the stimulus coordinates
-				stimx = []
-				stimy = []
-				lines = []
-				# open, read, and close target file
-				tf = open(os.path.join(self.path, u'targets.txt'))
-				l = tf.readlines()
-				l.pop(0)
-				lines.extend(l)
-				tf.close()
-				# open, read and close distractor file (if it exists)
+				# load the stimulus coordinates, from the target file and the
+				# distractor file (if it exists)
+				stimfiles = [os.path.join(self.path, u'targets.txt')]
 				if os.path.isfile(os.path.join(self.path, u'distractors.txt')):
-					df = open(os.path.join(self.path, u'distractors.txt'))
-					l = df.readlines()
-					l.pop(0)
-					lines.extend(l)
-					df.close()
-				# loop through lines
-				for line in lines:
-					line = line.replace(u'\n', u'').replace(u'\r', u'').split(u'\t')
-					stimx.append(int(line[1]))
-					stimy.append(int(line[2]))
-				# lists to arrays
-				self.stimx = numpy.array(stimx)
-				self.stimy = numpy.array(stimy)
+					stimfiles.append(os.path.join(self.path, u'distractors.txt'))
+				stimcors = [read_tsv(f, {u'x':int, u'y':int}) for f in stimfiles]
+				self.stimx = numpy.concatenate([c[u'x'] for c in stimcors])
+				self.stimy = numpy.concatenate([c[u'y'] for c in stimcors])
+				# spatial index, for quickly finding the closest stimulus
+				self.stimindex = PointIndex(self.stimx, self.stimy)
 		
 		# FROM PROPERTIES
 		else:
@@ -456,6 +429,8 @@ class Task():
 			# store stimulus coordinates
 			self.stimx = stimx + self.properties[u'stimsize']/2
 			self.stimy = stimy + self.properties[u'stimsize']/2
+			# spatial index, for quickly finding the closest stimulus
+			self.stimindex = PointIndex(self.stimx, self.stimy)
 
 
 	def run(self):
@@ -516,55 +491,56 @@ class Task():
 		# run until Escape
 		running = True
 		while running:
-			# check if there is a mouse click or a keypress
-			for event in pygame.event.get():
-#				# check if there was a keypress
-#				if event.type == pygame.KEYDOWN:
-#					# check if the Escape key is pressed
-#					if event.key == pygame.K_ESCAPE:
-#						running = False
-				# check if there was a mouseclick
-				if event.type == pygame.MOUSEBUTTONDOWN:
-					# if the click was on the save button, stop the task
-					if check_click(event.pos, saverect):
-						running = False
-					# if the click was not on the save button
+			# wait for a mouse click or a keypress (without using the
+			# processor in between)
+			event = wait_event(types=[pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN])
+#			# check if there was a keypress
+#			if event.type == pygame.KEYDOWN:
+#				# check if the Escape key is pressed
+#				if event.key == pygame.K_ESCAPE:
+#					running = False
+			# check if there was a mouseclick
+			if event.type == pygame.MOUSEBUTTONDOWN:
+				# if the click was on the save button, stop the task
+				if check_click(event.pos, saverect):
+					running = False
+				# if the click was not on the save button
+				else:
+					# reset the click position to the nearest
+					# stimulus if this setting is enables
+					if self.properties[u'clickcorrect']:
+						# find the closest stimulus
+						closest, dist = self.stimindex.nearest(event.pos[0], event.pos[1])
+						# set the new position
+						pos = (self.stimx[closest], self.stimy[closest])
 					else:
-						# reset the click position to the nearest
-						# stimulus if this setting is enables
-						if self.properties[u'clickcorrect']:
-							# find the closest stimulus
-							dist = ((self.stimx - event.pos[0])**2 + (self.stimy - event.pos[1])**2)**0.5
-							# set the new position
-							pos = (self.stimx[numpy.argmin(dist)], self.stimy[numpy.argmin(dist)])
-						else:
-							pos = event.pos
-						# get timestamp
-						t1 = pygame.time.get_ticks()
-						# write position to output file
-						line = [self.ppname, self.name, self.date, self.time, self.properties[u'input'], self.properties[u'visible'], unicode(t1-t0), unicode(pos[0]), unicode(pos[1])]
-						outfile.write(u'\t'.join(line) + u'\n')
-						# draw a cross centered around the click position,
-						# with starting and ending positions based on click
-						spos = [	[int(pos[0]-self.properties[u'stimsize']/2),	# top left x
-								int(pos[1]-self.properties[u'stimsize']/2)],	# top left y
-								[int(pos[0]-self.properties[u'stimsize']/2),	# bottom left x
-								int(pos[1]+self.properties[u'stimsize']/2)]]	# bottom left y
-						epos = [	[int(pos[0]+self.properties[u'stimsize']/2),	# bottom right x
-								int(pos[1]+self.properties[u'stimsize']/2)],	# bottom right y
-								[int(pos[0]+self.properties[u'stimsize']/2),	# top right x
-								int(pos[1]-self.properties[u'stimsize']/2)]]	# top right y
-						# draw lines
-						pygame.draw.line(disp, self.properties[u'fgc'], spos[0], epos[0], self.properties[u'pw'])
-						pygame.draw.line(disp, self.properties[u'fgc'], spos[1], epos[1], self.properties[u'pw'])
-						# update the display only if the cancellations are
-						# supposed to be visible
-						if self.properties[u'visible'] == u'visible':
-							pygame.display.flip()
-						# play a sound if the sound-on-cancellation
-						# is required
-						if self.properties[u'sound']:
-							self.cancellationsound.play()
+						pos = event.pos
+					# get timestamp
+					t1 = pygame.time.get_ticks()
+					# write position to output file
+					line = [self.ppname, self.name, self.date, self.time, self.properties[u'input'], self.properties[u'visible'], unicode(t1-t0), unicode(pos[0]), unicode(pos[1])]
+					outfile.write(u'\t'.join(line) + u'\n')
+					# draw a cross centered around the click position,
+					# with starting and ending positions based on click
+					spos = [	[int(pos[0]-self.properties[u'stimsize']/2),	# top left x
+							int(pos[1]-self.properties[u'stimsize']/2)],	# top left y
+							[int(pos[0]-self.properties[u'stimsize']/2),	# bottom left x
+							int(pos[1]+self.properties[u'stimsize']/2)]]	# bottom left y
+					epos = [	[int(pos[0]+self.properties[u'stimsize']/2),	# bottom right x
+							int(pos[1]+self.properties[u'stimsize']/2)],	# bottom right y
+							[int(pos[0]+self.properties[u'stimsize']/2),	# top right x
+							int(pos[1]-self.properties[u'stimsize']/2)]]	# top right y
+					# draw lines
+					pygame.draw.line(disp, self.properties[u'fgc'], spos[0], epos[0], self.properties[u'pw'])
+					pygame.draw.line(disp, self.properties[u'fgc'], spos[1], epos[1], self.properties[u'pw'])
+					# update the display only if the cancellations are
+					# supposed to be visible
+					if self.properties[u'visible'] == u'visible':
+						pygame.display.flip()
+					# play a sound if the sound-on-cancellation
+					# is required
+					if self.properties[u'sound']:
+						self.cancellationsound.play()
 
 		# after running, close the textfile
 		outfile.close()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CancellationTools
+#
+# CancellationTools is open-source software for running cancellation tasks,
+# and directly analysing the data they produce.
+#
+# Copyright (C) 2014, Edwin S. Dalmaijer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+"""Checks that an incremental batch analysis writes the same combined
+output when it is run again on data sets that did not change (which are
+then taken from the manifest); run from the main directory of the
+application with:
+
+	python -m unittest discover tests
+"""
+
+__author__ = u"Edwin Dalmaijer"
+
+# native
+import os
+import shutil
+import tempfile
+import unittest
+
+# external
+import numpy
+
+# CancellationTools
+from libcancellation.analyse import headless_settings
+from libcancellation import libanalysis
+
+
+# # # # #
+# FUNCTIONS
+
+def make_dataset(datadir, name, taskdir, taskname, n, rng):
+
+	"""Writes a raw data directory with clicks near n random targets of a
+	task, including a miss and an immediate revisit
+
+	arguments
+
+	datadir		--	directory to create the raw data directory in
+	name			--	name of the raw data directory (and participant)
+	taskdir		--	directory that contains the task directories
+	taskname		--	name of the task
+	n			--	number of targets to click on
+	rng			--	numpy.random.RandomState instance
+	"""
+
+	# target coordinates
+	lines = open(os.path.join(taskdir, taskname, u'targets.txt')).read().splitlines()[1:]
+	targets = [map(int, line.split(u'\t')[1:3]) for line in lines if line.strip() != u'']
+	clicks = [targets[i] for i in rng.permutation(len(targets))[:n]]
+	clicks.insert(3, clicks[2])
+	clicks.insert(5, [5, 5])
+
+	# raw data file
+	os.mkdir(os.path.join(datadir, name))
+	rawtxt = open(os.path.join(datadir, name, u'raw.txt'), u'w')
+	rawtxt.write(u"ppname\ttaskname\ttestdate\ttesttime\tinput\tcancellations\ttime\tx\ty")
+	t = 0
+	for x, y in clicks:
+		t += rng.randint(300, 2000)
+		rawtxt.write(u"\n%s\t%s\t2014-01-01\t12:00:00\tmouse\tvisible\t%d\t%d\t%d" % \
+			(name, taskname, t, x + rng.randint(-10, 10), y + rng.randint(-10, 10)))
+	rawtxt.close()
+
+
+# # # # #
+# TESTS
+
+class IncrementalBatchTest(unittest.TestCase):
+
+	def setUp(self):
+
+		self.tmpdir = tempfile.mkdtemp()
+		directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+		self.settings = headless_settings(directory, outdir=os.path.join(self.tmpdir, u'output'), \
+			nworkers=1, output=u'measures')
+		os.mkdir(self.settings[u'dir'][u'out'])
+		self.datadir = os.path.join(self.tmpdir, u'raw')
+		os.mkdir(self.datadir)
+		rng = numpy.random.RandomState(1)
+		for i in range(3):
+			make_dataset(self.datadir, u'pp%d' % i, self.settings[u'dir'][u'tasks'], u'Parton', 20 + 10*i, rng)
+
+	def tearDown(self):
+
+		shutil.rmtree(self.tmpdir)
+
+	def run_batch(self):
+
+		"""Runs an incremental batch, and returns its results and the
+		contents of the combined summary files"""
+
+		datapaths = libanalysis.list_datasets(self.datadir)
+		results = libanalysis.run_batch(self.settings, datapaths, nworkers=1, incremental=True)
+		batchoutdir = libanalysis.combine_batch_output(self.settings, results)
+		files = {}
+		for name in [u'summary.txt', u'summary.csv']:
+			with open(os.path.join(batchoutdir, name), 'rb') as f:
+				files[name] = f.read()
+		files[u'summary.npy'] = numpy.load(os.path.join(batchoutdir, u'summary.npy'))
+
+		return results, files
+
+	def test_unchanged_batch(self):
+
+		results, first = self.run_batch()
+		self.assertEqual([result[u'status'] for result in results], [u'analysed'] * 3)
+		self.assertFalse(any([result[u'cached'] for result in results]))
+		results, second = self.run_batch()
+		self.assertTrue(all([result[u'cached'] for result in results]))
+
+		# the text files should be byte-identical
+		self.assertEqual(first[u'summary.txt'], second[u'summary.txt'])
+		self.assertEqual(first[u'summary.csv'], second[u'summary.csv'])
+		# and so should the binary table
+		self.assertEqual(first[u'summary.npy'].tobytes(), second[u'summary.npy'].tobytes())
+
+	def test_full_precision(self):
+
+		results, files = self.run_batch()
+		table = files[u'summary.npy']
+		# every float in the text file is exactly the one in the table
+		lines = files[u'summary.txt'].splitlines()
+		header = lines[0].split('\t')
+		for j in range(1, len(lines)):
+			values = lines[j].split('\t')
+			for name, dtype in libanalysis.SUMMARY_COLUMNS:
+				if dtype == float:
+					value = float(values[header.index(name)])
+					if not numpy.isnan(value):
+						self.assertEqual(value, table[name][j-1])
+
+
+if __name__ == u'__main__':
+	unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of CancellationTools
+#
+# CancellationTools is open-source software for running cancellation tasks,
+# and directly analysing the data they produce.
+#
+# Copyright (C) 2014, Edwin S. Dalmaijer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+"""Checks that libhelper.path_intersections finds exactly the same
+intersections as calling libhelper.intersection on every pair of path
+segments (the way Analysis.calc_intersect_rate used to); run from the main
+directory of the application with:
+
+	python -m unittest discover tests
+"""
+
+__author__ = u"Edwin Dalmaijer"
+
+# native
+import unittest
+
+# external
+import numpy
+
+# CancellationTools
+from libcancellation.libhelper import intersection, path_intersections
+
+
+# # # # #
+# FUNCTIONS
+
+def pairwise_intersections(x, y):
+
+	"""Returns the intersections of a path, found by calling intersection on
+	every pair of lines (i,j) with i < j, as calc_intersect_rate used to
+
+	arguments
+
+	x		--	a list of the horizontal coordinates of all points on
+					the path
+	y		--	a list of the vertical coordinates of all points on the
+					path
+
+	returns
+
+	intersects	--	a list of the (x,y) coordinates of all intersections
+	"""
+
+	cors = zip(x, y)
+	intersects = []
+	for i in range(len(cors)-1):
+		for j in range(i+1, len(cors)-1):
+			intersect = intersection((cors[i],cors[i+1]), (cors[j],cors[j+1]))
+			if intersect:
+				intersects.append(intersect)
+
+	return intersects
+
+
+# # # # #
+# TESTS
+
+class PathIntersectionsTest(unittest.TestCase):
+
+	def assertSameIntersections(self, x, y):
+
+		"""Asserts that path_intersections and pairwise_intersections return
+		the same amount of intersections, at the same coordinates, in the
+		same order
+		"""
+
+		expected = pairwise_intersections(list(x), list(y))
+		found = path_intersections(numpy.array(x), numpy.array(y))
+		self.assertEqual(len(found), len(expected))
+		for (fx, fy), (ex, ey) in zip(found, expected):
+			self.assertEqual(fx, ex)
+			self.assertEqual(fy, ey)
+
+	def test_random_paths(self):
+
+		rng = numpy.random.RandomState(1)
+		for n in [3, 4, 10, 50, 200]:
+			# float coordinates
+			x = rng.rand(n) * 1024
+			y = rng.rand(n) * 768
+			self.assertSameIntersections(x.tolist(), y.tolist())
+			# integer coordinates (as clicks are)
+			x = rng.randint(0, 1024, n)
+			y = rng.randint(0, 768, n)
+			self.assertSameIntersections(x.tolist(), y.tolist())
+
+	def test_repeated_points(self):
+
+		rng = numpy.random.RandomState(2)
+		for n in [5, 20, 100]:
+			# every point is visited twice in a row, and some points are
+			# revisited later on
+			x = numpy.repeat(rng.rand(n) * 1024, 2)
+			y = numpy.repeat(rng.rand(n) * 768, 2)
+			x = numpy.hstack([x, x[::3]])
+			y = numpy.hstack([y, y[::3]])
+			self.assertSameIntersections(x.tolist(), y.tolist())
+		# a path that stays on the same point
+		self.assertSameIntersections([5.0]*10, [7.0]*10)
+
+	def test_collinear_paths(self):
+
+		# overlapping horizontal, vertical, and diagonal lines
+		self.assertSameIntersections([0, 10, 5, 15, 2], [0, 0, 0, 0, 0])
+		self.assertSameIntersections([3, 3, 3, 3], [0, 10, 5, 20])
+		self.assertSameIntersections([0.0, 10.0, 5.0, 15.0], [0.0, 10.0, 5.0, 15.0])
+		# a path that goes back and forth over the same line, and then
+		# crosses it
+		self.assertSameIntersections([0, 10, 0, 10, 5, 5], [0, 10, 0, 10, -5, 15])
+		# lines that meet at their ends only, and a line that ends on
+		# another line
+		self.assertSameIntersections([0, 10, 10, 0, 0], [0, 0, 10, 10, 0])
+		self.assertSameIntersections([0, 10, 5, 5], [0, 0, 5, 0])
+		# random points on a grid with many collinear lines
+		rng = numpy.random.RandomState(3)
+		x = rng.randint(0, 4, 100)
+		y = rng.randint(0, 4, 100)
+		self.assertSameIntersections(x.tolist(), y.tolist())
+		self.assertSameIntersections((x*0.5).tolist(), (y*0.5).tolist())
+
+	def test_short_paths(self):
+
+		for n in range(3):
+			x = range(n)
+			y = [(i*7) % 3 for i in range(n)]
+			self.assertSameIntersections(x, y)
+			self.assertEqual(path_intersections(numpy.array(x), numpy.array(y)), [])
+
+	def test_crossing_paths(self):
+
+		# a simple cross, and a zig-zag that crosses itself several times
+		self.assertSameIntersections([0, 10, 0, 10], [0, 10, 10, 0])
+		self.assertSameIntersections([0.0, 4.0, 1.0, 3.0, 0.5, 5.0], [0.0, 2.0, -1.0, 3.0, 2.5, -0.5])
+
+
+if __name__ == u'__main__':
+	unittest.main()